@@ -0,0 +1,186 @@
+import asyncio
+import os
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+from .inference_executor import ExecutorBusyError
+
+
+class MicroBatchScheduler:
+    """
+    Gom các request /classify đồng thời thành micro-batch.
+    Mỗi batch chạy một forward pass duy nhất, kết quả được trả lại cho từng request.
+    """
+    def __init__(
+        self,
+        ml_service,
+        executor,
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None,
+        max_queue: Optional[int] = None
+    ):
+        self.ml_service = ml_service
+        self.executor = executor
+        self.max_batch_size = max_batch_size or int(os.getenv('BATCH_MAX_SIZE', 32))
+        self.max_wait_ms = max_wait_ms if max_wait_ms is not None else float(os.getenv('BATCH_MAX_WAIT_MS', 5))
+        self.max_queue = max_queue or int(os.getenv('BATCH_QUEUE_SIZE', 1024))
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._batch_slots: Optional[asyncio.Semaphore] = None
+        self._batch_tasks: Set[asyncio.Task] = set()
+        self._batch_sizes: Counter = Counter()
+        self._total_batches = 0
+        self._total_requests = 0
+        self._last_batch_size = 0
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        # Không gửi nhiều batch hơn số inference thread; phần còn lại tiếp tục gom trong queue
+        self._batch_slots = asyncio.Semaphore(self.executor.max_workers)
+        self._task = asyncio.create_task(self._run())
+        print(f"Micro-batching started (max_batch_size={self.max_batch_size}, max_wait_ms={self.max_wait_ms})")
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # Batch đã gửi sang executor: chờ chạy xong để request nhận kết quả trước khi executor tắt,
+        # quá timeout thì hủy (request của batch đó nhận lỗi)
+        if self._batch_tasks:
+            _, pending = await asyncio.wait(set(self._batch_tasks), timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        # Fail requests that never made it into a batch
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Batch scheduler stopped"))
+
+    async def submit(
+        self,
+        title: str,
+        content: str,
+        model_id: Optional[int] = None,
+        model_path: Optional[str] = None,
+        threshold: Union[float, Dict[str, float], None] = None,
+        top_k: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Queue one email and wait for its labels"""
+        if self._task is None:
+            raise RuntimeError("Batch scheduler not started")
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait(((title, content, model_id, model_path, threshold, top_k), future))
+        except asyncio.QueueFull:
+            raise ExecutorBusyError("Classification queue is full, try again later")
+        return await future
+
+    async def _collect_batch(self) -> List[Tuple[Tuple, asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait_ms / 1000.0
+
+        while len(batch) < self.max_batch_size:
+            # Lấy ngay những request đã nằm sẵn trong queue
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            await self._batch_slots.acquire()
+            try:
+                batch = await self._collect_batch()
+            except BaseException:
+                self._batch_slots.release()
+                raise
+            task = asyncio.create_task(self._process_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _process_batch(self, batch: List[Tuple[Tuple, asyncio.Future]]) -> None:
+        self._record_batch(len(batch))
+        # Mỗi model được chọn chạy một forward pass riêng
+        groups: Dict[Tuple, List[Tuple[Tuple, asyncio.Future]]] = {}
+        for entry in batch:
+            (_, _, model_id, model_path, _, _), _ = entry
+            groups.setdefault((model_id, model_path), []).append(entry)
+        try:
+            await asyncio.gather(*(
+                self._process_group(selector, entries) for selector, entries in groups.items()
+            ))
+        except asyncio.CancelledError:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("Batch scheduler stopped"))
+            raise
+        finally:
+            self._batch_slots.release()
+
+    async def _process_group(self, selector: Tuple, entries: List[Tuple[Tuple, asyncio.Future]]) -> None:
+        model_id, model_path = selector
+        items = [(title, content) for (title, content, _, _, _, _), _ in entries]
+        # Ngưỡng và top_k riêng của từng request, xử lý chung trong một lần
+        thresholds = [threshold for (_, _, _, _, threshold, _), _ in entries]
+        top_ks = [top_k for (_, _, _, _, _, top_k), _ in entries]
+        try:
+            results = await self.executor.run(
+                self.ml_service.predict_batch,
+                items,
+                threshold=thresholds,
+                top_k=top_ks,
+                model_id=model_id,
+                model_path=model_path,
+                isolate_errors=True
+            )
+        except Exception as e:
+            for _, future in entries:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # Threshold sai của một request chỉ làm hỏng request đó
+        for (_, future), labels in zip(entries, results):
+            if future.done():
+                continue
+            if isinstance(labels, ValueError):
+                future.set_exception(labels)
+            else:
+                future.set_result(labels)
+
+    def _record_batch(self, size: int) -> None:
+        self._batch_sizes[size] += 1
+        self._total_batches += 1
+        self._total_requests += size
+        self._last_batch_size = size
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "max_queue": self.max_queue,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "total_batches": self._total_batches,
+            "total_requests": self._total_requests,
+            "avg_batch_size": (
+                self._total_requests / self._total_batches if self._total_batches else 0.0
+            ),
+            "last_batch_size": self._last_batch_size,
+            "batch_size_histogram": {str(size): count for size, count in sorted(self._batch_sizes.items())},
+        }
@@ -1,6 +1,6 @@
 import pymysql
 import os
-from typing import Optional
+from typing import Optional, Dict, Any
 
 def get_active_model() -> Optional[str]:
     connection = None
@@ -32,4 +32,32 @@ def get_active_model() -> Optional[str]:
     finally:
         if 'connection' in locals() and connection:
             connection.close()
-        
\ No newline at end of file
+        
+
+def get_model_by_id(model_id: int) -> Optional[Dict[str, Any]]:
+    connection = None
+    try:
+        connection = pymysql.connect (
+            host=os.getenv('DB_HOST','localhost'),
+            port=int(os.getenv('DB_PORT',3306)),
+            user=os.getenv('DB_USER','root'),
+            passwd=os.getenv('DB_PASSWORD',''),
+            database=os.getenv('DB_NAME','email_classification'),
+            charset='utf8mb4'
+        )
+        with connection.cursor(pymysql.cursors.DictCursor) as cursor:
+            sql = """
+                SELECT id, path, version, isActive
+                FROM tblModel
+                WHERE id = %s
+                LIMIT 1
+            """
+            cursor.execute(sql, (model_id,))
+            return cursor.fetchone()
+    except Exception as e:
+        # Không trả None như các hàm khác: lỗi DB không được hiểu thành "model không tồn tại"
+        print(f"Database error: {str(e)}")
+        raise
+    finally:
+        if connection:
+            connection.close()
@@ -0,0 +1,77 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+class ExecutorBusyError(RuntimeError):
+    """Raised when the executor wait queue is full"""
+
+
+class BoundedExecutor:
+    """
+    Thread pool với số thread cố định và hàng đợi có giới hạn.
+    Dùng để chạy các tác vụ blocking (TensorFlow, ghi file) ngoài event loop.
+    """
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=f"{name}-worker"
+        )
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn in the pool and await its result; raises ExecutorBusyError when full"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise ExecutorBusyError(f"{self.name} executor is busy, try again later")
+
+        with self._lock:
+            self._in_flight += 1
+        try:
+            future = self._executor.submit(self._call, functools.partial(fn, *args, **kwargs))
+        except Exception:
+            self._release()
+            raise
+        # Slot chỉ được trả lại khi tác vụ thực sự kết thúc, kể cả khi request bị hủy
+        future.add_done_callback(lambda _: self._release())
+        return await asyncio.wrap_future(future)
+
+    def _call(self, fn: Callable) -> Any:
+        with self._lock:
+            self._running += 1
+        try:
+            return fn()
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queue_depth": self._in_flight - self._running,
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,287 @@
+import itertools
+import multiprocessing as mp
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from multiprocessing.connection import wait
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+
+
+def _worker_main(model_path: str, num_threads: int, use_xnnpack: bool, warmup_sizes: List[int], conn) -> None:
+    """
+    Vòng lặp của một worker process: nhận batch token id đã pad qua pipe riêng, trả về xác suất.
+    TFLite mmap file model nên trọng số nằm trong page cache, dùng chung giữa các worker.
+    """
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+    from .tflite_backend import TFLiteBackend
+
+    try:
+        backend = TFLiteBackend(model_path, num_threads=num_threads, use_xnnpack=use_xnnpack, prefer_litert=True)
+        # Dựng sẵn interpreter cho mọi batch size worker có thể nhận trước khi báo sẵn sàng
+        for batch_size in warmup_sizes:
+            backend.predict(np.ones((batch_size, backend.input_len), dtype=np.int32))
+    except Exception as e:
+        conn.send((None, None, f"Worker failed to load {model_path}: {str(e)}"))
+        return
+    conn.send((None, (os.getpid(), backend.runtime), None))
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        task_id, padded = task
+        try:
+            conn.send((task_id, backend.predict(padded), None))
+        except Exception as e:
+            conn.send((task_id, None, str(e)))
+
+
+class _Worker:
+    """Một worker process cùng pipe của nó và các task đã gửi mà chưa có kết quả"""
+    def __init__(self, process, conn, restarts: int = 0):
+        self.process = process
+        self.conn = conn
+        self.send_lock = threading.Lock()
+        self.pending: Set[int] = set()
+        self.pid: Optional[int] = None
+        self.ready = False
+        # Số lần liên tiếp worker ở slot này chết trước khi sẵn sàng
+        self.restarts = restarts
+
+
+class InferenceWorkerPool:
+    """
+    N process chạy TFLite interpreter, nhận batch đã tokenize từ process FastAPI.
+    Cùng interface predict(padded) với TFLiteBackend nên ModelBundle dùng được như một backend.
+    Mỗi process có GIL riêng nên một node dùng được hết các core cho /classify.
+
+    Mỗi worker có pipe riêng, không dùng chung queue: worker chết (OOM kill...) không giữ lock
+    của queue chung làm treo các worker khác, và process cha biết chính xác task nào đang nằm
+    ở worker đó để fail ngay.
+
+    Worker chết được khởi động lại với backoff lũy thừa; nếu chết trước khi sẵn sàng quá
+    INFERENCE_WORKER_MAX_RESTARTS lần liên tiếp (file model hỏng, lỗi import...) thì pool
+    bị đánh dấu lỗi (error), /ready báo 503 và task mới bị từ chối.
+    """
+    def __init__(
+        self,
+        model_path: str,
+        num_workers: Optional[int] = None,
+        num_threads: Optional[int] = None,
+        timeout: Optional[float] = None,
+        warmup_batch_sizes: Optional[List[int]] = None
+    ):
+        self.model_path = model_path
+        self.num_workers = num_workers or int(os.getenv('INFERENCE_WORKERS', 2))
+        self.num_threads = num_threads or int(os.getenv('TFLITE_NUM_THREADS', 1))
+        self.timeout = timeout or float(os.getenv('INFERENCE_WORKER_TIMEOUT', 60))
+        # XNNPACK nhanh hơn ~4x nhưng đóng gói lại trọng số conv/dense vào bộ nhớ riêng của từng
+        # process (cỡ bằng file model, tức lại N lần RSS); mặc định tắt để trọng số chỉ nằm
+        # trong file mmap dùng chung
+        self.use_xnnpack = os.getenv('INFERENCE_WORKER_XNNPACK', 'false').lower() == 'true'
+        # Rows per task when a large batch is split across workers
+        self.min_split_rows = int(os.getenv('INFERENCE_WORKER_MIN_SPLIT', 32))
+        self.max_restarts = int(os.getenv('INFERENCE_WORKER_MAX_RESTARTS', 5))
+        self.restart_backoff = float(os.getenv('INFERENCE_WORKER_RESTART_BACKOFF', 0.5))
+
+        self.warmup_sizes = sorted({
+            len(chunk) for batch_size in (warmup_batch_sizes or [])
+            for chunk in self._split(np.empty((batch_size, 0)))
+        })
+
+        self._ctx = mp.get_context('spawn')
+        self._futures: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._task_ids = itertools.count()
+        self._closed = False
+        self.error: Optional[str] = None
+        self._workers: List[_Worker] = [self._spawn() for _ in range(self.num_workers)]
+        # (thời điểm spawn lại, số lần restart liên tiếp) của các slot đang chờ backoff
+        self._respawns: List[Tuple[float, int]] = []
+        self.runtime: Optional[str] = None
+        self._wait_ready()
+
+        self._dispatcher = threading.Thread(target=self._dispatch_results, daemon=True)
+        self._dispatcher.start()
+        print(f"Started {self.num_workers} inference workers for {model_path} (runtime={self.runtime}, pids={self.worker_pids})")
+
+    @property
+    def worker_pids(self) -> List[int]:
+        return [worker.pid for worker in self._workers if worker.pid is not None]
+
+    def _spawn(self, restarts: int = 0) -> _Worker:
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(self.model_path, self.num_threads, self.use_xnnpack, self.warmup_sizes, child_conn),
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        return _Worker(process, parent_conn, restarts)
+
+    def _wait_ready(self) -> None:
+        for worker in self._workers:
+            try:
+                if not worker.conn.poll(self.timeout):
+                    raise RuntimeError("Inference workers did not start in time")
+                _, ready, error = worker.conn.recv()
+            except EOFError:
+                error = "Inference worker exited during startup"
+            except RuntimeError as e:
+                error = str(e)
+            if error is not None:
+                self.close()
+                raise RuntimeError(error)
+            worker.pid, self.runtime = ready
+            worker.ready = True
+
+    def _dispatch_results(self) -> None:
+        while not self._closed:
+            ready = wait([worker.conn for worker in self._workers], timeout=1.0)
+            for worker in list(self._workers):
+                if worker.conn not in ready:
+                    continue
+                try:
+                    task_id, output, error = worker.conn.recv()
+                except (EOFError, OSError):
+                    self._restart(worker)
+                    continue
+                if task_id is None:
+                    # Worker được khởi động lại đã sẵn sàng (hoặc báo lỗi load, pipe sẽ đóng ngay sau)
+                    if output is not None:
+                        worker.pid = output[0]
+                        worker.ready = True
+                        worker.restarts = 0
+                    elif error is not None:
+                        print(f"Inference worker {worker.process.pid}: {error}")
+                    continue
+                with self._lock:
+                    worker.pending.discard(task_id)
+                    future = self._futures.pop(task_id, None)
+                if future is None:
+                    continue
+                if error is not None:
+                    future.set_exception(RuntimeError(f"Inference worker error: {error}"))
+                else:
+                    future.set_result(output)
+            # Worker chết mà pipe chưa báo EOF (vd. còn handle mở ở process khác)
+            for worker in list(self._workers):
+                if not worker.process.is_alive():
+                    self._restart(worker)
+            self._respawn_due()
+
+    def _restart(self, worker: _Worker) -> None:
+        if self._closed or worker not in self._workers:
+            return
+        worker.process.join(timeout=1)
+        # Worker đã phục vụ được thì đếm lại từ đầu, chỉ lỗi lúc khởi động mới cộng dồn
+        restarts = (0 if worker.ready else worker.restarts) + 1
+        # Task đã gửi cho worker này sẽ không bao giờ có kết quả: fail ngay thay vì đợi timeout
+        with self._lock:
+            futures = [self._futures.pop(task_id, None) for task_id in worker.pending]
+            worker.pending.clear()
+            self._workers.remove(worker)
+            if restarts > self.max_restarts:
+                self.error = (
+                    f"Inference worker exited before becoming ready {restarts - 1} times in a row "
+                    f"(last exit code {worker.process.exitcode}), not restarting"
+                )
+            else:
+                delay = self.restart_backoff * 2 ** (restarts - 1)
+                self._respawns.append((time.monotonic() + delay, restarts))
+        worker.conn.close()
+        if self.error is not None:
+            print(self.error)
+        else:
+            print(f"Inference worker {worker.process.pid} exited ({worker.process.exitcode}), restarting in {delay:.1f}s")
+        for future in futures:
+            if future is not None and not future.done():
+                future.set_exception(RuntimeError(f"Inference worker {worker.process.pid} exited while running the task"))
+
+    def _respawn_due(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if self.error is not None or self._closed:
+                return
+            due = [item for item in self._respawns if item[0] <= now]
+            self._respawns = [item for item in self._respawns if item[0] > now]
+            for _, restarts in due:
+                self._workers.append(self._spawn(restarts))
+
+    def _submit(self, padded: np.ndarray) -> Future:
+        if self._closed:
+            raise RuntimeError("Inference worker pool is closed")
+        if self.error is not None:
+            raise RuntimeError(self.error)
+        future: Future = Future()
+        task_id = next(self._task_ids)
+        with self._lock:
+            if not self._workers:
+                raise RuntimeError("No inference worker available, restarting")
+            # Ưu tiên worker đã sẵn sàng, rồi worker đang có ít task chờ nhất
+            worker = min(self._workers, key=lambda w: (not w.ready, len(w.pending)))
+            worker.pending.add(task_id)
+            self._futures[task_id] = future
+        try:
+            with worker.send_lock:
+                worker.conn.send((task_id, np.ascontiguousarray(padded, dtype=np.int32)))
+        except (BrokenPipeError, OSError):
+            with self._lock:
+                worker.pending.discard(task_id)
+                self._futures.pop(task_id, None)
+            raise RuntimeError("Inference worker exited, try again")
+        return future
+
+    def _split(self, padded: np.ndarray) -> List[np.ndarray]:
+        parts = min(self.num_workers, max(1, len(padded) // self.min_split_rows))
+        return np.array_split(padded, parts)
+
+    def predict(self, padded: np.ndarray) -> np.ndarray:
+        """Label probabilities for a (batch, max_len) array, split across workers when large"""
+        futures = [self._submit(chunk) for chunk in self._split(padded)]
+        try:
+            return np.concatenate([future.result(timeout=self.timeout) for future in futures], axis=0)
+        except FutureTimeoutError:
+            raise RuntimeError(f"Inference worker did not answer within {self.timeout}s")
+
+    def get_stats(self) -> Dict[str, object]:
+        with self._lock:
+            pending = len(self._futures)
+        return {
+            "workers": self.num_workers,
+            "alive": sum(1 for worker in self._workers if worker.process.is_alive()),
+            "restarting": len(self._respawns),
+            "error": self.error,
+            "pids": self.worker_pids,
+            "pending_tasks": pending,
+            "runtime": self.runtime,
+            "xnnpack": self.use_xnnpack,
+        }
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        for worker in self._workers:
+            try:
+                with worker.send_lock:
+                    worker.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self._workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.conn.close()
+        with self._lock:
+            for future in self._futures.values():
+                if not future.done():
+                    future.set_exception(RuntimeError("Inference worker pool closed"))
+            self._futures.clear()
+        print(f"Stopped inference workers for {self.model_path}")
@@ -0,0 +1,240 @@
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .training_manager import TrainingJobManager
+
+
+class TrainingQueueFullError(RuntimeError):
+    """Raised when TRAINING_QUEUE_SIZE jobs are already waiting"""
+
+
+class JobNotFoundError(KeyError):
+    """Raised when cancelling a job the scheduler does not know"""
+
+
+FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+
+RunJob = Callable[[str, str, List[Dict[str, Any]], Dict[str, Any], threading.Event], None]
+
+
+class TrainingJobScheduler:
+    """
+    Hàng đợi job train có giới hạn: TRAINING_SLOTS job chạy cùng lúc, phần còn lại chờ
+    theo priority (cao trước), cùng priority thì FIFO.
+
+    Mỗi job đang chờ hoặc đang chạy được ghi ra một file JSON trong TRAINING_QUEUE_DIR,
+    xóa khi job kết thúc; khởi động lại service sẽ đưa các job chưa xong vào hàng đợi lại.
+    """
+    def __init__(
+        self,
+        job_manager: TrainingJobManager,
+        run_job: RunJob,
+        slots: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        queue_dir: Optional[str] = None
+    ):
+        self.job_manager = job_manager
+        self.run_job = run_job
+        self.slots = slots or int(os.getenv('TRAINING_SLOTS', 1))
+        self.max_queue = max_queue or int(os.getenv('TRAINING_QUEUE_SIZE', 16))
+        self.queue_dir = queue_dir or os.getenv('TRAINING_QUEUE_DIR', 'ml_models/training_queue')
+
+        self._heap: List[Tuple[int, int, str]] = []
+        # jobId -> (seq, entry); item trong heap chỉ còn hiệu lực khi seq khớp, vì job bị hủy
+        # rồi gửi lại cùng jobId để lại item cũ (priority/thứ tự cũ) trong heap
+        self._queued: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        self._running: Dict[str, threading.Event] = {}
+        # Job bị người dùng hủy, phân biệt với job bị dừng do service tắt
+        self._user_cancelled = set()
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._stopped = False
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        self._restore()
+        restored = len(self._queued)
+        for idx in range(self.slots):
+            thread = threading.Thread(target=self._worker, name=f"training-slot-{idx}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"Training scheduler started ({self.slots} slots, {restored} queued jobs restored)")
+
+    def stop(self) -> None:
+        """Stop taking jobs; running jobs are asked to stop and stay persisted for the next start"""
+        with self._cond:
+            self._stopped = True
+            for job_id, event in self._running.items():
+                job = self.job_manager.get_job(job_id)
+                if job and job['status'] in ('completed', 'failed'):
+                    # Đã xong nhưng slot chưa kịp dọn, không chạy lại khi khởi động
+                    self._forget(job_id)
+                else:
+                    event.set()
+            self._cond.notify_all()
+
+    def _job_file(self, job_id: str) -> str:
+        safe_id = ''.join(c if c.isalnum() or c in '-_' else '_' for c in job_id)
+        return os.path.join(self.queue_dir, f"{safe_id}.json")
+
+    def _persist(self, entry: Dict[str, Any]) -> None:
+        os.makedirs(self.queue_dir, exist_ok=True)
+        path = self._job_file(entry['jobId'])
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _forget(self, job_id: str) -> None:
+        try:
+            os.remove(self._job_file(job_id))
+        except FileNotFoundError:
+            pass
+
+    def _restore(self) -> None:
+        if not os.path.isdir(self.queue_dir):
+            return
+        entries = []
+        for name in os.listdir(self.queue_dir):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.queue_dir, name), 'r', encoding='utf-8') as f:
+                    entries.append(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"Skipping unreadable queued job {name}: {str(e)}")
+        # Giữ thứ tự gửi ban đầu trong cùng priority
+        for entry in sorted(entries, key=lambda item: item.get('submittedAt', 0)):
+            if self.job_manager.get_job(entry['jobId']) is None:
+                self.job_manager.create_job(entry['jobId'], entry['modelType'])
+            self._enqueue(entry)
+
+    def _enqueue(self, entry: Dict[str, Any]) -> None:
+        seq = next(self._seq)
+        self._queued[entry['jobId']] = (seq, entry)
+        heapq.heappush(self._heap, (-entry['priority'], seq, entry['jobId']))
+        self.job_manager.update_status(entry['jobId'], 'queued')
+
+    def submit(
+        self,
+        job_id: str,
+        model_type: str,
+        samples: List[Dict[str, Any]],
+        hyperparameters: Dict[str, Any],
+        priority: int = 0
+    ) -> int:
+        """Queue a training job; returns its position in the queue (0 = next to run)"""
+        with self._cond:
+            if job_id in self._queued or job_id in self._running:
+                raise ValueError(f"Job {job_id} is already queued or running")
+            if len(self._queued) >= self.max_queue:
+                raise TrainingQueueFullError(f"Training queue is full ({self.max_queue} jobs waiting)")
+            entry = {
+                'jobId': job_id,
+                'modelType': model_type,
+                'samples': samples,
+                'hyperparameters': hyperparameters,
+                'priority': priority,
+                'submittedAt': time.time(),
+            }
+            self._persist(entry)
+            self.job_manager.create_job(job_id, model_type)
+            self._enqueue(entry)
+            self._cond.notify()
+            return self._position(job_id)
+
+    def _is_live(self, item: Tuple[int, int, str]) -> bool:
+        queued = self._queued.get(item[2])
+        return queued is not None and queued[0] == item[1]
+
+    def _position(self, job_id: str) -> Optional[int]:
+        if job_id not in self._queued:
+            return None
+        order = sorted(item for item in self._heap if self._is_live(item))
+        return next(idx for idx, item in enumerate(order) if item[2] == job_id)
+
+    def get_position(self, job_id: str) -> Optional[int]:
+        with self._cond:
+            return self._position(job_id)
+
+    def cancel(self, job_id: str) -> str:
+        """
+        Cancel a queued or running job. Queued jobs are dropped immediately; running jobs
+        stop at the next training batch. Returns the job status after the call.
+        """
+        with self._cond:
+            if job_id in self._queued:
+                # Item trong heap không còn khớp seq nên bị bỏ qua khi tới lượt
+                del self._queued[job_id]
+                self._forget(job_id)
+                self.job_manager.cancel_job(job_id)
+                return 'cancelled'
+            event = self._running.get(job_id)
+            job = self.job_manager.get_job(job_id)
+            if event is not None and not (job and job['status'] in FINISHED_STATUSES):
+                self._user_cancelled.add(job_id)
+                event.set()
+                self.job_manager.add_log(job_id, "Cancellation requested, stopping at the next batch")
+                return 'cancelling'
+        if job is None:
+            raise JobNotFoundError(job_id)
+        return job['status']
+
+    def _next_job(self) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            while not self._stopped:
+                while self._heap:
+                    item = heapq.heappop(self._heap)
+                    if not self._is_live(item):
+                        continue
+                    job_id = item[2]
+                    _, entry = self._queued.pop(job_id)
+                    self._running[job_id] = threading.Event()
+                    return entry
+                self._cond.wait()
+            return None
+
+    def _worker(self) -> None:
+        while True:
+            entry = self._next_job()
+            if entry is None:
+                return
+            job_id = entry['jobId']
+            cancel_event = self._running[job_id]
+            try:
+                self.run_job(job_id, entry['modelType'], entry['samples'], entry['hyperparameters'], cancel_event)
+            except Exception as e:
+                print(f" Training slot error for job {job_id}: {str(e)}")
+            finally:
+                job = self.job_manager.get_job(job_id)
+                with self._cond:
+                    del self._running[job_id]
+                    # Dừng vì service tắt (chưa xong, không phải người dùng hủy) thì giữ file để chạy lại
+                    interrupted = (
+                        self._stopped and job_id not in self._user_cancelled
+                        and not (job and job['status'] in ('completed', 'failed'))
+                    )
+                    self._user_cancelled.discard(job_id)
+                    if not interrupted:
+                        self._forget(job_id)
+                # Bỏ tham chiếu tới samples ngay khi job xong
+                entry = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            queued = sorted(item for item in self._heap if self._is_live(item))
+            return {
+                "slots": self.slots,
+                "max_queue": self.max_queue,
+                "running": list(self._running.keys()),
+                "queued": [
+                    {"jobId": job_id, "priority": -neg_priority, "position": idx}
+                    for idx, (neg_priority, _, job_id) in enumerate(queued)
+                ],
+            }
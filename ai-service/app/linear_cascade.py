@@ -0,0 +1,149 @@
+import os
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+# Các band được thử trên tập holdout khi train để chọn CASCADE_LOW/CASCADE_HIGH
+CANDIDATE_BANDS = [(0.05, 0.95), (0.1, 0.9), (0.2, 0.8), (0.3, 0.7)]
+
+
+def get_cascade_band() -> Tuple[float, float]:
+    low = float(os.getenv('CASCADE_LOW', 0.1))
+    high = float(os.getenv('CASCADE_HIGH', 0.9))
+    if not 0.0 <= low <= high <= 1.0:
+        raise ValueError("CASCADE_LOW and CASCADE_HIGH must satisfy 0 <= low <= high <= 1")
+    return low, high
+
+
+def uncertain_rows(probabilities: np.ndarray, low: float, high: float) -> np.ndarray:
+    """Boolean mask of rows with at least one label probability inside [low, high]"""
+    return ((probabilities >= low) & (probabilities <= high)).any(axis=1)
+
+
+class LinearCascadeModel:
+    """
+    Tầng đầu của cascade: HashingVectorizer (không cần lưu vocab) + SGD logistic regression
+    one-vs-rest cho từng nhãn. Chỉ email có nhãn nằm trong vùng không chắc chắn mới
+    được chuyển sang model neural.
+    """
+    def __init__(self, n_features: int = 2 ** 18, alpha: float = 1e-5, max_iter: int = 20):
+        # Import trễ: MLService import module này khi khởi động, trước khi có model nào
+        from sklearn.feature_extraction.text import HashingVectorizer
+        from sklearn.linear_model import SGDClassifier
+        from sklearn.multiclass import OneVsRestClassifier
+
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features,
+            ngram_range=(1, 2),
+            alternate_sign=False,
+            norm='l2',
+            lowercase=True
+        )
+        self.classifier = OneVsRestClassifier(
+            SGDClassifier(loss='log_loss', alpha=alpha, max_iter=max_iter, tol=1e-4, random_state=42)
+        )
+        self.classes: List[str] = []
+
+    def fit(self, texts: Sequence[str], y: np.ndarray, classes: Sequence[str]) -> 'LinearCascadeModel':
+        self.classifier.fit(self.vectorizer.transform(texts), y)
+        self.classes = list(classes)
+        return self
+
+    def partial_fit(self, texts: Sequence[str], y: np.ndarray) -> 'LinearCascadeModel':
+        """Tiếp tục train model đã fit trên dữ liệu mới (warm start), giữ nguyên thứ tự nhãn"""
+        # Nhãn toàn 0 (hoặc toàn 1) lúc fit được lưu bằng predictor hằng, không partial_fit được:
+        # khi đó fit lại từ đầu trên dữ liệu mới
+        if any(not hasattr(estimator, 'partial_fit') for estimator in self.classifier.estimators_):
+            print("Linear cascade model has constant labels, refitting on the new samples")
+            return self.fit(texts, y, self.classes)
+        self.classifier.partial_fit(self.vectorizer.transform(texts), y)
+        return self
+
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        probabilities = self.classifier.predict_proba(self.vectorizer.transform(texts))
+        return np.asarray(probabilities, dtype=np.float32)
+
+
+def _subset_metrics(y_true: np.ndarray, probabilities: np.ndarray) -> Dict[str, float]:
+    from sklearn.metrics import accuracy_score, f1_score
+    y_pred = (probabilities > 0.5).astype(int)
+    return {
+        'subsetAccuracy': float(accuracy_score(y_true, y_pred)),
+        'f1Micro': float(f1_score(y_true, y_pred, average='micro', zero_division=0)),
+        'f1Macro': float(f1_score(y_true, y_pred, average='macro', zero_division=0)),
+    }
+
+
+def evaluate_cascade(
+    y_true: np.ndarray,
+    linear_probs: np.ndarray,
+    neural_probs: np.ndarray,
+    bands: Optional[List[Tuple[float, float]]] = None
+) -> Dict[str, Any]:
+    """
+    Holdout metrics of the linear model, the neural model and the cascade at each band,
+    with the escalation rate and the accuracy delta against the neural-only path.
+    """
+    neural = _subset_metrics(y_true, neural_probs)
+    result: Dict[str, Any] = {
+        'linear': _subset_metrics(y_true, linear_probs),
+        'neural': neural,
+        'bands': [],
+        'holdoutSamples': int(len(y_true))
+    }
+    for low, high in bands or CANDIDATE_BANDS:
+        escalate = uncertain_rows(linear_probs, low, high)
+        cascade_probs = np.where(escalate[:, None], neural_probs, linear_probs)
+        cascade = _subset_metrics(y_true, cascade_probs)
+        result['bands'].append({
+            'low': low,
+            'high': high,
+            'escalationRate': float(escalate.mean()) if len(escalate) else 0.0,
+            'metrics': cascade,
+            'delta': {name: cascade[name] - neural[name] for name in neural}
+        })
+    return result
+
+
+class CascadeStats:
+    """
+    Bộ đếm của cascade lúc phục vụ. Một phần email không bị escalate (CASCADE_SHADOW_RATE)
+    vẫn được chạy qua model neural để đo mức khớp nhãn giữa cascade và neural-only.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._scored = 0
+        self._escalated = 0
+        self._shadow_compared = 0
+        self._shadow_agreed = 0
+        self._shadow_label_agreed = 0
+        self._shadow_labels = 0
+
+    def record(self, scored: int, escalated: int) -> None:
+        with self._lock:
+            self._scored += scored
+            self._escalated += escalated
+
+    def record_shadow(self, linear_probs: np.ndarray, neural_probs: np.ndarray) -> None:
+        linear_labels = linear_probs > 0.5
+        neural_labels = neural_probs > 0.5
+        with self._lock:
+            self._shadow_compared += len(linear_labels)
+            self._shadow_agreed += int((linear_labels == neural_labels).all(axis=1).sum())
+            self._shadow_label_agreed += int((linear_labels == neural_labels).sum())
+            self._shadow_labels += linear_labels.size
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "scored": self._scored,
+                "escalated": self._escalated,
+                "escalation_rate": self._escalated / self._scored if self._scored else 0.0,
+                "shadow_compared": self._shadow_compared,
+                "shadow_subset_agreement": (
+                    self._shadow_agreed / self._shadow_compared if self._shadow_compared else None
+                ),
+                "shadow_label_agreement": (
+                    self._shadow_label_agreed / self._shadow_labels if self._shadow_labels else None
+                ),
+            }
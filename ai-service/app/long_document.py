@@ -0,0 +1,76 @@
+import os
+from typing import List, Optional, Tuple
+import numpy as np
+
+
+class LongDocumentConfig:
+    """
+    Chế độ email dài (LONG_DOC_MODE): chuỗi token được cắt thành các cửa sổ max_len chồng lấn
+    nhau theo stride, mọi cửa sổ của mọi email chạy chung một forward pass rồi gộp lại
+    theo email bằng max hoặc mean.
+    """
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        pooling: Optional[str] = None,
+        stride: Optional[int] = None,
+        max_windows: Optional[int] = None
+    ):
+        self.enabled = enabled if enabled is not None else os.getenv('LONG_DOC_MODE', 'false').lower() == 'true'
+        self.pooling = (pooling or os.getenv('LONG_DOC_POOLING', 'max')).lower()
+        if self.pooling not in ('max', 'mean'):
+            raise ValueError(f"Unknown LONG_DOC_POOLING: {self.pooling}")
+        # 0 => max_len // 2
+        self.stride = stride if stride is not None else int(os.getenv('LONG_DOC_STRIDE', 0))
+        # Giới hạn số cửa sổ mỗi email để một email cực dài không chiếm cả batch
+        self.max_windows = max_windows or int(os.getenv('LONG_DOC_MAX_WINDOWS', 16))
+
+    def stride_for(self, max_len: int) -> int:
+        return self.stride if 0 < self.stride <= max_len else max(1, max_len // 2)
+
+    def max_tokens(self, max_len: int) -> int:
+        """Số token tối đa cần tokenize cho một email"""
+        return max_len + self.stride_for(max_len) * (self.max_windows - 1)
+
+
+def make_windows(
+    sequences: List[List[int]],
+    max_len: int,
+    stride: int,
+    max_windows: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Overlapping, post-padded (num_windows, max_len) int32 windows over every sequence,
+    built with one gather instead of a loop per window.
+    Returns the windows and, per sequence, the index of its first window.
+    """
+    lengths = np.fromiter((len(ids) for ids in sequences), dtype=np.int64, count=len(sequences))
+    # Email ngắn hơn max_len (kể cả rỗng) vẫn có đúng một cửa sổ như đường thường
+    counts = 1 + np.ceil(np.maximum(lengths - max_len, 0) / stride).astype(np.int64)
+    counts = np.minimum(counts, max_windows)
+
+    # Mỗi chuỗi được nối kèm max_len số 0: ô nằm sau cuối email đọc ra padding,
+    # không cần mask và không đọc sang email kế tiếp
+    padding = np.zeros(max_len, dtype=np.int32)
+    flat = np.concatenate([
+        piece for ids in sequences for piece in (np.asarray(ids, dtype=np.int32), padding)
+    ]) if sequences else padding
+    offsets = np.zeros(len(sequences), dtype=np.int64)
+    np.cumsum(lengths[:-1] + max_len, out=offsets[1:])
+
+    first_window = np.zeros(len(sequences), dtype=np.int64)
+    np.cumsum(counts[:-1], out=first_window[1:])
+    owners = np.repeat(np.arange(len(sequences)), counts)
+    window_idx = np.arange(len(owners)) - first_window[owners]
+
+    starts = offsets[owners] + window_idx * stride
+    windows = flat[starts[:, None] + np.arange(max_len)[None, :]]
+    return windows, first_window
+
+
+def pool_windows(probabilities: np.ndarray, first_window: np.ndarray, pooling: str = 'max') -> np.ndarray:
+    """Per-sequence probabilities from per-window probabilities (windows of a sequence are contiguous)"""
+    if pooling == 'max':
+        return np.maximum.reduceat(probabilities, first_window, axis=0)
+    counts = np.diff(np.append(first_window, len(probabilities)))
+    return np.add.reduceat(probabilities, first_window, axis=0) / counts[:, None]
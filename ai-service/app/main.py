@@ -1,15 +1,24 @@
 
+import asyncio
+import json
 import os
 import threading
-from typing import Dict
-from fastapi import FastAPI, HTTPException, Header, Depends, BackgroundTasks
+import time
+from typing import Dict, Optional
+from fastapi import FastAPI, HTTPException, Header, Depends, BackgroundTasks, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
 from app.models import *
-from app.ml_service import MLService
+from app.ml_service import MLService, ModelNotReadyError
+from app.batch_scheduler import MicroBatchScheduler
+from app.inference_executor import BoundedExecutor, ExecutorBusyError
+from app.job_scheduler import JobNotFoundError, TrainingJobScheduler, TrainingQueueFullError
+from app.metrics import REGISTRY, MetricsMiddleware, observe_stage
+from app.model_registry import ModelLookupError, ModelNotFoundError
+from app.ndjson_stream import NDJSONStreamingResponse, StreamExemptContentSizeLimitMiddleware, iter_ndjson_lines, ndjson_line
 from app.training_manager import TrainingJobManager
-from app.training_service import TrainingService
-from content_size_limit_asgi import ContentSizeLimitMiddleware
+from app.training_worker import TrainingProcessRunner
 
 load_dotenv()
 
@@ -29,14 +38,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+STREAM_PATHS = {"/api/v1/classify/stream"}
 app.add_middleware(
-    ContentSizeLimitMiddleware, 
-    max_content_size=10485760
+    StreamExemptContentSizeLimitMiddleware, 
+    max_content_size=10485760,
+    # Endpoint streaming tự giới hạn theo từng dòng
+    exempt_paths=STREAM_PATHS
 )
 
+# Ngoài cùng để đo cả thời gian của các middleware khác
+app.add_middleware(MetricsMiddleware)
+
 ml_service = MLService()
+# TensorFlow inference chạy trên pool riêng để event loop luôn phản hồi được
+inference_executor = BoundedExecutor(
+    "inference",
+    # Với INFERENCE_WORKERS, mỗi worker process cần một thread gửi batch sang
+    max_workers=max(int(os.getenv("INFERENCE_THREADS", 2)), int(os.getenv("INFERENCE_WORKERS", 0))),
+    max_queue=int(os.getenv("INFERENCE_QUEUE_SIZE", 64)),
+)
+# Các tác vụ blocking khác (lưu model, ghi file)
+blocking_executor = BoundedExecutor(
+    "blocking",
+    max_workers=int(os.getenv("BLOCKING_THREADS", 2)),
+    max_queue=int(os.getenv("BLOCKING_QUEUE_SIZE", 16)),
+)
+batch_scheduler = MicroBatchScheduler(ml_service, inference_executor)
 training_manager = TrainingJobManager()
-training_service = TrainingService(training_manager)
+_training_service = None
+
+def get_training_service():
+    """TrainingService kéo theo TensorFlow nên chỉ import khi có job train đầu tiên"""
+    global _training_service
+    if _training_service is None:
+        from app.training_service import TrainingService
+        _training_service = TrainingService(training_manager)
+    return _training_service
 API_KEY = os.getenv("API_KEY", "dev-secret-key-12345")
 
 def verify_api_key(x_api_key: str = Header(..., alias="X-API-Key")) -> str:
@@ -60,26 +97,120 @@ async def health_check() -> HealthResponse:
         model_loaded=ml_service.is_model_loaded(),
     )
     
+@app.get("/live", tags=["Health"])
+async def liveness_probe() -> Dict[str, str]:
+    """Process is up and serving HTTP (model may still be loading)"""
+    return {"status": "alive"}
+
+@app.get("/ready", tags=["Health"])
+async def readiness_probe() -> JSONResponse:
+    """200 only once the model is loaded and warmed up and its inference workers are healthy, 503 otherwise"""
+    startup = ml_service.get_startup_info()
+    if not ml_service.is_ready():
+        return JSONResponse(status_code=503, content={
+            "status": "not_ready", "startup": startup, "error": ml_service.get_backend_error()
+        })
+    return JSONResponse(content={"status": "ready", "startup": startup})
+
+def _observe_parse(http_request: Request) -> None:
+    """Thời gian từ khi nhận request tới khi vào handler: đọc body, xác thực API key, validate pydantic"""
+    request_start = getattr(http_request.state, 'request_start', None)
+    if request_start is not None:
+        observe_stage('parse', time.perf_counter() - request_start)
+
 @app.post("/api/v1/classify", response_model=ClassifyResponse, responses={
         200: {"model": ClassifyResponse},  
         400: {"model": ErrorResponse},     
         401: {"model": ErrorResponse},     
+        404: {"model": ErrorResponse},
         500: {"model": ErrorResponse},     
     }, tags=["Classification"], dependencies=[Depends(verify_api_key)],)
-async def classify_email(request: ClassifyRequest) -> ClassifyResponse:
+async def classify_email(request: ClassifyRequest, http_request: Request) -> JSONResponse:
     """
     Classify email with multi-label support
     Returns list of predicted labels with confidence scores
     """
+    _observe_parse(http_request)
     try:
-        # ml_service.predict now returns List[Dict] for multi-label
-        predicted_labels = ml_service.predict(
+        # Concurrent requests are coalesced into one forward pass
+        predicted_labels = await batch_scheduler.submit(
             title=request.title,     
-            content=request.content   
+            content=request.content,
+            model_id=request.modelId,
+            model_path=request.modelPath,
+            threshold=request.threshold,
+            top_k=request.topK
         )
         
-        return ClassifyResponse(labels=predicted_labels)
+        # Nhãn được tạo từ xác suất của model nên không cần validate lại từng nhãn
+        start = time.perf_counter()
+        response = JSONResponse(content={"labels": predicted_labels})
+        observe_stage('serialize', time.perf_counter() - start)
+        return response
 
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ModelNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ModelLookupError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ModelNotReadyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Model prediction failed: {str(e)}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Internal server error: {str(e)}"
+        )
+@app.post("/api/v1/classify/batch", response_model=BatchClassifyResponse, responses={
+        200: {"model": BatchClassifyResponse},
+        400: {"model": ErrorResponse},
+        401: {"model": ErrorResponse},
+        404: {"model": ErrorResponse},
+        500: {"model": ErrorResponse},
+    }, tags=["Classification"], dependencies=[Depends(verify_api_key)],)
+async def classify_email_batch(request: BatchClassifyRequest, http_request: Request) -> JSONResponse:
+    """
+    Classify many emails with one tokenization pass and one forward pass
+    Returns predicted labels per email, in request order
+    """
+    _observe_parse(http_request)
+    # Cả batch chạy một forward pass trên một model nên chỉ chọn model ở cấp batch
+    if any(item.modelId is not None or item.modelPath is not None for item in request.items):
+        raise HTTPException(status_code=400, detail="modelId/modelPath apply to the whole batch, set them next to items")
+    try:
+        # threshold/topK của từng item được ưu tiên hơn giá trị chung của batch
+        default_threshold = request.threshold if request.threshold is not None else 0.5
+        predicted = await inference_executor.run(
+            ml_service.predict_batch,
+            [(item.title, item.content) for item in request.items],
+            threshold=[item.threshold if item.threshold is not None else default_threshold for item in request.items],
+            top_k=[item.topK if item.topK is not None else request.topK for item in request.items],
+            model_id=request.modelId,
+            model_path=request.modelPath
+        )
+        
+        start = time.perf_counter()
+        response = JSONResponse(content={"results": [{"labels": labels} for labels in predicted]})
+        observe_stage('serialize', time.perf_counter() - start)
+        return response
+
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ModelNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ModelLookupError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ModelNotReadyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except RuntimeError as e:
         raise HTTPException(
             status_code=500, 
@@ -92,39 +223,270 @@ async def classify_email(request: ClassifyRequest) -> ClassifyResponse:
         )
 @app.get("/api/v1/model/info", tags=["Model"])
 async def get_model_info() -> Dict:
-    return ml_service.get_model_info()
+    return {
+        **ml_service.get_model_info(),
+        "registry": ml_service.get_registry_stats()
+    }
+
+@app.post("/api/v1/model/reload", tags=["Model"], dependencies=[Depends(verify_api_key)],)
+async def reload_model(request: Optional[ReloadModelRequest] = None) -> Dict:
+    """
+    Load, warm up and hot swap the model without restarting the service
+    """
+    try:
+        model_path = request.modelPath if request else None
+        if model_path:
+            # Giống modelPath của /classify: chỉ load (unpickle) file nằm trong MODEL_DIR
+            model_path = ml_service.get_registry().check_path(model_path)
+        return await blocking_executor.run(ml_service.reload_model, model_path)
+    except ModelNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/v1/classify/stats", tags=["Classification"])
+async def get_batching_stats() -> Dict:
+    return {
+        **batch_scheduler.get_stats(),
+        "inference_executor": inference_executor.get_stats(),
+        "blocking_executor": blocking_executor.get_stats(),
+        "prediction_cache": ml_service.get_cache_stats(),
+        "near_duplicates": ml_service.get_near_duplicate_stats(),
+        "cascade": ml_service.get_cascade_stats(),
+        "model_registry": ml_service.get_registry_stats(),
+    }
+
+CACHE_LOOKUPS = REGISTRY.counter('prediction_cache_lookups_total', 'Prediction cache lookups', ['result'])
+CACHE_ENTRIES = REGISTRY.gauge('prediction_cache_entries', 'Entries in the prediction cache')
+NEAR_DUP_LOOKUPS = REGISTRY.counter('near_duplicate_lookups_total', 'Near-duplicate index lookups', ['result'])
+NEAR_DUP_ENTRIES = REGISTRY.gauge('near_duplicate_entries', 'Emails in the near-duplicate window')
+NEAR_DUP_MEMORY = REGISTRY.gauge('near_duplicate_memory_bytes', 'Approximate memory of the near-duplicate index')
+CASCADE_SCORED = REGISTRY.counter('cascade_scored_total', 'Emails scored by the linear cascade stage')
+CASCADE_ESCALATED = REGISTRY.counter('cascade_escalated_total', 'Emails escalated from the linear stage to the neural model')
+EXECUTOR_QUEUE_DEPTH = REGISTRY.gauge('executor_queue_depth', 'Tasks waiting for an executor thread', ['executor'])
+EXECUTOR_RUNNING = REGISTRY.gauge('executor_running_tasks', 'Tasks running on an executor', ['executor'])
+EXECUTOR_REJECTED = REGISTRY.counter('executor_rejected_total', 'Tasks rejected because the executor queue was full', ['executor'])
+SCHEDULER_QUEUE_DEPTH = REGISTRY.gauge('batch_scheduler_queue_depth', 'Requests waiting for the micro-batch scheduler')
+MODEL_LOADED = REGISTRY.gauge('model_loaded', 'Whether the active model is loaded and warmed up')
+MODEL_INFO = REGISTRY.gauge('model_info', 'Active model', ['model_path', 'model_type', 'backend'])
+MODEL_RELOADS = REGISTRY.counter('model_reloads_total', 'Hot swaps of the active model')
+MODEL_STARTUP_SECONDS = REGISTRY.gauge('model_startup_seconds', 'Time to import, load and warm up the model at startup', ['phase'])
+REGISTRY_MODELS = REGISTRY.gauge('model_registry_loaded_models', 'Non-active models kept in the model registry')
+REGISTRY_BYTES = REGISTRY.gauge('model_registry_used_bytes', 'Estimated memory of the active model and the models in the registry')
+TRAINING_JOBS = REGISTRY.gauge('training_jobs', 'Training jobs by status', ['status'])
 
-def run_training_in_background(job_id: str, model_type: str, samples: list, hyperparameters: dict):
+def _collect_metrics() -> None:
+    """Chép số liệu từ get_stats() của các thành phần vào metric lúc scrape"""
+    cache = ml_service.get_cache_stats()
+    if cache.get("enabled"):
+        CACHE_LOOKUPS.set_total(cache["hits"], result="hit")
+        CACHE_LOOKUPS.set_total(cache["misses"], result="miss")
+        CACHE_ENTRIES.set(cache["size"])
+
+    near_duplicates = ml_service.get_near_duplicate_stats()
+    if near_duplicates.get("enabled"):
+        NEAR_DUP_LOOKUPS.set_total(near_duplicates["skips"], result="skip")
+        NEAR_DUP_LOOKUPS.set_total(near_duplicates["lookups"] - near_duplicates["skips"], result="miss")
+        NEAR_DUP_ENTRIES.set(near_duplicates["size"])
+        NEAR_DUP_MEMORY.set(near_duplicates["memory_bytes"])
+
+    cascade = ml_service.get_cascade_stats()
+    if cascade["enabled"]:
+        CASCADE_SCORED.set_total(cascade["scored"])
+        CASCADE_ESCALATED.set_total(cascade["escalated"])
+
+    for executor in (inference_executor, blocking_executor):
+        stats = executor.get_stats()
+        EXECUTOR_QUEUE_DEPTH.set(stats["queue_depth"], executor=executor.name)
+        EXECUTOR_RUNNING.set(stats["running"], executor=executor.name)
+        EXECUTOR_REJECTED.set_total(stats["rejected"], executor=executor.name)
+    SCHEDULER_QUEUE_DEPTH.set(batch_scheduler.get_stats()["queue_depth"])
+
+    info = ml_service.get_model_info()
+    MODEL_LOADED.set(1 if info["loaded"] else 0)
+    MODEL_INFO.replace(
+        [({"model_path": info["model_path"], "model_type": info["model_type"], "backend": info["backend"]}, 1)]
+        if info["loaded"] else []
+    )
+    MODEL_RELOADS.set_total(info.get("reload_count", 0))
+    MODEL_STARTUP_SECONDS.replace(
+        ({"phase": key[:-len("_seconds")]}, value)
+        for key, value in info["startup"].items() if key.endswith("_seconds")
+    )
+
+    registry = ml_service.get_registry_stats()
+    REGISTRY_MODELS.set(len(registry.get("models", [])))
+    REGISTRY_BYTES.set(registry.get("used_bytes", 0))
+
+    jobs = {
+        "pending": 0, "queued": 0, "running": 0, "completed": 0, "failed": 0, "cancelled": 0,
+        **training_manager.count_by_status()
+    }
+    TRAINING_JOBS.replace(({"status": status}, count) for status, count in jobs.items())
+
+REGISTRY.add_collector(_collect_metrics)
+
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    """Prometheus text exposition of latency histograms, batch sizes, cache, executor and model gauges"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", 256))
+STREAM_MAX_LINE_BYTES = int(os.getenv("STREAM_MAX_LINE_BYTES", 1048576))
+
+async def _run_stream_batch(batch: list, threshold: Optional[float], top_k: Optional[int], model_id: Optional[int], model_path: Optional[str]) -> list:
+    items = [(item.title, item.content) for _, _, item in batch]
+    thresholds = [item.threshold if item.threshold is not None else threshold for _, _, item in batch]
+    top_ks = [item.topK if item.topK is not None else top_k for _, _, item in batch]
+    while True:
+        try:
+            return await inference_executor.run(
+                ml_service.predict_batch,
+                items,
+                threshold=thresholds,
+                top_k=top_ks,
+                model_id=model_id,
+                model_path=model_path,
+                isolate_errors=True
+            )
+        except ExecutorBusyError:
+            # Bulk job nhường chỗ cho request tương tác thay vì làm hỏng cả stream
+            await asyncio.sleep(0.05)
+
+def _stream_batch_lines(batch: list, results: list) -> bytes:
+    # Dòng có threshold sai nhận bản ghi lỗi riêng, các dòng khác trong batch vẫn có nhãn
+    return b"".join(
+        ndjson_line(
+            {"line": line_no, "id": item_id, "error": str(labels)} if isinstance(labels, ValueError)
+            else {"line": line_no, "id": item_id, "labels": labels}
+        )
+        for (line_no, item_id, _), labels in zip(batch, results)
+    )
+
+async def _finish_stream_batch(batch: list, task: asyncio.Task) -> bytes:
     try:
-        training_service.train_model(
+        return _stream_batch_lines(batch, await task)
+    except Exception as e:
+        return b"".join(ndjson_line({"line": line_no, "id": item_id, "error": str(e)}) for line_no, item_id, _ in batch)
+
+@app.post("/api/v1/classify/stream", tags=["Classification"], dependencies=[Depends(verify_api_key)],)
+async def classify_email_stream(
+    request: Request,
+    threshold: Optional[float] = Query(None, ge=0.0, le=1.0),
+    topK: Optional[int] = Query(None, ge=1),
+    modelId: Optional[int] = Query(None),
+    modelPath: Optional[str] = Query(None),
+    batchSize: int = Query(STREAM_BATCH_SIZE, ge=1, le=1000),
+) -> NDJSONStreamingResponse:
+    """
+    Classify an NDJSON body of emails ({"id", "title", "content"} per line) and stream back
+    one NDJSON result per line as each internal batch completes.
+    The body is read incrementally, so memory stays flat regardless of the number of emails;
+    invalid lines produce an {"line", "error"} result instead of failing the stream.
+    Clients should read the response while still sending the body; a client that only reads
+    after uploading everything stalls once the socket buffers fill up.
+    """
+    async def results():
+        batch = []
+        pending = None
+        try:
+            async for line_no, line in iter_ndjson_lines(request.stream(), STREAM_MAX_LINE_BYTES):
+                try:
+                    raw = json.loads(line)
+                    item = ClassifyRequest.model_validate(raw)
+                except (ValueError, TypeError) as e:
+                    yield ndjson_line({"line": line_no, "error": str(e)})
+                    continue
+                batch.append((line_no, raw.get("id"), item))
+                if len(batch) < batchSize:
+                    continue
+
+                # Batch trước chạy trên executor trong khi batch này được đọc và parse
+                if pending is not None:
+                    yield await _finish_stream_batch(*pending)
+                pending = (batch, asyncio.create_task(_run_stream_batch(batch, threshold, topK, modelId, modelPath)))
+                batch = []
+        except ValueError as e:
+            yield ndjson_line({"error": str(e)})
+
+        if pending is not None:
+            yield await _finish_stream_batch(*pending)
+        if batch:
+            yield await _finish_stream_batch(batch, asyncio.create_task(_run_stream_batch(batch, threshold, topK, modelId, modelPath)))
+
+    return NDJSONStreamingResponse(results())
+
+TRAINING_ISOLATION = os.getenv("TRAINING_ISOLATION", "process").lower()
+training_runner = TrainingProcessRunner(training_manager) if TRAINING_ISOLATION == "process" else None
+
+def run_training_in_background(job_id: str, model_type: str, samples: list, hyperparameters: dict, cancel_event: threading.Event):
+    if training_runner is not None:
+        # Train trong process riêng, process API không import TensorFlow cho việc train
+        training_runner.run(job_id, model_type, samples, hyperparameters, cancel_event=cancel_event)
+        return
+    try:
+        get_training_service().train_model(
             job_id=job_id,
             model_type=model_type,
             samples=samples,
             hyperparameters=hyperparameters,
+            cancel_event=cancel_event,
         )
     except Exception as e:
         print(f" Background training failed: {str(e)}")
 
+# Số epoch mặc định của job warm start (chỉ train thêm trên dữ liệu mới)
+WARM_START_EPOCHS = int(os.getenv("WARM_START_EPOCHS", 3))
+
+# Job train chạy trong TRAINING_SLOTS slot, các job còn lại chờ trong hàng đợi
+training_scheduler = TrainingJobScheduler(training_manager, run_training_in_background)
+
 @app.post("/api/v1/retrain",response_model=RetrainResponse, tags=["Retrain"], dependencies=[Depends(verify_api_key)],)
 async def start_retraining(request: RetrainRequest, background_tasks: BackgroundTasks) -> RetrainResponse:
     try:
         print(f" Received retrain request for job {request.jobId}")
         print(f"   Model type: {request.modelType}")
         print(f"   Samples: {len(request.samples)}")
-        training_manager.create_job(request.jobId, request.modelType)
         samples = [sample.model_dump() for sample in request.samples]
         hyperparameters = request.hyperparameters.model_dump()
-        thread = threading.Thread(
-            target=run_training_in_background,
-            args=(request.jobId, request.modelType, samples, hyperparameters),
+        if request.hyperparameters.warm_start:
+            # Chốt model gốc lúc nhận request, job trong hàng đợi không đổi theo model active sau đó
+            if request.modelPath:
+                try:
+                    base_model_path = ml_service.get_registry().check_path(request.modelPath)
+                except ModelNotFoundError as e:
+                    raise HTTPException(status_code=400, detail=f"Base model: {str(e)}")
+            else:
+                base_model_path = await blocking_executor.run(ml_service.get_active_model_path)
+                if not base_model_path or not os.path.exists(base_model_path):
+                    raise HTTPException(status_code=400, detail=f"Base model not found: {base_model_path}")
+            hyperparameters['base_model_path'] = base_model_path
+            if 'epochs' not in request.hyperparameters.model_fields_set:
+                hyperparameters['epochs'] = WARM_START_EPOCHS
+            print(f"   Warm start from: {base_model_path}")
+        position = training_scheduler.submit(
+            request.jobId,
+            request.modelType,
+            samples,
+            hyperparameters,
+            priority=request.priority,
         )
-        thread.daemon = True
-        thread.start()
         return RetrainResponse(
             jobId=request.jobId,
-            status="running", 
-            message="Training started successfully",
+            status="queued", 
+            message="Training job queued",
+            queuePosition=position,
         )
+    except HTTPException:
+        raise
+    except TrainingQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         print(f" Failed to start retraining: {str(e)}")
         raise HTTPException(
@@ -146,7 +508,7 @@ async def get_training_status(jobId: str) -> TrainingStatusResponse:
                 status_code=404, 
                 detail=f"Job {jobId} not found"
             )
-        return TrainingStatusResponse(**status)
+        return TrainingStatusResponse(**status, queuePosition=training_scheduler.get_position(jobId))
        
     except HTTPException:
         raise
@@ -155,6 +517,24 @@ async def get_training_status(jobId: str) -> TrainingStatusResponse:
             status_code=500, 
             detail=f"Failed to get training status: {str(e)}"
         )
+@app.post(
+    "/api/v1/retrain/cancel/{jobId}",
+    response_model=CancelTrainingResponse,
+    tags=["Retrain"],
+    dependencies=[Depends(verify_api_key)],
+)
+async def cancel_training(jobId: str) -> CancelTrainingResponse:
+    try:
+        status = training_scheduler.cancel(jobId)
+    except JobNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Job {jobId} not found")
+    if status == "cancelled":
+        return CancelTrainingResponse(jobId=jobId, status=status, message="Queued job removed")
+    if status == "cancelling":
+        return CancelTrainingResponse(jobId=jobId, status=status, message="Training will stop after the current batch")
+    # Job đã kết thúc thì không hủy được nữa
+    raise HTTPException(status_code=409, detail=f"Job {jobId} already finished (status: {status})")
+
 @app.get(
     "/api/v1/retrain/results/{jobId}",
     response_model=TrainingResultsResponse,
@@ -198,9 +578,12 @@ async def save_trained_model(
 ) -> SaveModelResponse:
     try:
         print(f" Saving model for job {jobId} as {request.modelName}")
-        model_path = training_service.save_model(
+        model_path = await blocking_executor.run(
+            get_training_service().save_model,
             job_id=jobId, 
-            model_name=request.modelName
+            model_name=request.modelName,
+            export_tflite=request.exportTflite,
+            quantization=request.quantization
         )
 
         return SaveModelResponse(
@@ -211,6 +594,8 @@ async def save_trained_model(
 
     except ValueError as e: 
         raise HTTPException(status_code=400, detail=str(e))
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500, 
@@ -220,13 +605,19 @@ async def save_trained_model(
 @app.on_event("startup")
 async def startup_event():
     print(" Starting Email Classification API")
-    if ml_service.is_model_loaded():
-        print("ML Model loaded successfully")
-    else:
-        print(" ML Model failed to load")
+    # Model được load và warmup ở background, /ready báo khi xong
+    ml_service.start_background_load()
+    await batch_scheduler.start()
+    ml_service.start_model_watcher()
+    training_scheduler.start()
 @app.on_event("shutdown")
 async def shutdown_event():
     print(" Shutting down Email Classification API")
+    await batch_scheduler.stop()
+    ml_service.stop_model_watcher()
+    training_scheduler.stop()
+    inference_executor.shutdown(wait=False)
+    blocking_executor.shutdown(wait=False)
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,128 +1,575 @@
-import json
 import os
-from typing import Tuple, Dict, Any, List
-import joblib 
-import numpy as np 
-import pickle
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing.sequence import pad_sequences
+import threading
+import time
+from typing import TYPE_CHECKING, Tuple, Dict, Any, List, Optional, Union
+import numpy as np
 from .db_helper import get_active_model
+from .linear_cascade import CascadeStats, get_cascade_band, uncertain_rows
+from .long_document import LongDocumentConfig, pool_windows
+from .metrics import BATCH_SIZE, FORWARD_ROWS, observe_stage
+from .model_registry import ModelRegistry
+from .near_duplicate import NearDuplicateIndex
+from .prediction_cache import PredictionCache, normalize_text
+
+if TYPE_CHECKING:
+    from .model_bundle import ModelBundle
+
+
+class ModelNotReadyError(RuntimeError):
+    """Raised while the model is still loading or warming up"""
+
+
 class MLService:
     _instance = None
-    _model = None
-    _tokenizer = None
-    _label_binarizer = None  # Changed from _label_encoder to _label_binarizer
-    _metadata = None
+    _bundle: Optional['ModelBundle'] = None
     _model_loaded = False
-    
+    _load_thread = None
+    _startup: Dict[str, Any] = {"state": "not_started"}
+    _prediction_cache = None
+    _near_duplicates = None
+    _cascade_stats = CascadeStats()
+    _registry = None
+    _swap_lock = threading.Lock()
+    _reload_lock = threading.Lock()
+    _watcher_thread = None
+    _watcher_stop = None
+    _reload_count = 0
+    _last_reload = None
+
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(MLService, cls).__new__(cls)
         return cls._instance
-    
+
     def __init__(self):
-        if not self._model_loaded:
-            self.load_model()
-            
+        # Không load model ở đây: TensorFlow và model được load trong start_background_load()
+        # để server bind port ngay
+        self._cascade_enabled = os.getenv('CASCADE_ENABLED', 'false').lower() == 'true'
+        self._cascade_band = get_cascade_band()
+        self._cascade_shadow_rate = float(os.getenv('CASCADE_SHADOW_RATE', 0.0))
+        self._long_documents = LongDocumentConfig()
+        self._bounded_preprocessing = os.getenv('PREPROCESS_ENABLED', 'true').lower() == 'true'
+
+    def _resolve_model_path(self) -> str:
+        model_path_from_db = get_active_model()
+        if model_path_from_db:
+            print(f"Using model from db: {model_path_from_db}")
+            return model_path_from_db
+        print("No active model in db")
+        return os.getenv('MODEL_PATH','ml_models/email_cnn_model.h5')
+    def get_active_model_path(self) -> str:
+        """Model đang phục vụ, hoặc model active trong db nếu chưa load xong"""
+        if self._bundle is not None:
+            return self._bundle.model_path
+        return self._resolve_model_path()
+    def _load_bundle(self, model_path: str) -> 'ModelBundle':
+        # Import trễ: model_bundle kéo theo TensorFlow
+        from .model_bundle import ModelBundle, resolve_artifact_paths
+
+        # 'keras' (mặc định) hoặc 'tflite' cho node inference chỉ có CPU
+        backend = os.getenv('INFERENCE_BACKEND', 'keras').lower()
+        if int(os.getenv('INFERENCE_WORKERS', 0)) > 0 and backend != 'tflite':
+            print("INFERENCE_WORKERS needs the exported .tflite model, using the tflite backend")
+            backend = 'tflite'
+        return ModelBundle(
+            model_path=model_path,
+            backend=backend,
+            **resolve_artifact_paths(model_path)
+        )
     def load_model(self) -> None:
-        """Load model, tokenizer, and label binarizer for multi-label classification"""
+        """
+        Load model, tokenizer, and label binarizer for multi-label classification,
+        then warm up every served shape before the model takes traffic
+        """
+        started = time.perf_counter()
+        self._startup = {"state": "loading", "started_at": time.time()}
         try:
-            model_path_from_db = get_active_model()
-            if model_path_from_db:
-                print(f"Using model from db: {model_path_from_db}")
-                model_path = model_path_from_db
-            else:
-                print("No active model in db")
-                model_path = os.getenv('MODEL_PATH','ml_models/email_cnn_model.h5')
-            
-            tokenizer_path = os.getenv('TOKENIZER_PATH','ml_models/tokenizer.pkl')
-            label_binarizer_path = os.getenv('LABEL_BINARIZER_PATH','ml_models/label_binarizer.pkl')
-            metadata_path = os.getenv('METADATA_PATH','ml_models/model_metadata.json')
-            
-            print(f"Loading model from: {model_path}")
-            self._model = load_model(model_path)
-            
-            # Load tokenizer
-            with open(tokenizer_path, 'rb') as f:
-                self._tokenizer = pickle.load(f)
-            
-            # Load label binarizer (for multi-label)
-            with open(label_binarizer_path, 'rb') as f:
-                self._label_binarizer = pickle.load(f)
-            
-            # Load metadata with UTF-8 encoding
-            with open(metadata_path, 'r', encoding='utf-8') as f:
-                self._metadata = json.load(f)
-            
+            import tensorflow  # noqa: F401  (đo riêng thời gian import)
+            import_seconds = time.perf_counter() - started
+
+            bundle = self._load_bundle(self._resolve_model_path())
+            load_seconds = time.perf_counter() - started - import_seconds
+
+            self._startup["state"] = "warming_up"
+            warmup_started = time.perf_counter()
+            shapes = bundle.warmup()
+            warmup_seconds = time.perf_counter() - warmup_started
+
+            self._swap(bundle)
             self._model_loaded = True
+            self._startup = {
+                "state": "ready",
+                "import_seconds": round(import_seconds, 3),
+                "load_seconds": round(load_seconds, 3),
+                "warmup_seconds": round(warmup_seconds, 3),
+                "warmup_shapes": shapes,
+                "total_seconds": round(time.perf_counter() - started, 3),
+            }
             print("Model loaded successfully")
-            print(f"Labels: {self._label_binarizer.classes_}")
-            
+            print(f"Labels: {bundle.classes}")
+            print(
+                f"Startup timings: import {import_seconds:.2f}s, load {load_seconds:.2f}s, "
+                f"warmup {warmup_seconds:.2f}s ({len(shapes)} shapes)"
+            )
+
         except Exception as e:
+            self._startup = {"state": "failed", "error": str(e)}
             print(f"Error: {str(e)}")
             raise RuntimeError(f"Failed to load model: {str(e)}")
+    def start_background_load(self) -> None:
+        """Load and warm up the model in a background thread; /ready turns 200 when done"""
+        if self._model_loaded or self._load_thread is not None:
+            return
+
+        def run():
+            try:
+                self.load_model()
+            except RuntimeError:
+                pass
+
+        self._load_thread = threading.Thread(target=run, name="model-loader", daemon=True)
+        self._load_thread.start()
+    def is_ready(self) -> bool:
+        # Model chỉ được swap vào sau khi warmup xong
+        return self._model_loaded and self.get_backend_error() is None
+    def get_backend_error(self) -> Optional[str]:
+        bundle = self._bundle
+        return bundle.backend_error() if bundle is not None else None
+    def get_startup_info(self) -> Dict[str, Any]:
+        return dict(self._startup)
+    def reload_model(self, model_path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Load, warm up and atomically swap in a new model without dropping traffic.
+        In-flight requests finish on the old model, which is released afterwards.
+        """
+        with self._reload_lock:
+            started = time.perf_counter()
+            path = model_path or self._resolve_model_path()
+            try:
+                bundle = self._load_bundle(path)
+                bundle.warmup()
+            except Exception as e:
+                print(f"Model reload failed, keeping current model: {str(e)}")
+                raise RuntimeError(f"Failed to reload model: {str(e)}")
+
+            old_bundle = self._swap(bundle)
+            self._model_loaded = True
+            self._reload_count += 1
+            self._last_reload = {
+                "model_path": path,
+                "model_id": bundle.model_id,
+                "duration_seconds": round(time.perf_counter() - started, 3),
+                "timestamp": time.time()
+            }
+            print(f"Model swapped to {path} in {self._last_reload['duration_seconds']}s")
+
+            if old_bundle is not None:
+                threading.Thread(
+                    target=self._release_when_idle,
+                    args=(old_bundle,),
+                    daemon=True
+                ).start()
+            return self._last_reload
+    def _swap(self, bundle: 'ModelBundle') -> Optional['ModelBundle']:
+        with self._swap_lock:
+            old_bundle = self._bundle
+            self._bundle = bundle
+        if self._prediction_cache is None:
+            self._prediction_cache = PredictionCache()
+            if os.getenv('NEAR_DUP_ENABLED', 'false').lower() == 'true':
+                self._near_duplicates = NearDuplicateIndex()
+        else:
+            # Model mới => toàn bộ kết quả cũ không còn đúng
+            self._prediction_cache.clear()
+            if self._near_duplicates is not None:
+                self._near_duplicates.clear()
+        return old_bundle
+    def _release_when_idle(self, bundle: 'ModelBundle', timeout: float = 300.0) -> None:
+        # Chờ các request đang dùng model cũ chạy xong rồi mới giải phóng bộ nhớ
+        deadline = time.monotonic() + timeout
+        while bundle.in_flight > 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        bundle.release()
+    def _acquire_bundle(self, model_id: Optional[int] = None, model_path: Optional[str] = None) -> 'ModelBundle':
+        """
+        Bundle for the request, with one in-flight reference held.
+        Without a selector (or when it points at the active model) the active bundle is used,
+        otherwise the model comes from the registry.
+        """
+        if model_id is not None or model_path is not None:
+            path = self.get_registry().resolve_path(model_id=model_id, model_path=model_path)
+            active = self._bundle
+            if active is None or os.path.realpath(path) != os.path.realpath(active.model_path):
+                return self._registry.acquire(path)
+
+        with self._swap_lock:
+            bundle = self._bundle
+            if bundle is None:
+                raise ModelNotReadyError("Model is still loading")
+            bundle.acquire()
+        return bundle
+    def get_registry(self) -> ModelRegistry:
+        if self._registry is None:
+            with self._swap_lock:
+                if self._registry is None:
+                    MLService._registry = ModelRegistry(self._load_bundle, active_bytes=self._active_memory_bytes)
+        return self._registry
+    def _active_memory_bytes(self) -> int:
+        bundle = self._bundle
+        return bundle.memory_bytes() if bundle is not None else 0
+    def get_registry_stats(self) -> Dict[str, Any]:
+        if self._registry is None:
+            return {"models": [], "loads": 0, "evictions": 0}
+        return self._registry.get_stats()
+    def start_model_watcher(self, interval: Optional[float] = None) -> None:
+        """Poll tblModel and hot swap when the active model path changes (MODEL_POLL_INTERVAL)"""
+        interval = interval if interval is not None else float(os.getenv('MODEL_POLL_INTERVAL', 0))
+        if interval <= 0 or self._watcher_thread is not None:
+            return
+        self._watcher_stop = threading.Event()
+        self._watcher_thread = threading.Thread(
+            target=self._watch_active_model,
+            args=(interval, self._watcher_stop),
+            daemon=True
+        )
+        self._watcher_thread.start()
+        print(f"Watching tblModel for active model changes every {interval}s")
+    def stop_model_watcher(self) -> None:
+        if self._watcher_thread is None:
+            return
+        self._watcher_stop.set()
+        self._watcher_thread.join(timeout=5)
+        self._watcher_thread = None
+    def _watch_active_model(self, interval: float, stop: threading.Event) -> None:
+        while not stop.wait(interval):
+            try:
+                current = self._bundle
+                if current is None:
+                    # Lần load đầu tiên chưa xong
+                    continue
+                path = get_active_model()
+                if path and path != current.model_path:
+                    print(f"Active model changed in db: {path}")
+                    self.reload_model(path)
+            except Exception as e:
+                print(f"Model watcher error: {str(e)}")
     def is_model_loaded(self) -> bool:
         return self._model_loaded
+    def get_bundle(self) -> 'ModelBundle':
+        if self._bundle is None:
+            raise ModelNotReadyError("Model is still loading")
+        return self._bundle
     def preprocass_text(self, text: str) -> np.ndarray:
-        sequence = self._tokenizer.texts_to_sequences([text])
-        max_len = self._metadata.get('max_len', 256)
-        padded = pad_sequences(
-            sequence,
-            maxlen=max_len,
-            padding = 'post',
-            truncating = 'post'
+        return self.preprocess_batch([text])
+    def preprocess_batch(self, texts: List[str]) -> np.ndarray:
+        """Tokenize all texts and pad them into one (n, max_len) array"""
+        return self.get_bundle().preprocess_batch(texts)
+    def _cache_key(self, bundle: 'ModelBundle', text: str) -> str:
+        # Chỉ chuẩn hóa những gì tokenizer cũng bỏ qua
+        tokenizer = bundle.tokenizer
+        filters = getattr(tokenizer, 'filters', '') or ''
+        collapse_whitespace = (
+            getattr(tokenizer, 'split', None) == ' '
+            and '\t' in filters
+            and '\n' in filters
+            and not getattr(tokenizer, 'char_level', False)
         )
-        return padded
-    def predict(self, title: str, content: str, threshold: float = 0.5) -> List[Dict[str, Any]]:
+        normalized = normalize_text(text, getattr(tokenizer, 'lower', False), collapse_whitespace)
+        return PredictionCache.make_key(normalized, bundle.model_id)
+    def _prepare_texts(self, bundle: 'ModelBundle', items: List[Tuple[str, str]]) -> List[str]:
+        """Model text per email; huge bodies are cleaned and cut once the model has enough tokens"""
+        if not self._bounded_preprocessing:
+            return [f"{title} {content}" for title, content in items]
+        start = time.perf_counter()
+        config = self._long_documents
+        max_tokens = config.max_tokens(bundle.max_len) if config.enabled else bundle.max_len
+        texts = [bundle.preprocessor.prepare(title, content, max_tokens) for title, content in items]
+        observe_stage('preprocess', time.perf_counter() - start)
+        return texts
+    def _score(self, bundle: 'ModelBundle', texts: List[str]) -> np.ndarray:
+        """
+        Label probabilities for each text.
+        In cascade mode the linear model scores every text first and only texts with a label
+        inside the uncertainty band (CASCADE_LOW..CASCADE_HIGH) go on to the neural model.
+        """
+        if not self._cascade_enabled or bundle.linear_model is None:
+            return self._score_neural(bundle, texts)
+
+        start = time.perf_counter()
+        linear_probs = bundle.linear_model.predict_proba(texts)
+        observe_stage('linear', time.perf_counter() - start)
+
+        low, high = self._cascade_band
+        escalate = uncertain_rows(linear_probs, low, high)
+        shadow = ~escalate
+        if self._cascade_shadow_rate < 1.0:
+            shadow &= np.random.random(len(texts)) < self._cascade_shadow_rate
+        self._cascade_stats.record(len(texts), int(escalate.sum()))
+
+        neural_rows = np.nonzero(escalate | shadow)[0]
+        if len(neural_rows) == 0:
+            return linear_probs
+        neural_probs = self._score_neural(bundle, [texts[idx] for idx in neural_rows])
+        escalated = escalate[neural_rows]
+        if not escalated.all():
+            self._cascade_stats.record_shadow(linear_probs[neural_rows[~escalated]], neural_probs[~escalated])
+        linear_probs[neural_rows[escalated]] = neural_probs[escalated]
+        return linear_probs
+    def _score_neural(self, bundle: 'ModelBundle', texts: List[str]) -> np.ndarray:
+        """
+        Label probabilities for each text from the neural model.
+        Cache hits skip tokenization and the forward pass; misses are deduplicated,
+        checked against the near-duplicate index, and the rest scored together in one batch.
+        """
+        cache = self._prediction_cache
+        use_cache = cache is not None and cache.max_entries > 0
+        index = self._near_duplicates
+        if not use_cache and index is None:
+            return self._forward_texts(bundle, texts)
+
+        keys = [self._cache_key(bundle, text) for text in texts]
+        rows: List[Optional[np.ndarray]] = [cache.get(key) for key in keys] if use_cache else [None] * len(texts)
+
+        missing: Dict[str, List[int]] = {}
+        for idx, row in enumerate(rows):
+            if row is None:
+                missing.setdefault(keys[idx], []).append(idx)
+
+        to_score = list(missing.items())
+        signatures: List[Optional[np.ndarray]] = [None] * len(to_score)
+        if index is not None and to_score:
+            signatures = [index.signature(texts[indices[0]]) for _, indices in to_score]
+            remaining = []
+            for (key, indices), signature in zip(to_score, signatures):
+                row = index.lookup(bundle.model_id, signature)
+                if row is None:
+                    remaining.append(((key, indices), signature))
+                    continue
+                if use_cache:
+                    cache.put(key, row)
+                for idx in indices:
+                    rows[idx] = row
+            to_score = [item for item, _ in remaining]
+            signatures = [signature for _, signature in remaining]
+
+        if to_score:
+            miss_texts = [texts[indices[0]] for _, indices in to_score]
+            probabilities = self._forward_texts(bundle, miss_texts)
+            for (key, indices), signature, row in zip(to_score, signatures, probabilities):
+                if use_cache:
+                    cache.put(key, row)
+                if index is not None:
+                    index.add(bundle.model_id, signature, row)
+                for idx in indices:
+                    rows[idx] = row
+
+        return np.stack(rows)
+    def _forward_texts(self, bundle: 'ModelBundle', texts: List[str]) -> np.ndarray:
+        """
+        Tokenize and score texts. In long-document mode every window of every text
+        goes through one forward pass and window probabilities are pooled per text.
+        """
+        config = self._long_documents
+        if not config.enabled:
+            return self._forward(bundle, bundle.preprocess_batch(texts))
+        windows, first_window = bundle.preprocess_windows(texts, config)
+        probabilities = self._forward(bundle, windows)
+        return pool_windows(probabilities, first_window, config.pooling)
+    def _forward(self, bundle: 'ModelBundle', padded: np.ndarray) -> np.ndarray:
+        start = time.perf_counter()
+        probabilities = bundle.forward(padded)
+        observe_stage('forward', time.perf_counter() - start)
+        FORWARD_ROWS.inc(len(padded))
+        return probabilities
+    def get_cache_stats(self) -> Dict[str, Any]:
+        if self._prediction_cache is None:
+            return {"enabled": False}
+        return self._prediction_cache.get_stats()
+    def get_cascade_stats(self) -> Dict[str, Any]:
+        bundle = self._bundle
+        low, high = self._cascade_band
+        holdout = (bundle.metadata.get('cascade') or {}) if bundle is not None else {}
+        return {
+            "enabled": self._cascade_enabled,
+            "linear_model_loaded": bundle is not None and bundle.linear_model is not None,
+            "low": low,
+            "high": high,
+            "shadow_rate": self._cascade_shadow_rate,
+            **self._cascade_stats.get_stats(),
+            # Escalation rate và accuracy delta so với neural-only trên tập holdout lúc train
+            "holdout": next(
+                (band for band in holdout.get('bands', []) if band['low'] == low and band['high'] == high),
+                None
+            ),
+            "holdout_bands": [
+                {key: band[key] for key in ('low', 'high', 'escalationRate', 'delta')}
+                for band in holdout.get('bands', [])
+            ],
+        }
+    def get_near_duplicate_stats(self) -> Dict[str, Any]:
+        if self._near_duplicates is None:
+            return {"enabled": False}
+        return self._near_duplicates.get_stats()
+    def _threshold_matrix(self, classes: np.ndarray, threshold: Union[float, Dict[str, float], None]) -> np.ndarray:
+        """Per-label thresholds; labels missing from a per-label dict keep the default 0.5"""
+        if threshold is None:
+            return np.full(len(classes), 0.5, dtype=np.float32)
+        if not isinstance(threshold, dict):
+            return np.full(len(classes), threshold, dtype=np.float32)
+
+        index = {label: idx for idx, label in enumerate(classes.tolist())}
+        unknown = [label for label in threshold if label not in index]
+        if unknown:
+            raise ValueError(f"Unknown labels in threshold: {unknown}")
+        thresholds = np.full(len(classes), 0.5, dtype=np.float32)
+        for label, value in threshold.items():
+            thresholds[index[label]] = value
+        return thresholds
+    def _select_labels(
+        self,
+        classes: np.ndarray,
+        probabilities: np.ndarray,
+        thresholds: np.ndarray,
+        top_k: Union[int, np.ndarray, None] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Labels above threshold per row, sorted by confidence, at most top_k of them.
+        Rows with no label above threshold keep their top label.
+        Works on the whole (n, num_classes) matrix at once; thresholds is (num_classes,)
+        or (n, num_classes) and top_k one value or one per row.
+        """
+        n, num_classes = probabilities.shape
+        if np.isscalar(top_k) and top_k < num_classes:
+            # Chỉ cần sắp xếp k ứng viên lớn nhất của mỗi dòng
+            candidates = np.argpartition(-probabilities, top_k - 1, axis=1)[:, :top_k]
+        else:
+            candidates = np.broadcast_to(np.arange(num_classes), (n, num_classes))
+
+        candidate_probs = np.take_along_axis(probabilities, candidates, axis=1)
+        order = np.argsort(-candidate_probs, axis=1, kind='stable')
+        ranked = np.take_along_axis(candidates, order, axis=1)
+        ranked_probs = np.take_along_axis(candidate_probs, order, axis=1)
+
+        thresholds = np.broadcast_to(thresholds, (n, num_classes))
+        keep = ranked_probs >= np.take_along_axis(thresholds, ranked, axis=1)
+        if top_k is not None and not np.isscalar(top_k):
+            keep &= np.arange(ranked.shape[1]) < np.asarray(top_k)[:, None]
+        keep[:, 0] |= ~keep.any(axis=1)
+
+        rows, cols = np.nonzero(keep)
+        label_names = classes[ranked[rows, cols]].tolist()
+        confidences = ranked_probs[rows, cols].astype(np.float64).tolist()
+        bounds = np.cumsum(np.bincount(rows, minlength=n)).tolist()
+
+        results = []
+        start = 0
+        for end in bounds:
+            results.append([
+                {'label': label, 'confidence': confidence}
+                for label, confidence in zip(label_names[start:end], confidences[start:end])
+            ])
+            start = end
+        return results
+    def predict(
+        self,
+        title: str,
+        content: str,
+        threshold: Union[float, Dict[str, float], None] = 0.5,
+        top_k: Optional[int] = None,
+        model_id: Optional[int] = None,
+        model_path: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
         """
         Predict labels for multi-label classification
         Returns: List of predicted labels with confidence scores
         """
+        return self.predict_batch(
+            [(title, content)],
+            threshold=threshold,
+            top_k=top_k,
+            model_id=model_id,
+            model_path=model_path
+        )[0]
+    def predict_batch(
+        self,
+        items: List[Tuple[str, str]],
+        threshold: Union[float, Dict[str, float], List, None] = 0.5,
+        top_k: Union[int, List[Optional[int]], None] = None,
+        model_id: Optional[int] = None,
+        model_path: Optional[str] = None,
+        isolate_errors: bool = False
+    ) -> List[Union[List[Dict[str, Any]], ValueError]]:
+        """
+        Predict labels for many (title, content) pairs with a single forward pass.
+        threshold and top_k apply to the whole batch, or are lists with one value per item.
+        isolate_errors: với threshold theo từng item (request của nhiều client gom chung), item có
+        threshold không hợp lệ không được chấm điểm và nhận ValueError ở vị trí kết quả của nó
+        thay vì làm hỏng cả batch.
+        Returns: one list of predicted labels per item, in input order
+        """
         if not self._model_loaded:
-            raise RuntimeError("Model not loaded")
-        
+            raise ModelNotReadyError("Model is still loading")
+        if not items:
+            return []
+
+        BATCH_SIZE.observe(len(items))
+        # Cả batch dùng cùng một model kể cả khi có hot swap giữa chừng
+        bundle = self._acquire_bundle(model_id=model_id, model_path=model_path)
         try:
-            combined_text = f"{title} {content}"
-            preprocessed = self.preprocass_text(combined_text)
-            
-            # Get probabilities for all labels
-            probabilities = self._model.predict(preprocessed, verbose=0)[0]
-            
-            # Get all labels with confidence above threshold
-            predicted_labels = []
-            for idx, prob in enumerate(probabilities):
-                if prob >= threshold:
-                    label_name = self._label_binarizer.classes_[idx]
-                    predicted_labels.append({
-                        'label': label_name,
-                        'confidence': float(prob)
-                    })
-            
-            # Sort by confidence (highest first)
-            predicted_labels.sort(key=lambda x: x['confidence'], reverse=True)
-            
-            # If no labels above threshold, return top label
-            if len(predicted_labels) == 0:
-                top_idx = np.argmax(probabilities)
-                predicted_labels.append({
-                    'label': self._label_binarizer.classes_[top_idx],
-                    'confidence': float(probabilities[top_idx])
-                })
-            
-            return predicted_labels
-            
+            classes = bundle.classes
+            errors: Dict[int, ValueError] = {}
+            if isinstance(threshold, list):
+                rows = []
+                for idx, value in enumerate(threshold):
+                    try:
+                        rows.append(self._threshold_matrix(classes, value))
+                    except ValueError as e:
+                        if not isolate_errors:
+                            raise
+                        errors[idx] = e
+                if not rows:
+                    return [errors[idx] for idx in range(len(items))]
+                thresholds = np.stack(rows)
+            else:
+                thresholds = self._threshold_matrix(classes, threshold)
+            if isinstance(top_k, list):
+                top_k = np.array([k or len(classes) for idx, k in enumerate(top_k) if idx not in errors])
+            valid_items = [item for idx, item in enumerate(items) if idx not in errors] if errors else items
+
+            combined_texts = self._prepare_texts(bundle, valid_items)
+
+            # Get probabilities for all labels of all emails at once
+            probabilities = self._score(bundle, combined_texts)
+
+            start = time.perf_counter()
+            results = self._select_labels(classes, probabilities, thresholds, top_k)
+            observe_stage('postprocess', time.perf_counter() - start)
+            if errors:
+                labels = iter(results)
+                results = [errors[idx] if idx in errors else next(labels) for idx in range(len(items))]
+            return results
+
+        except (ValueError, ModelNotReadyError):
+            raise
         except Exception as e:
             raise RuntimeError(f"Prediction failed: {str(e)}")
+        finally:
+            bundle.release_request()
     def get_model_info(self) -> Dict[str, Any]:
         """Get model information including multi-label specific info"""
-        if not self._model_loaded:
-            return {"loaded": False}
-        
+        if not self._model_loaded or self._bundle is None:
+            return {"loaded": False, "startup": self.get_startup_info()}
+
         return {
             "loaded": True,
-            "max_len": self._metadata.get('max_len'),
-            "num_classes": self._metadata.get('num_classes'),
-            "classes": self._metadata.get('classes', []),
-            "is_multilabel": self._metadata.get('is_multilabel', True),
-            "model_type": self._metadata.get('model_type', 'Unknown')
-        }
\ No newline at end of file
+            **self._bundle.get_info(),
+            "startup": self.get_startup_info(),
+            "long_document": {
+                "enabled": self._long_documents.enabled,
+                "pooling": self._long_documents.pooling,
+                "stride": self._long_documents.stride_for(self._bundle.max_len),
+                "max_windows": self._long_documents.max_windows
+            },
+            "reload_count": self._reload_count,
+            "last_reload": self._last_reload
+        }
@@ -0,0 +1,383 @@
+import gc
+import joblib
+import json
+import os
+import pickle
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.models import load_model
+from tensorflow.keras.layers import Embedding, Conv1D, GlobalMaxPooling1D, Dense, Dropout, RNN, Bidirectional
+from tensorflow.keras.preprocessing.sequence import pad_sequences
+from .inference_workers import InferenceWorkerPool
+from .long_document import LongDocumentConfig, make_windows
+from .metrics import observe_stage
+from .text_preprocessing import TextPreprocessor
+from .tflite_backend import TFLiteBackend
+from .tokenizer_engine import FastTokenizer
+
+
+def padding_margin(model) -> Optional[int]:
+    """
+    Padding cells that must stay after the last token for the output to match the max_len output.
+    - Embedding -> Conv1D (valid, stride 1)... -> GlobalMaxPooling1D -> Dense/Dropout: the receptive
+      field of the conv stack, every window lying fully in the padding yields the same activation.
+    - Embedding(mask_zero=True) -> RNN/LSTM/Bidirectional... -> Dense/Dropout: 0, masked steps
+      leave the recurrent state unchanged.
+    Returns None for architectures where shorter padding changes the result (unmasked RNN/LSTM).
+    """
+    layers = model.layers
+    if not layers or not isinstance(layers[0], Embedding):
+        return None
+
+    idx = 1
+    if layers[0].mask_zero:
+        while idx < len(layers) and isinstance(layers[idx], (RNN, Bidirectional)):
+            idx += 1
+        if idx == 1 or getattr(layers[idx - 1], 'return_sequences', False):
+            return None
+        if not all(isinstance(layer, (Dense, Dropout)) for layer in layers[idx:]):
+            return None
+        return 0
+
+    margin = 1
+    while idx < len(layers) and isinstance(layers[idx], Conv1D):
+        conv = layers[idx]
+        if conv.padding != 'valid' or tuple(conv.strides) != (1,) or tuple(conv.dilation_rate) != (1,):
+            return None
+        margin += conv.kernel_size[0] - 1
+        idx += 1
+
+    if idx == 1 or idx >= len(layers) or not isinstance(layers[idx], GlobalMaxPooling1D):
+        return None
+    if not all(isinstance(layer, (Dense, Dropout)) for layer in layers[idx + 1:]):
+        return None
+    return margin
+
+
+def resolve_artifact_paths(model_path: str) -> Dict[str, str]:
+    """
+    Tokenizer, label binarizer và metadata đi kèm model.
+    Ưu tiên file riêng của model (<tên model>_tokenizer.pkl, ...) nằm cạnh file model,
+    nếu không có thì dùng bộ file chung cấu hình qua env.
+    """
+    stem = os.path.splitext(model_path)[0]
+    defaults = {
+        'tokenizer_path': (f"{stem}_tokenizer.pkl", os.getenv('TOKENIZER_PATH','ml_models/tokenizer.pkl')),
+        'label_binarizer_path': (f"{stem}_label_binarizer.pkl", os.getenv('LABEL_BINARIZER_PATH','ml_models/label_binarizer.pkl')),
+        'metadata_path': (f"{stem}_metadata.json", os.getenv('METADATA_PATH','ml_models/model_metadata.json')),
+    }
+    return {
+        name: own if os.path.exists(own) else shared
+        for name, (own, shared) in defaults.items()
+    }
+
+
+class ModelBundle:
+    """
+    Một model đã load cùng tokenizer, label binarizer, metadata và các hàm inference đã compile.
+    MLService chỉ giữ tham chiếu tới bundle đang active nên việc thay model là một phép gán
+    nguyên tử; request đang chạy tiếp tục dùng bundle cũ cho tới khi xong.
+    """
+    def __init__(
+        self,
+        model_path: str,
+        tokenizer_path: str,
+        label_binarizer_path: str,
+        metadata_path: str,
+        backend: str = 'keras'
+    ):
+        if backend not in ('keras', 'tflite'):
+            raise ValueError(f"Unknown INFERENCE_BACKEND: {backend}")
+
+        self.model_path = model_path
+        self.backend = backend
+        self._model = None
+        self._tflite_backend = None
+        self._infer_fns: Dict[int, Any] = {}
+        self._length_buckets: List[int] = []
+        self._length_margin: Optional[int] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._released = False
+
+        # Load tokenizer
+        with open(tokenizer_path, 'rb') as f:
+            self.tokenizer = pickle.load(f)
+        self._fast_tokenizer = self._build_fast_tokenizer(self.tokenizer)
+        self.preprocessor = TextPreprocessor.from_keras(self.tokenizer)
+
+        # Load label binarizer (for multi-label)
+        with open(label_binarizer_path, 'rb') as f:
+            self.label_binarizer = pickle.load(f)
+
+        # Load metadata with UTF-8 encoding
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            self.metadata = json.load(f)
+
+        self.max_len = self.metadata.get('max_len', 256)
+        self.linear_model = self._load_linear_model(model_path)
+        self._batch_buckets = sorted({
+            int(size) for size in os.getenv('INFERENCE_BATCH_BUCKETS', '1,4,16,64,256').split(',')
+        })
+
+        if backend == 'tflite':
+            tflite_path = f"{os.path.splitext(model_path)[0]}.tflite"
+            if not os.path.exists(tflite_path) and os.getenv('TFLITE_MODEL_PATH'):
+                tflite_path = os.getenv('TFLITE_MODEL_PATH')
+            print(f"Loading TFLite model from: {tflite_path}")
+            workers = int(os.getenv('INFERENCE_WORKERS', 0))
+            if workers > 0:
+                # Batch đã tokenize được gửi sang các worker process dùng chung file .tflite
+                self._tflite_backend = InferenceWorkerPool(
+                    tflite_path,
+                    num_workers=workers,
+                    warmup_batch_sizes=self._batch_buckets
+                )
+            else:
+                self._tflite_backend = TFLiteBackend(tflite_path)
+        else:
+            print(f"Loading model from: {model_path}")
+            self._model = load_model(model_path)
+            self._setup_length_buckets()
+            self._build_inference_fn()
+
+        # Định danh model cho cache: đổi file hoặc backend là key khác
+        mtime = os.path.getmtime(model_path) if os.path.exists(model_path) else 0
+        self.model_id = f"{model_path}:{mtime}:{backend}"
+
+    @property
+    def classes(self) -> np.ndarray:
+        return self.label_binarizer.classes_
+
+    def _load_linear_model(self, model_path: str):
+        """Tầng linear của cascade (<tên model>_linear.pkl), chỉ dùng khi cùng bộ nhãn với model"""
+        linear_path = f"{os.path.splitext(model_path)[0]}_linear.pkl"
+        if not os.path.exists(linear_path):
+            return None
+        linear_model = joblib.load(linear_path)
+        if list(linear_model.classes) != self.classes.tolist():
+            print(f"Ignoring {linear_path}: labels differ from the model")
+            return None
+        print(f"Linear cascade model loaded from: {linear_path}")
+        return linear_model
+
+    def _build_fast_tokenizer(self, tokenizer) -> Optional[FastTokenizer]:
+        if os.getenv('FAST_TOKENIZER', 'true').lower() != 'true':
+            return None
+        try:
+            return FastTokenizer.from_keras(tokenizer)
+        except ValueError as e:
+            print(f"Fast tokenizer disabled: {str(e)}")
+            return None
+
+    def _setup_length_buckets(self) -> None:
+        if os.getenv('LENGTH_BUCKETING', 'true').lower() != 'true':
+            return
+        margin = padding_margin(self._model)
+        if margin is None:
+            print("Length bucketing disabled: model output depends on padding length")
+            return
+
+        # Ưu tiên cấu hình env, sau đó là phân phối độ dài token lúc train (metadata)
+        if os.getenv('LENGTH_BUCKETS'):
+            boundaries = [int(x) for x in os.getenv('LENGTH_BUCKETS').split(',')]
+        else:
+            boundaries = self.metadata.get('length_buckets') or [32, 64, 128]
+
+        self._length_buckets = sorted({b for b in boundaries if 0 < b < self.max_len} | {self.max_len})
+        self._length_margin = margin
+        print(f"Length bucketing enabled (buckets={self._length_buckets}, margin={margin})")
+
+    def _build_inference_fn(self) -> None:
+        """
+        Trace model(x, training=False) once per sequence length with a fixed [None, length]
+        int32 signature. Keras model.predict rebuilds its data adapter, callbacks and step
+        loop on every call, which dominates the cost of scoring a handful of rows.
+        """
+        model = self._model
+
+        self._infer_fns = {}
+        for length in self._length_buckets or [self.max_len]:
+            @tf.function(input_signature=[tf.TensorSpec(shape=[None, length], dtype=tf.int32)])
+            def infer(inputs):
+                return model(inputs, training=False)
+
+            self._infer_fns[length] = infer.get_concrete_function()
+        print(f"Compiled inference functions traced (lengths={sorted(self._infer_fns)}, batch buckets={self._batch_buckets})")
+
+    def _bucket_for(self, batch_size: int) -> int:
+        for bucket in self._batch_buckets:
+            if batch_size <= bucket:
+                return bucket
+        return self._batch_buckets[-1]
+
+    def preprocess_batch(self, texts: List[str]) -> np.ndarray:
+        """Tokenize all texts and pad them into one (n, max_len) array"""
+        start = time.perf_counter()
+        if self._fast_tokenizer is not None:
+            sequences = [self._fast_tokenizer.encode(text, self.max_len) for text in texts]
+        else:
+            sequences = self.tokenizer.texts_to_sequences(texts)
+        tokenized = time.perf_counter()
+        observe_stage('tokenize', tokenized - start)
+
+        if self._fast_tokenizer is not None:
+            padded = FastTokenizer.pad(sequences, self.max_len)
+        else:
+            padded = pad_sequences(
+                sequences,
+                maxlen=self.max_len,
+                padding = 'post',
+                truncating = 'post'
+            )
+        observe_stage('pad', time.perf_counter() - tokenized)
+        return padded
+
+    def preprocess_windows(self, texts: List[str], config: LongDocumentConfig) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Tokenize texts up to the long-document token limit and cut them into overlapping
+        max_len windows. Returns the windows and the index of each text's first window.
+        """
+        max_tokens = config.max_tokens(self.max_len)
+        start = time.perf_counter()
+        if self._fast_tokenizer is not None:
+            sequences = [self._fast_tokenizer.encode(text, max_tokens) for text in texts]
+        else:
+            sequences = [ids[:max_tokens] for ids in self.tokenizer.texts_to_sequences(texts)]
+        tokenized = time.perf_counter()
+        observe_stage('tokenize', tokenized - start)
+
+        windows, first_window = make_windows(
+            sequences, self.max_len, config.stride_for(self.max_len), config.max_windows
+        )
+        observe_stage('pad', time.perf_counter() - tokenized)
+        return windows, first_window
+
+    def forward(self, padded: np.ndarray) -> np.ndarray:
+        """
+        Label probabilities for a post-padded (n, max_len) batch.
+        With length bucketing, rows are grouped by the shortest bucket that still holds
+        their tokens plus the padding margin, and each group runs at its own shape.
+        """
+        padded = padded.astype(np.int32, copy=False)
+        if not self._length_buckets:
+            return self._forward_fixed(padded)
+
+        # Token id 0 chỉ xuất hiện ở phần padding (post) nên đếm khác 0 là độ dài thật
+        lengths = np.count_nonzero(padded, axis=1)
+        required = np.minimum(lengths + self._length_margin, padded.shape[1])
+        bucket_idx = np.searchsorted(self._length_buckets, required)
+
+        outputs = [None] * len(self._length_buckets)
+        for bucket in np.unique(bucket_idx):
+            rows = np.nonzero(bucket_idx == bucket)[0]
+            outputs[bucket] = (rows, self._forward_fixed(padded[rows, :self._length_buckets[bucket]]))
+
+        groups = [group for group in outputs if group is not None]
+        probabilities = np.empty((len(padded), groups[0][1].shape[1]), dtype=np.float32)
+        for rows, group_probabilities in groups:
+            probabilities[rows] = group_probabilities
+        return probabilities
+
+    def _forward_fixed(self, padded: np.ndarray) -> np.ndarray:
+        """
+        Run the compiled inference function (or the TFLite interpreter) at padded's length.
+        Batches are padded with empty rows up to the next bucket size (and split above the
+        largest bucket) so only a handful of distinct shapes ever reach the kernels.
+        """
+        max_bucket = self._batch_buckets[-1]
+        infer_fn = self._infer_fns.get(padded.shape[1])
+        outputs = []
+        for start in range(0, len(padded), max_bucket):
+            chunk = padded[start:start + max_bucket]
+            rows = len(chunk)
+            bucket = self._bucket_for(rows)
+            if bucket > rows:
+                chunk = np.pad(chunk, ((0, bucket - rows), (0, 0)))
+            if self._tflite_backend is not None:
+                probabilities = self._tflite_backend.predict(chunk)
+            else:
+                probabilities = infer_fn(tf.constant(chunk)).numpy()
+            outputs.append(probabilities[:rows])
+        return np.concatenate(outputs, axis=0)
+
+    def forward_keras(self, padded: np.ndarray) -> np.ndarray:
+        """Original Keras model.predict path, kept for latency comparison"""
+        if self._model is None:
+            raise RuntimeError("Keras model not loaded (INFERENCE_BACKEND=tflite)")
+        return self._model.predict(padded, batch_size=len(padded), verbose=0)
+
+    def warmup(self) -> List[List[int]]:
+        """
+        Run one dummy batch per (batch bucket, length bucket) so no request pays for
+        tracing or interpreter setup. Returns the [batch, length] shapes that were warmed.
+        Inference workers warm their own interpreters before reporting ready.
+        """
+        shapes = []
+        for length in self._length_buckets or [self.max_len]:
+            for batch_size in self._batch_buckets:
+                self._forward_fixed(np.ones((batch_size, length), dtype=np.int32))
+                shapes.append([batch_size, length])
+        return shapes
+
+    def acquire(self) -> None:
+        with self._lock:
+            if self._released:
+                raise RuntimeError("Model bundle already released")
+            self._in_flight += 1
+
+    def release_request(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    @property
+    def in_flight(self) -> int:
+        with self._lock:
+            return self._in_flight
+
+    def release(self) -> None:
+        """Drop the model and compiled functions so their memory can be reclaimed"""
+        with self._lock:
+            self._released = True
+            self._infer_fns = {}
+            self._model = None
+            backend, self._tflite_backend = self._tflite_backend, None
+            self._fast_tokenizer = None
+        if isinstance(backend, InferenceWorkerPool):
+            backend.close()
+        gc.collect()
+        print(f"Released model {self.model_path}")
+
+    def backend_error(self) -> Optional[str]:
+        """Why the backend can no longer serve (worker pool gave up restarting), None if healthy"""
+        backend = self._tflite_backend
+        return backend.error if isinstance(backend, InferenceWorkerPool) else None
+
+    def memory_bytes(self) -> int:
+        """Rough resident size of the model weights, used for the registry memory budget"""
+        if self._model is not None:
+            return int(self._model.count_params()) * 4
+        if self._tflite_backend is not None and os.path.exists(self._tflite_backend.model_path):
+            return os.path.getsize(self._tflite_backend.model_path)
+        return 0
+
+    def get_info(self) -> Dict[str, Any]:
+        return {
+            "model_path": self.model_path,
+            "max_len": self.metadata.get('max_len'),
+            "num_classes": self.metadata.get('num_classes'),
+            "classes": self.metadata.get('classes', []),
+            "is_multilabel": self.metadata.get('is_multilabel', True),
+            "model_type": self.metadata.get('model_type', 'Unknown'),
+            "backend": self.backend,
+            "length_buckets": self._length_buckets,
+            "workers": (
+                self._tflite_backend.get_stats()
+                if isinstance(self._tflite_backend, InferenceWorkerPool) else None
+            ),
+            "tflite": self.metadata.get('tflite'),
+            "linear_model": self.linear_model is not None
+        }
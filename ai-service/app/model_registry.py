@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple
+from .db_helper import get_model_by_id
+
+if TYPE_CHECKING:
+    from .model_bundle import ModelBundle
+
+
+class ModelNotFoundError(ValueError):
+    """Raised when a model selector does not match any model"""
+
+
+class ModelLookupError(RuntimeError):
+    """Raised when the model database cannot be queried to resolve a modelId"""
+
+
+class ModelRegistry:
+    """
+    Các model được chọn theo id trong tblModel (hoặc theo path) để A/B test hay model riêng
+    cho từng phòng ban. Giới hạn tổng bộ nhớ trọng số (tính cả model active, active_bytes);
+    khi vượt ngân sách thì unload model ít dùng nhất đang không có request nào chạy (LRU).
+    Ngân sách được kiểm tra mỗi lần acquire, nên model còn request lúc vượt ngân sách sẽ bị
+    unload ở request sau.
+    """
+    def __init__(
+        self,
+        load_bundle: Callable[[str], 'ModelBundle'],
+        max_bytes: Optional[int] = None,
+        active_bytes: Optional[Callable[[], int]] = None
+    ):
+        self._load_bundle = load_bundle
+        self._active_bytes = active_bytes or (lambda: 0)
+        self.max_bytes = max_bytes if max_bytes is not None else int(float(os.getenv('MODEL_REGISTRY_MAX_MB', 1024)) * 1024 * 1024)
+        self.model_dir = os.path.realpath(os.getenv('MODEL_DIR', 'ml_models'))
+        # Cache id -> path để mỗi request theo modelId không phải mở kết nối DB mới
+        self.id_cache_ttl = float(os.getenv('MODEL_ID_CACHE_TTL', 60))
+        self._id_paths: Dict[int, Tuple[str, float]] = {}
+        self._entries: "OrderedDict[str, ModelBundle]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._loads = 0
+        self._evictions = 0
+
+    def resolve_path(self, model_id: Optional[int] = None, model_path: Optional[str] = None) -> str:
+        if model_id is not None:
+            return self._path_for_id(model_id)
+        return self.check_path(model_path)
+
+    def check_path(self, model_path: str) -> str:
+        """Real path of model_path, which must exist inside MODEL_DIR"""
+        # Chỉ cho phép load file nằm trong thư mục model
+        real_path = os.path.realpath(model_path)
+        if os.path.commonpath([real_path, self.model_dir]) != self.model_dir:
+            raise ModelNotFoundError(f"Model path must be inside {self.model_dir}")
+        if not os.path.exists(real_path):
+            raise ModelNotFoundError(f"Model file {model_path} not found")
+        return real_path
+
+    def _path_for_id(self, model_id: int) -> str:
+        cached = self._id_paths.get(model_id)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+        try:
+            record = get_model_by_id(model_id)
+        except Exception as e:
+            raise ModelLookupError(f"Model database unavailable: {str(e)}")
+        if not record or not record.get('path'):
+            raise ModelNotFoundError(f"Model {model_id} not found")
+        # Path trong DB cũng phải nằm trong MODEL_DIR như modelPath trước khi được unpickle
+        path = self.check_path(record['path'])
+        self._id_paths[model_id] = (path, time.monotonic() + self.id_cache_ttl)
+        return path
+
+    def acquire(self, model_path: str) -> 'ModelBundle':
+        """Return the bundle for model_path (loading it if needed) with one in-flight request held"""
+        # Cùng một file dù được gọi bằng đường dẫn khác nhau chỉ load một lần
+        key = os.path.realpath(model_path)
+        with self._lock:
+            bundle = self._entries.get(key)
+            if bundle is not None:
+                self._entries.move_to_end(key)
+                bundle.acquire()
+                self._evict_over_budget(keep=key)
+                return bundle
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Mỗi model chỉ load một lần dù nhiều request cùng chờ
+        with load_lock:
+            with self._lock:
+                bundle = self._entries.get(key)
+                if bundle is not None:
+                    self._entries.move_to_end(key)
+                    bundle.acquire()
+                    return bundle
+
+            print(f"Registry loading model: {key}")
+            try:
+                bundle = self._load_bundle(key)
+                bundle.warmup()
+            except Exception:
+                with self._lock:
+                    self._load_locks.pop(key, None)
+                raise
+
+            with self._lock:
+                self._entries[key] = bundle
+                self._loads += 1
+                bundle.acquire()
+                self._evict_over_budget(keep=key)
+            return bundle
+
+    def _evict_over_budget(self, keep: str) -> None:
+        # Gọi khi đang giữ self._lock
+        total = self._active_bytes() + sum(bundle.memory_bytes() for bundle in self._entries.values())
+        for path in list(self._entries.keys()):
+            if total <= self.max_bytes:
+                break
+            bundle = self._entries[path]
+            if path == keep or bundle.in_flight > 0:
+                continue
+            del self._entries[path]
+            self._load_locks.pop(path, None)
+            total -= bundle.memory_bytes()
+            bundle.release()
+            self._evictions += 1
+            print(f"Registry evicted model: {path}")
+
+    def unload(self, model_path: str) -> bool:
+        key = os.path.realpath(model_path)
+        with self._lock:
+            bundle = self._entries.get(key)
+            if bundle is None or bundle.in_flight > 0:
+                return False
+            del self._entries[key]
+            self._load_locks.pop(key, None)
+        bundle.release()
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            models = [
+                {
+                    "model_path": path,
+                    "memory_bytes": bundle.memory_bytes(),
+                    "in_flight": bundle.in_flight
+                }
+                for path, bundle in self._entries.items()
+            ]
+            active_bytes = self._active_bytes()
+            return {
+                "max_bytes": self.max_bytes,
+                "active_bytes": active_bytes,
+                "used_bytes": active_bytes + sum(model["memory_bytes"] for model in models),
+                "models": models,
+                "loads": self._loads,
+                "evictions": self._evictions,
+            }
@@ -1,4 +1,4 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 from pydantic import BaseModel, Field, field_validator
 
 class ClassifyRequest(BaseModel):
@@ -14,6 +14,32 @@ class ClassifyRequest(BaseModel):
         min_length=1,
         description= "Email content"
     )
+
+    modelId: Optional[int] = Field(
+        None,
+        description="Id in tblModel of the model to use (defaults to the active model)"
+    )
+    modelPath: Optional[str] = Field(
+        None,
+        description="Path of the model file to use, inside the model directory"
+    )
+    threshold: Optional[Union[float, Dict[str, float]]] = Field(
+        None,
+        description="Confidence threshold, either one value or per label ({label: threshold}); defaults to 0.5"
+    )
+    topK: Optional[int] = Field(
+        None,
+        ge=1,
+        description="Return at most this many labels"
+    )
+    
+    @field_validator('threshold')
+    @classmethod
+    def validate_threshold(cls, v):
+        values = v.values() if isinstance(v, dict) else ([] if v is None else [v])
+        if any(t < 0.0 or t > 1.0 for t in values):
+            raise ValueError('threshold must be between 0 and 1')
+        return v
     
     @field_validator('title','content')
     @classmethod
@@ -47,6 +73,69 @@ class ClassifyResponse(BaseModel):
                 ]
             }
         }
+class BatchClassifyRequest(BaseModel):
+    items: List[ClassifyRequest] = Field(
+        ...,
+        min_length=1,
+        max_length=1000,
+        description="Emails to classify in a single forward pass; an item's threshold/topK override the batch values"
+    )
+    modelId: Optional[int] = Field(
+        None,
+        description="Id in tblModel of the model for the whole batch to use (defaults to the active model)"
+    )
+    modelPath: Optional[str] = Field(
+        None,
+        description="Path of the model file to use, inside the model directory"
+    )
+    threshold: Optional[Union[float, Dict[str, float]]] = Field(
+        None,
+        description="Confidence threshold, either one value or per label ({label: threshold}); defaults to 0.5"
+    )
+    topK: Optional[int] = Field(
+        None,
+        ge=1,
+        description="Return at most this many labels"
+    )
+    
+    @field_validator('threshold')
+    @classmethod
+    def validate_threshold(cls, v):
+        values = v.values() if isinstance(v, dict) else ([] if v is None else [v])
+        if any(t < 0.0 or t > 1.0 for t in values):
+            raise ValueError('threshold must be between 0 and 1')
+        return v
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "items": [
+                    {
+                        "title": "Team Meeting Tomorrow",
+                        "content": "We have a team meeting scheduled for tomorrow at 10 AM."
+                    },
+                    {
+                        "title": "Flash sale 50%",
+                        "content": "Only today, get 50% off on all products."
+                    }
+                ]
+            }
+        }
+class BatchClassifyResponse(BaseModel):
+    results: List[ClassifyResponse] = Field(
+        ...,
+        description="Predicted labels per email, in request order"
+    )
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "results": [
+                    {"labels": [{"label": "Công việc", "confidence": 0.95}]},
+                    {"labels": [{"label": "Quảng cáo", "confidence": 0.91}]}
+                ]
+            }
+        }
 class HealthResponse(BaseModel):
     status: str = Field(..., description="Service status")
     model_loaded: bool = Field(..., description="ML model is loaded")
@@ -112,6 +201,35 @@ class Hyperparameters(BaseModel):
          le=1000,
          description="max sequence len"
      )
+     train_linear: bool = Field(
+         default=True,
+         description="Also train the hashing + linear first stage used by the cascade mode"
+     )
+     use_data_pipeline: bool = Field(
+         default=True,
+         description="Feed model.fit from a shuffled, cached, prefetched tf.data pipeline with length-bucketed batches"
+     )
+     mask_padding: bool = Field(
+         default=False,
+         description="RNN/LSTM/BiLSTM only: mask padding tokens in the embedding (changes the architecture), which lets use_data_pipeline bucket these models by length"
+     )
+     warm_start: bool = Field(
+         default=False,
+         description="Continue training the model at modelPath (default: the active model) with its vocabulary and labels; epochs defaults to WARM_START_EPOCHS"
+     )
+     freeze_embedding: bool = Field(
+         default=False,
+         description="Warm start only: keep the embedding rows of the existing vocabulary fixed"
+     )
+     grow_vocabulary: bool = Field(
+         default=False,
+         description="Warm start only: add embedding rows for words of the new samples that are not in the vocabulary"
+     )
+     new_word_min_count: int = Field(
+         default=2,
+         ge=1,
+         description="Warm start only: minimum occurrences for a new word to get an embedding row"
+     )
      
      class Config:
          json_schema_extra = {
@@ -120,7 +238,14 @@ class Hyperparameters(BaseModel):
                  "batch_size":32,
                  "learning_rate":0.0001,
                  "max_words": 50000,
-                 "max_len": 256
+                 "max_len": 256,
+                 "train_linear": True,
+                 "use_data_pipeline": True,
+                 "mask_padding": False,
+                 "warm_start": False,
+                 "freeze_embedding": False,
+                 "grow_vocabulary": False,
+                 "new_word_min_count": 2
              }
          }
 class RetrainRequest(BaseModel):
@@ -128,7 +253,7 @@ class RetrainRequest(BaseModel):
     modelType: str = Field(..., description="Model type (RNN, LSTM, BiLSTM, CNN, BiLSTM+CNN)")
     modelPath: Optional[str] = Field(
         None,  # Optional field (có thể None)
-        description="Path to existing model (optional)"
+        description="Path to existing model (optional), the base model of a warm start"
     )
     samples: List[TrainingSample] = Field(
         ..., 
@@ -136,6 +261,7 @@ class RetrainRequest(BaseModel):
         description="Training samples"
     )
     hyperparameters: Hyperparameters = Field(..., description="Training hyperparameters")
+    priority: int = Field(0, description="Queue priority, higher runs first; equal priorities run in submit order")
     @field_validator('modelType')
     @classmethod
     def validate_model_type(cls, v: str) -> str:
@@ -165,15 +291,30 @@ class RetrainRequest(BaseModel):
         }
 class RetrainResponse(BaseModel):
     jobId: str = Field(..., description="Training job ID")
-    status: str = Field(..., description="Job status (running, completed, failed)")
+    status: str = Field(..., description="Job status (queued, running, completed, failed)")
     message: str = Field(..., description="Status message")
+    queuePosition: Optional[int] = Field(None, description="Position in the training queue (0 = next to run)")
 
     class Config:
         json_schema_extra = {
             "example": {
                 "jobId": "123",
-                "status": "running",
-                "message": "Training started successfully"
+                "status": "queued",
+                "message": "Training job queued",
+                "queuePosition": 0
+            }
+        }
+class CancelTrainingResponse(BaseModel):
+    jobId: str = Field(..., description="Training job ID")
+    status: str = Field(..., description="Job status after the request (cancelled, cancelling)")
+    message: str = Field(..., description="Status message")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "jobId": "123",
+                "status": "cancelling",
+                "message": "Training will stop after the current batch"
             }
         }
 class TrainingProgress(BaseModel):
@@ -196,8 +337,10 @@ class TrainingStatusResponse(BaseModel):
     
     status: str = Field(
         ..., 
-        description="Job status (pending, running, completed, failed)"
+        description="Job status (pending, queued, running, completed, failed, cancelled)"
     )
+
+    queuePosition: Optional[int] = Field(None, description="Position in the training queue while queued")
     
     progress: Optional[TrainingProgress] = Field(
         None, 
@@ -250,6 +393,18 @@ class TrainingMetrics(BaseModel):
         None,
         description="Confusion matrix (if applicable)"
     )
+    trainingPipeline: Optional[Dict[str, Any]] = Field(
+        None,
+        description="Input pipeline used for model.fit: bucketing, steps per epoch, padded tokens and step time"
+    )
+    dataPreparation: Optional[Dict[str, Any]] = Field(
+        None,
+        description="Tokenization time and token cache hits/misses of this job"
+    )
+    warmStart: Optional[Dict[str, Any]] = Field(
+        None,
+        description="Base model, new words and embedding freezing of a warm-started job"
+    )
 
 class TrainingHistory(BaseModel):
     loss: List[float] = Field(..., description="Training loss history")
@@ -297,11 +452,29 @@ class SaveModelRequest(BaseModel):
         max_length=100, 
         description="Name for the saved model"
     )
+    exportTflite: bool = Field(
+        default=False,
+        description="Also export a TFLite version of the model"
+    )
+    quantization: str = Field(
+        default="none",
+        description="TFLite quantization (none, dynamic, int8)"
+    )
+    
+    @field_validator('quantization')
+    @classmethod
+    def validate_quantization(cls, v: str) -> str:
+        allowed = ['none', 'dynamic', 'int8']
+        if v not in allowed:
+            raise ValueError(f'Quantization must be one of {allowed}')
+        return v
 
     class Config:
         json_schema_extra = {
             "example": {
-                "modelName": "lstm_model_v2"
+                "modelName": "lstm_model_v2",
+                "exportTflite": True,
+                "quantization": "dynamic"
             }
         }
 class SaveModelResponse(BaseModel):
@@ -316,4 +489,16 @@ class SaveModelResponse(BaseModel):
                 "modelPath": "/models/lstm_model_v2.h5",
                 "message": "Model saved successfully"
             }
-        }
\ No newline at end of file
+        }
+class ReloadModelRequest(BaseModel):
+    modelPath: Optional[str] = Field(
+        None,
+        description="Model to load; defaults to the active model in tblModel"
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "modelPath": "ml_models/lstm_model_v2.h5"
+            }
+        }
@@ -0,0 +1,71 @@
+import json
+from typing import AsyncIterator, Iterable, Optional, Tuple
+from content_size_limit_asgi import ContentSizeLimitMiddleware
+from starlette.responses import StreamingResponse
+
+
+class StreamExemptContentSizeLimitMiddleware(ContentSizeLimitMiddleware):
+    """
+    ContentSizeLimitMiddleware bỏ qua các endpoint streaming.
+    Các endpoint này đọc body theo từng dòng và tự giới hạn độ dài mỗi dòng,
+    nên tổng kích thước body không ảnh hưởng tới bộ nhớ.
+    """
+    def __init__(self, app, exempt_paths: Iterable[str] = (), **kwargs):
+        super().__init__(app, **kwargs)
+        self.exempt_paths = set(exempt_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope.get("path") in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that does not listen for disconnect while streaming.
+    The handler is still reading the request body, so a concurrent receive() call
+    from the response would steal body chunks.
+    """
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[Tuple[int, bytes]]:
+    """
+    Yield (line number, line) from a chunked body without buffering more than one line.
+    Blank lines are skipped; a line longer than max_line_bytes raises ValueError.
+    """
+    buffer = bytearray()
+    line_no = 0
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        buffer.extend(chunk)
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end == -1:
+                break
+            line_no += 1
+            line = bytes(buffer[start:end]).strip()
+            start = end + 1
+            if len(line) > max_line_bytes:
+                raise ValueError(f"Line {line_no} exceeds {max_line_bytes} bytes")
+            if line:
+                yield line_no, line
+        del buffer[:start]
+        if len(buffer) > max_line_bytes:
+            raise ValueError(f"Line {line_no + 1} exceeds {max_line_bytes} bytes")
+
+    line = bytes(buffer).strip()
+    if line:
+        yield line_no + 1, line
+
+
+def ndjson_line(payload: dict) -> bytes:
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n"
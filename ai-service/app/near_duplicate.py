@@ -0,0 +1,175 @@
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+import numpy as np
+
+_WORD_RE = re.compile(r'\w+')
+# Số nguyên tố > 2^32: (a * x + b) với a, b, x < 2^32 vẫn nằm gọn trong uint64
+_MERSENNE_PRIME = np.uint64(4294967311)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+
+class NearDuplicateIndex:
+    """
+    Chỉ mục MinHash + LSH trên cửa sổ các email được phân loại gần đây.
+    Email template (khuyến mãi, spam campaign, thông báo ngân hàng) chỉ khác nhau vài từ
+    nên xác suất của email gần giống đã chấm được dùng lại, bỏ qua forward pass.
+
+    - Shingle là k từ liên tiếp, hash 32-bit ổn định (crc32) rồi trộn bằng NumPy
+    - Chữ ký num_perm giá trị, chia thành bands x rows cho LSH
+    - Ứng viên cùng bucket được kiểm tra lại bằng Jaccard ước lượng từ chữ ký >= threshold
+    - Cửa sổ FIFO có giới hạn, entry cũ nhất bị loại khỏi cả các bucket
+    """
+    def __init__(
+        self,
+        window: Optional[int] = None,
+        threshold: Optional[float] = None,
+        num_perm: Optional[int] = None,
+        bands: Optional[int] = None,
+        shingle_size: Optional[int] = None,
+        min_words: Optional[int] = None,
+        max_words: Optional[int] = None,
+        seed: int = 1
+    ):
+        self.window = window if window is not None else int(os.getenv('NEAR_DUP_WINDOW', 5000))
+        self.threshold = threshold if threshold is not None else float(os.getenv('NEAR_DUP_THRESHOLD', 0.9))
+        self.num_perm = num_perm or int(os.getenv('NEAR_DUP_NUM_PERM', 128))
+        self.bands = bands or int(os.getenv('NEAR_DUP_BANDS', 16))
+        self.shingle_size = shingle_size or int(os.getenv('NEAR_DUP_SHINGLE_SIZE', 3))
+        # Email quá ngắn thì vài từ khác nhau đã đổi nhãn, để exact cache xử lý
+        self.min_words = min_words if min_words is not None else int(os.getenv('NEAR_DUP_MIN_WORDS', 20))
+        self.max_words = max_words or int(os.getenv('NEAR_DUP_MAX_WORDS', 2000))
+        if self.num_perm % self.bands != 0:
+            raise ValueError("NEAR_DUP_NUM_PERM must be a multiple of NEAR_DUP_BANDS")
+        if not 0.0 < self.threshold <= 1.0:
+            raise ValueError("NEAR_DUP_THRESHOLD must be in (0, 1]")
+        self.rows = self.num_perm // self.bands
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 2 ** 32 - 1, size=(self.num_perm, 1), dtype=np.uint64)
+        self._b = rng.randint(0, 2 ** 32 - 1, size=(self.num_perm, 1), dtype=np.uint64)
+        self._mix = rng.randint(1, 2 ** 32 - 1, size=self.shingle_size, dtype=np.uint64)
+
+        self._entries: "OrderedDict[int, Tuple[str, np.ndarray, np.ndarray, List[bytes]]]" = OrderedDict()
+        self._buckets: Dict[bytes, Set[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._lookups = 0
+        self._skips = 0
+        self._too_short = 0
+        self._candidates = 0
+        self._evictions = 0
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash signature (num_perm uint32 values), or None when the text is too short to index"""
+        words = _WORD_RE.findall(text.lower())[:self.max_words]
+        if len(words) < self.min_words:
+            return None
+        word_hashes = np.fromiter(
+            (zlib.crc32(word.encode('utf-8')) for word in words), dtype=np.uint64, count=len(words)
+        )
+        k = min(self.shingle_size, len(words))
+        shingles = np.zeros(len(words) - k + 1, dtype=np.uint64)
+        for offset in range(k):
+            shingles ^= word_hashes[offset:len(words) - k + 1 + offset] * self._mix[offset]
+        shingles = np.unique(shingles & _MAX_HASH)
+        hashed = (self._a * shingles + self._b) % _MERSENNE_PRIME
+        return (hashed.min(axis=1) & _MAX_HASH).astype(np.uint32)
+
+    def _band_keys(self, model_id: str, signature: np.ndarray) -> List[bytes]:
+        prefix = zlib.crc32(model_id.encode('utf-8')).to_bytes(4, 'little')
+        return [
+            prefix + band.to_bytes(2, 'little') + signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def lookup(self, model_id: str, signature: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        """Probabilities of the most similar indexed email, if its estimated Jaccard >= threshold"""
+        with self._lock:
+            self._lookups += 1
+            if signature is None:
+                self._too_short += 1
+                return None
+            candidates: Set[int] = set()
+            for key in self._band_keys(model_id, signature):
+                bucket = self._buckets.get(key)
+                if bucket:
+                    candidates.update(bucket)
+            best, best_similarity = None, self.threshold
+            self._candidates += len(candidates)
+            for entry_id in candidates:
+                entry_model, other, probabilities, _ = self._entries[entry_id]
+                if entry_model != model_id:
+                    continue
+                similarity = np.count_nonzero(other == signature) / self.num_perm
+                if similarity >= best_similarity:
+                    best, best_similarity = probabilities, similarity
+            if best is not None:
+                self._skips += 1
+            return best
+
+    def add(self, model_id: str, signature: Optional[np.ndarray], probabilities: np.ndarray) -> None:
+        if signature is None or self.window <= 0:
+            return
+        value = np.array(probabilities, dtype=np.float32)
+        value.flags.writeable = False
+        keys = self._band_keys(model_id, signature)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (model_id, signature, value, keys)
+            for key in keys:
+                self._buckets.setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self.window:
+                self._evict_oldest()
+
+    def _evict_oldest(self) -> None:
+        entry_id, (_, _, _, keys) = self._entries.popitem(last=False)
+        for key in keys:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[key]
+        self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def memory_bytes(self) -> int:
+        """Approximate memory of signatures, stored probabilities and LSH buckets"""
+        with self._lock:
+            if not self._entries:
+                return 0
+            _, signature, probabilities, keys = next(iter(self._entries.values()))
+            # Chi phí object Python của tuple/ndarray/bytes/set ước lượng cố định cho mỗi entry
+            per_entry = (
+                signature.nbytes + probabilities.nbytes + 2 * 112
+                + sum(len(key) + 33 for key in keys) + self.bands * 64
+            )
+            return len(self._entries) * per_entry
+
+    def get_stats(self) -> Dict[str, Any]:
+        memory = self.memory_bytes()
+        with self._lock:
+            return {
+                "enabled": True,
+                "size": len(self._entries),
+                "window": self.window,
+                "threshold": self.threshold,
+                "num_perm": self.num_perm,
+                "bands": self.bands,
+                "lookups": self._lookups,
+                "skips": self._skips,
+                "skip_rate": self._skips / self._lookups if self._lookups else 0.0,
+                "too_short": self._too_short,
+                "avg_candidates": self._candidates / self._lookups if self._lookups else 0.0,
+                "evictions": self._evictions,
+                "buckets": len(self._buckets),
+                "memory_bytes": memory,
+            }
@@ -0,0 +1,98 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+
+_WHITESPACE_RE = re.compile(r'[ \t\n]+')
+
+
+def normalize_text(text: str, lower: bool = True, collapse_whitespace: bool = True) -> str:
+    """
+    Chuẩn hóa text trước khi hash. Chỉ áp dụng các biến đổi không làm thay đổi
+    kết quả tokenize (lowercase, gộp khoảng trắng) để cache không bao giờ trả sai nhãn.
+    """
+    if lower:
+        text = text.lower()
+    if collapse_whitespace:
+        text = _WHITESPACE_RE.sub(' ', text).strip(' ')
+    return text
+
+
+class PredictionCache:
+    """
+    Cache xác suất dự đoán theo hash nội dung email + định danh model.
+    LRU với số entry tối đa, TTL tùy chọn; xóa toàn bộ khi model được load lại.
+    """
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('PREDICTION_CACHE_SIZE', 10000))
+        ttl = ttl_seconds if ttl_seconds is not None else float(os.getenv('PREDICTION_CACHE_TTL', 0))
+        self.ttl_seconds = ttl if ttl > 0 else None
+        self._entries: "OrderedDict[str, Tuple[np.ndarray, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    @staticmethod
+    def make_key(normalized_text: str, model_id: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(model_id.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(normalized_text.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            probabilities, stored_at = entry
+            if self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return probabilities
+
+    def put(self, key: str, probabilities: np.ndarray) -> None:
+        if self.max_entries <= 0:
+            return
+        # Lưu bản sao read-only để không bị sửa từ bên ngoài
+        value = np.array(probabilities, dtype=np.float32)
+        value.flags.writeable = False
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._invalidations += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.max_entries > 0,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+            }
@@ -0,0 +1,161 @@
+import html
+import os
+import re
+from typing import Dict, Iterator, Optional, Tuple
+from .metrics import REGISTRY
+from .tokenizer_engine import FastTokenizer
+
+# Chỉ coi là HTML khi có dấu hiệu rõ ở đầu email: doctype/<html>, <br> hoặc một thẻ đóng đúng dạng.
+# Text thường như "a<b and c>d" hay "<a few words" vẫn giữ nguyên
+_HTML_HINT_RE = re.compile(
+    r'<!doctype\s+html|<html[\s>]|<br\s*/?>'
+    r'|</(?:head|body|div|p|table|tr|td|span|a|font|style|script|center|b|i|u|strong|em|ul|ol|li|h[1-6])\s*>',
+    re.IGNORECASE
+)
+_BLOCK_OPEN_RE = re.compile(r'<(script|style)\b[^>]*>', re.IGNORECASE)
+_BLOCK_CLOSE_RE = {
+    name: re.compile(rf'</{name}\s*>', re.IGNORECASE) for name in ('script', 'style')
+}
+_COMMENT_RE = re.compile(r'<!--.*?-->', re.DOTALL)
+_TAG_RE = re.compile(r'<[^>]*>')
+# Base64 MIME được ngắt dòng (76 ký tự): chỉ bỏ khối từ hai dòng dài liền nhau chỉ gồm ký tự
+# base64, không bỏ một chuỗi dài đơn lẻ (đường dẫn URL, id có dấu '/')
+_BASE64_BLOCK_RE = re.compile(
+    r'(?:^[A-Za-z0-9+/]{60,}={0,2}[ \t]*\r?\n){2,}(?:[A-Za-z0-9+/]+={0,2}[ \t]*(?:\r?\n|$))?',
+    re.MULTILINE
+)
+# Phần thân ngay sau header Content-Transfer-Encoding: base64 (kể cả khối ngắn một dòng)
+_BASE64_PART_RE = re.compile(
+    r'(content-transfer-encoding:[ \t]*base64[^\n]*\n(?:[!-9;-~]+:[^\n]*\n)*[ \t]*\r?\n)'
+    r'(?:[A-Za-z0-9+/]+={0,2}[ \t]*(?:\r?\n|$))+',
+    re.IGNORECASE
+)
+
+PREPROCESS_TRUNCATED = REGISTRY.counter(
+    'preprocess_truncated_total', 'Emails cut off after the token budget was reached'
+)
+PREPROCESS_STRIPPED = REGISTRY.counter(
+    'preprocess_stripped_total', 'Emails with HTML or base64 removed', ['kind']
+)
+
+
+class TextPreprocessor:
+    """
+    Chuẩn bị text cho model với khối lượng công việc giới hạn theo kích thước input của model:
+    quét email theo từng đoạn, bỏ HTML/base64, và dừng khi đã có đủ max_tokens token trong vocab.
+
+    Email thường (không HTML, không base64, ít hơn max_tokens token) được trả về nguyên vẹn,
+    email dài hơn bị cắt sau đoạn chứa token thứ max_tokens nên tokenizer cho cùng kết quả.
+    """
+    def __init__(
+        self,
+        counter: Optional[FastTokenizer],
+        chunk_chars: Optional[int] = None,
+        strip_html: Optional[bool] = None,
+        strip_base64: Optional[bool] = None
+    ):
+        self.counter = counter
+        # Chỉ cắt tại ký tự mà tokenizer cũng coi là ranh giới từ
+        boundaries = {' ', '\t', '\n'} if counter is None else (
+            {counter.split} | {c for c in counter.filters if c.isspace()}
+        )
+        self._boundary_re = re.compile('[' + re.escape(''.join(sorted(boundaries))) + ']')
+        self.chunk_chars = chunk_chars or int(os.getenv('PREPROCESS_CHUNK_CHARS', 8192))
+        self.strip_html = strip_html if strip_html is not None else os.getenv('PREPROCESS_STRIP_HTML', 'true').lower() == 'true'
+        self.strip_base64 = strip_base64 if strip_base64 is not None else os.getenv('PREPROCESS_STRIP_BASE64', 'true').lower() == 'true'
+
+    @classmethod
+    def from_keras(cls, tokenizer) -> 'TextPreprocessor':
+        """Counting uses a FastTokenizer even when FAST_TOKENIZER is off; unsupported tokenizers disable the early stop"""
+        try:
+            counter = FastTokenizer.from_keras(tokenizer)
+        except ValueError:
+            counter = None
+        if counter is not None and len(counter.split) != 1:
+            counter = None
+        return cls(counter)
+
+    def _pieces(self, text: str, is_html: bool) -> Iterator[Tuple[int, int]]:
+        """
+        (start, end) spans covering text, cut at word boundaries so no word is split and,
+        for HTML, not inside a tag.
+        """
+        start = 0
+        while start < len(text):
+            end = start + self.chunk_chars
+            if end >= len(text):
+                yield start, len(text)
+                return
+            # Không tìm ranh giới quá một chunk: chuỗi dài như vậy không phải từ trong vocab
+            match = self._boundary_re.search(text, end, end + self.chunk_chars)
+            cut = match.start() if match else end + self.chunk_chars
+            if is_html:
+                tag_open = text.rfind('<', start, cut)
+                if tag_open > text.rfind('>', start, cut) and tag_open > start:
+                    cut = tag_open
+            yield start, cut
+            start = cut
+
+    def _clean_html(self, piece: str, state: Dict[str, Optional[str]]) -> str:
+        kept = []
+        pos = 0
+        if state['skip']:
+            close = _BLOCK_CLOSE_RE[state['skip']].search(piece)
+            if close is None:
+                return ''
+            pos = close.end()
+            state['skip'] = None
+        while True:
+            block = _BLOCK_OPEN_RE.search(piece, pos)
+            if block is None:
+                kept.append(piece[pos:])
+                break
+            kept.append(piece[pos:block.start()])
+            name = block.group(1).lower()
+            close = _BLOCK_CLOSE_RE[name].search(piece, block.end())
+            if close is None:
+                # Script/style kéo sang đoạn sau
+                state['skip'] = name
+                break
+            pos = close.end()
+        text = ' '.join(kept)
+        text = _COMMENT_RE.sub(' ', text)
+        text = _TAG_RE.sub(' ', text)
+        # &nbsp; -> khoảng trắng thường để tokenizer tách từ
+        return html.unescape(text).replace('\xa0', ' ')
+
+    def prepare(self, title: str, content: str, max_tokens: Optional[int]) -> str:
+        """Model text for one email, as f"{title} {content}" with noise removed and bounded to max_tokens"""
+        text = f"{title} {content}"
+        is_html = self.strip_html and _HTML_HINT_RE.search(text, 0, 4096) is not None
+        counter = self.counter if max_tokens else None
+        if not is_html and counter is None and not self.strip_base64:
+            return text
+
+        pieces = []
+        changed = False
+        counted = 0
+        state: Dict[str, Optional[str]] = {'skip': None}
+        for start, end in self._pieces(text, is_html):
+            piece = text[start:end]
+            cleaned = self._clean_html(piece, state) if is_html else piece
+            if self.strip_base64:
+                cleaned = _BASE64_BLOCK_RE.sub(' ', _BASE64_PART_RE.sub(r'\1 ', cleaned))
+            changed = changed or cleaned != piece
+            pieces.append(cleaned)
+            if counter is not None:
+                counted += len(counter.encode(cleaned, max_tokens - counted))
+                if counted >= max_tokens:
+                    if end < len(text):
+                        PREPROCESS_TRUNCATED.inc()
+                        if not changed:
+                            return text[:end]
+                    break
+
+        if not changed:
+            return text
+        if is_html:
+            PREPROCESS_STRIPPED.inc(kind='html')
+        else:
+            PREPROCESS_STRIPPED.inc(kind='base64')
+        return ''.join(pieces)
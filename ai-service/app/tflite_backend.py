@@ -0,0 +1,106 @@
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+
+def _interpreter_api(prefer_litert: bool) -> Tuple[Any, Any]:
+    """
+    (Interpreter, OpResolverType) của runtime được chọn.
+    ai_edge_litert (tùy chọn) chỉ chứa interpreter nên nhẹ hơn nhiều so với import cả TensorFlow.
+    """
+    if prefer_litert:
+        try:
+            from ai_edge_litert.interpreter import Interpreter, OpResolverType
+            return Interpreter, OpResolverType
+        except ImportError:
+            pass
+    import tensorflow as tf
+    return tf.lite.Interpreter, tf.lite.experimental.OpResolverType
+
+
+class TFLiteBackend:
+    """
+    Inference backend dựa trên TFLite interpreter (model đã export, có thể đã quantize).
+    Interpreter không thread-safe nên mỗi lần gọi mượn riêng một interpreter đã dựng sẵn cho
+    batch size đó (tạo thêm khi tất cả đang bận); file .tflite được mmap nên các interpreter
+    dùng chung trọng số. Interpreter được warmup ở thread nào cũng dùng lại được ở thread khác.
+    """
+    def __init__(
+        self,
+        model_path: str,
+        num_threads: Optional[int] = None,
+        use_xnnpack: bool = True,
+        prefer_litert: bool = False
+    ):
+        self.model_path = model_path
+        self.num_threads = num_threads or int(os.getenv('TFLITE_NUM_THREADS', 1))
+        self._use_xnnpack = use_xnnpack
+        self._idle: Dict[int, List[Any]] = {}
+        self._pool_lock = threading.Lock()
+        self._set_runtime(prefer_litert)
+        # Load ngay để báo lỗi sớm nếu file không hợp lệ
+        try:
+            probe = self._create_interpreter(None)
+        except (RuntimeError, ValueError):
+            if self.runtime != 'litert':
+                raise
+            # Model LSTM export với SELECT_TF_OPS cần Flex delegate => chỉ TensorFlow chạy được
+            print(f"LiteRT cannot run {model_path}, falling back to tf.lite")
+            self._set_runtime(False)
+            probe = self._create_interpreter(None)
+        self.input_len = int(probe.get_input_details()[0]['shape'][1])
+
+    def _set_runtime(self, prefer_litert: bool) -> None:
+        self._interpreter_cls, op_resolver_type = _interpreter_api(prefer_litert)
+        self.runtime = 'litert' if self._interpreter_cls.__module__.startswith('ai_edge_litert') else 'tensorflow'
+        # XNNPACK nhanh hơn nhưng copy trọng số ra bộ nhớ riêng (không còn dùng chung file mmap)
+        self._op_resolver = (
+            op_resolver_type.AUTO if self._use_xnnpack
+            else op_resolver_type.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+        )
+
+    def _create_interpreter(self, batch_size: Optional[int]):
+        interpreter = self._interpreter_cls(
+            model_path=self.model_path,
+            num_threads=self.num_threads,
+            experimental_op_resolver_type=self._op_resolver
+        )
+        if batch_size is not None:
+            input_detail = interpreter.get_input_details()[0]
+            interpreter.resize_tensor_input(
+                input_detail['index'],
+                [batch_size, int(input_detail['shape'][1])]
+            )
+        interpreter.allocate_tensors()
+        return interpreter
+
+    def _checkout(self, batch_size: int):
+        with self._pool_lock:
+            idle = self._idle.get(batch_size)
+            if idle:
+                return idle.pop()
+        return self._create_interpreter(batch_size)
+
+    def _checkin(self, batch_size: int, interpreter) -> None:
+        with self._pool_lock:
+            self._idle.setdefault(batch_size, []).append(interpreter)
+
+    def predict(self, padded: np.ndarray) -> np.ndarray:
+        """Return label probabilities for a (batch, max_len) array of token ids"""
+        interpreter = self._checkout(len(padded))
+        try:
+            input_detail = interpreter.get_input_details()[0]
+            output_detail = interpreter.get_output_details()[0]
+
+            interpreter.set_tensor(input_detail['index'], padded.astype(input_detail['dtype']))
+            interpreter.invoke()
+            output = interpreter.get_tensor(output_detail['index'])
+        finally:
+            self._checkin(len(padded), interpreter)
+
+        # Output int8 (full-integer quantization) cần dequantize về xác suất
+        if output_detail['dtype'] != np.float32:
+            scale, zero_point = output_detail['quantization']
+            output = (output.astype(np.float32) - zero_point) * scale
+        return np.array(output, dtype=np.float32)
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from tensorflow.keras.preprocessing.text import text_to_word_sequence
+
+
+def tokenizer_fingerprint(tokenizer) -> str:
+    """Hash of the Keras Tokenizer settings that decide how a text is split into words"""
+    config = {
+        'version': 1,
+        'filters': tokenizer.filters,
+        'lower': tokenizer.lower,
+        'split': tokenizer.split,
+    }
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+class TokenSequenceCache:
+    """
+    Cache trên đĩa (SQLite) chuỗi từ đã tách của từng email train, khóa theo
+    (id email, hash nội dung, fingerprint cấu hình tách từ của tokenizer).
+
+    Vocab được fit lại ở mỗi job nên token id thay đổi giữa các lần train; thứ được cache là
+    chuỗi từ, Keras Tokenizer nhận trực tiếp list từ cho fit_on_texts/texts_to_sequences và
+    cho cùng kết quả như khi tách từ text gốc. Email sửa nội dung có hash khác nên được tách
+    lại và ghi đè bản cũ của cùng id.
+
+    Email không được train lại trong max_age_days (hoặc cũ nhất khi vượt max_rows) bị xóa
+    sau mỗi lần ghi để file không lớn mãi theo số email từng gặp.
+    """
+    # Chỉ cập nhật updated_at của entry được dùng lại nếu đã cũ hơn khoảng này, tránh ghi mỗi lần hit
+    TOUCH_INTERVAL = 24 * 3600
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        enabled: Optional[bool] = None,
+        max_age_days: Optional[float] = None,
+        max_rows: Optional[int] = None
+    ):
+        self.path = path or os.getenv('TOKEN_CACHE_PATH', 'ml_models/token_cache.sqlite')
+        self.enabled = enabled if enabled is not None else os.getenv('TOKEN_CACHE_ENABLED', 'true').lower() == 'true'
+        self.max_age_days = max_age_days if max_age_days is not None else float(os.getenv('TOKEN_CACHE_MAX_AGE_DAYS', 30))
+        self.max_rows = max_rows if max_rows is not None else int(os.getenv('TOKEN_CACHE_MAX_ROWS', 500000))
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Process train và process API có thể cùng mở file
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS token_sequences ('
+            'sample_id TEXT NOT NULL, fingerprint TEXT NOT NULL, content_hash TEXT NOT NULL, '
+            'tokens TEXT NOT NULL, updated_at REAL NOT NULL, PRIMARY KEY (sample_id, fingerprint))'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS token_sequences_updated_at ON token_sequences (updated_at)')
+        return conn
+
+    def _load(self, conn: sqlite3.Connection, fingerprint: str, keys: Sequence[str]) -> Dict[str, Tuple[str, str, float]]:
+        cached = {}
+        # Giới hạn số tham số của một câu SQL
+        for start in range(0, len(keys), 500):
+            part = keys[start:start + 500]
+            rows = conn.execute(
+                f"SELECT sample_id, content_hash, tokens, updated_at FROM token_sequences "
+                f"WHERE fingerprint = ? AND sample_id IN ({','.join('?' * len(part))})",
+                [fingerprint, *part]
+            )
+            for sample_id, digest, tokens, updated_at in rows:
+                cached[sample_id] = (digest, tokens, updated_at)
+        return cached
+
+    def _prune(self, conn: sqlite3.Connection, now: float) -> int:
+        """Delete entries unused for max_age_days, then the oldest ones above max_rows"""
+        removed = 0
+        if self.max_age_days > 0:
+            removed += conn.execute(
+                'DELETE FROM token_sequences WHERE updated_at < ?', (now - self.max_age_days * 86400,)
+            ).rowcount
+        if self.max_rows > 0:
+            excess = conn.execute('SELECT COUNT(*) FROM token_sequences').fetchone()[0] - self.max_rows
+            if excess > 0:
+                removed += conn.execute(
+                    'DELETE FROM token_sequences WHERE rowid IN '
+                    '(SELECT rowid FROM token_sequences ORDER BY updated_at LIMIT ?)', (excess,)
+                ).rowcount
+        return removed
+
+    def word_sequences(
+        self,
+        tokenizer,
+        sample_ids: Sequence[Any],
+        texts: Sequence[str]
+    ) -> Tuple[List[List[str]], Dict[str, Any]]:
+        """
+        Word lists for texts as tokenizer.fit_on_texts would split them, reusing cached
+        entries whose sample id and content hash match. Returns the lists and hit statistics.
+        """
+        start = time.perf_counter()
+        split = tokenizer.split
+        fingerprint = tokenizer_fingerprint(tokenizer)
+        keys = [str(sample_id) for sample_id in sample_ids]
+        digests = [content_hash(text) for text in texts]
+
+        with self._lock, closing(self._connect()) as conn:
+            cached = self._load(conn, fingerprint, list(set(keys)))
+            sequences: List[List[str]] = []
+            new_rows = []
+            touched = set()
+            now = time.time()
+            for key, digest, text in zip(keys, digests, texts):
+                entry = cached.get(key)
+                if entry is not None and entry[0] == digest:
+                    sequences.append(entry[1].split(split) if entry[1] else [])
+                    if entry[2] < now - self.TOUCH_INTERVAL:
+                        touched.add(key)
+                    continue
+                words = text_to_word_sequence(text, filters=tokenizer.filters, lower=tokenizer.lower, split=split)
+                sequences.append(words)
+                new_rows.append((key, fingerprint, digest, split.join(words), now))
+                cached[key] = (digest, split.join(words), now)
+            with conn:
+                conn.executemany('INSERT OR REPLACE INTO token_sequences VALUES (?, ?, ?, ?, ?)', new_rows)
+                conn.executemany(
+                    'UPDATE token_sequences SET updated_at = ? WHERE sample_id = ? AND fingerprint = ?',
+                    [(now, key, fingerprint) for key in touched]
+                )
+                evicted = self._prune(conn, now)
+
+        hits = len(texts) - len(new_rows)
+        stats = {
+            'hits': hits,
+            'misses': len(new_rows),
+            'hitRate': hits / len(texts) if len(texts) else 0.0,
+            'evicted': evicted,
+            'seconds': time.perf_counter() - start,
+        }
+        return sequences, stats
@@ -0,0 +1,110 @@
+from typing import Dict, List, Optional
+import numpy as np
+
+KERAS_DEFAULT_FILTERS = '!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~\t\n'
+
+
+class FastTokenizer:
+    """
+    Tokenizer cho inference, cho kết quả giống hệt Keras Tokenizer.texts_to_sequences
+    + pad_sequences(padding='post', truncating='post').
+
+    - Bảng translate được tạo một lần, tách từ bằng str.split
+    - Vocab được cắt sẵn theo num_words nên mỗi từ chỉ cần một lần tra dict
+    - Quét text theo từng đoạn và dừng ngay khi đủ max_len token
+    - Ghi thẳng vào mảng NumPy int32 cấp phát trước
+    """
+    def __init__(
+        self,
+        word_index: Dict[str, int],
+        num_words: Optional[int] = None,
+        filters: str = KERAS_DEFAULT_FILTERS,
+        lower: bool = True,
+        split: str = ' ',
+        oov_token: Optional[str] = None
+    ):
+        self.num_words = num_words
+        self.lower = lower
+        self.split = split
+        self.filters = filters
+        self._translate_map = str.maketrans({c: split for c in filters})
+
+        # Giống Keras: từ có index >= num_words được thay bằng OOV (nếu có) hoặc bỏ qua
+        self._oov_id = word_index.get(oov_token) if oov_token is not None else None
+        self._lookup = {
+            word: idx for word, idx in word_index.items()
+            if not num_words or idx < num_words
+        }
+
+    @classmethod
+    def from_keras(cls, tokenizer) -> 'FastTokenizer':
+        """Build from a fitted keras.preprocessing.text.Tokenizer"""
+        if getattr(tokenizer, 'char_level', False) or getattr(tokenizer, 'analyzer', None) is not None:
+            raise ValueError("FastTokenizer only supports word-level tokenizers without a custom analyzer")
+        return cls(
+            word_index=tokenizer.word_index,
+            num_words=tokenizer.num_words,
+            filters=tokenizer.filters,
+            lower=tokenizer.lower,
+            split=tokenizer.split,
+            oov_token=tokenizer.oov_token
+        )
+
+    def _chunks(self, text: str, max_len: Optional[int]):
+        """
+        Cắt text thành các đoạn tại ký tự split để có thể dừng sớm.
+        Không từ nào bị cắt đôi nên ghép các đoạn lại cho đúng dãy từ như xử lý cả chuỗi.
+        """
+        if max_len is None or len(self.split) != 1:
+            yield text
+            return
+        chunk_chars = max(1024, max_len * 16)
+        start = 0
+        while start < len(text):
+            cut = text.find(self.split, start + chunk_chars)
+            if cut == -1:
+                yield text[start:]
+                return
+            yield text[start:cut]
+            start = cut + 1
+
+    def encode(self, text: str, max_len: Optional[int] = None) -> List[int]:
+        """Token ids of one text, stopping after max_len ids"""
+        get = self._lookup.get
+        oov_id = self._oov_id
+        ids: List[int] = []
+        for chunk in self._chunks(text, max_len):
+            if self.lower:
+                chunk = chunk.lower()
+            words = chunk.translate(self._translate_map).split(self.split)
+            if oov_id is None:
+                # '' không có trong vocab nên cũng bị loại cùng các từ lạ
+                ids.extend([idx for idx in map(get, words) if idx is not None])
+            else:
+                ids.extend([get(word, oov_id) for word in words if word])
+            if max_len is not None and len(ids) >= max_len:
+                return ids[:max_len]
+        return ids
+
+    def encode_words(self, words: List[str]) -> List[int]:
+        """Token ids of a text already split (and lowercased) the way the Keras Tokenizer does"""
+        get = self._lookup.get
+        if self._oov_id is None:
+            return [idx for idx in map(get, words) if idx is not None]
+        return [get(word, self._oov_id) for word in words]
+
+    def texts_to_sequences(self, texts: List[str]) -> List[List[int]]:
+        return [self.encode(text) for text in texts]
+
+    @staticmethod
+    def pad(sequences: List[List[int]], max_len: int) -> np.ndarray:
+        """(len(sequences), max_len) int32 array, post-padded and post-truncated"""
+        padded = np.zeros((len(sequences), max_len), dtype=np.int32)
+        for row, ids in enumerate(sequences):
+            ids = ids[:max_len]
+            padded[row, :len(ids)] = ids
+        return padded
+
+    def texts_to_padded(self, texts: List[str], max_len: int) -> np.ndarray:
+        """(len(texts), max_len) int32 array, post-padded and post-truncated"""
+        return self.pad([self.encode(text, max_len) for text in texts], max_len)
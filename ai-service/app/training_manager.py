@@ -2,6 +2,10 @@ import threading
 from typing import Dict, Any, Optional
 from datetime import datetime
 
+class TrainingCancelledError(Exception):
+    """Raised inside a training run after its job was cancelled"""
+
+
 class TrainingJobManager:
     _instance = None
     _lock = threading.Lock()
@@ -130,6 +134,28 @@ class TrainingJobManager:
                 self._jobs[job_id]['_full_results'] = results
                 
                 print(f"Job {job_id} completed successfully")
+    def cancel_job(self, job_id: str) -> None:
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id]['status'] = 'cancelled'
+                self._jobs[job_id]['error'] = 'Cancelled by user'
+                self._jobs[job_id]['updatedAt'] = datetime.now().isoformat()
+                # Không giữ model/kết quả dở dang của job đã hủy
+                self._jobs[job_id].pop('_full_results', None)
+                print(f"Job {job_id} cancelled")
+    def release_results(self, job_id: str) -> None:
+        """Bỏ model/kết quả đầy đủ của job khi không cần nữa (file tạm đã bị xóa sau khi lưu)"""
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].pop('_full_results', None)
+    def add_log(self, job_id: str, message: str) -> None:
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].setdefault('logs', []).append({
+                    'timestamp': datetime.now().isoformat(),
+                    'message': message
+                })
+                self._jobs[job_id]['updatedAt'] = datetime.now().isoformat()
     def fail_job(self, job_id: str, error: str) -> None:
         with self._lock:
             if job_id in self._jobs:
@@ -181,6 +207,14 @@ class TrainingJobManager:
                 jobs_copy[job_id] = job_copy
             return jobs_copy
     
+    def count_by_status(self) -> Dict[str, int]:
+        """Number of jobs per status, without copying job results"""
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+            return counts
+    
     def delete_job(self, job_id: str) -> bool:
         with self._lock:
             if job_id in self._jobs:
@@ -0,0 +1,118 @@
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.callbacks import Callback
+
+
+def bucket_boundaries(length_buckets: List[int], max_len: int) -> List[int]:
+    """
+    bucket_by_sequence_length boundaries from the length buckets of compute_length_buckets:
+    bucket i holds lengths in [boundaries[i-1], boundaries[i]), the last one up to max_len.
+    """
+    return [bucket + 1 for bucket in length_buckets if 0 < bucket < max_len]
+
+
+def count_steps(lengths: np.ndarray, boundaries: List[int], batch_size: int) -> int:
+    """Number of batches bucket_by_sequence_length yields per epoch (the last batch of each bucket may be partial)"""
+    if len(lengths) == 0:
+        return 0
+    counts = np.bincount(np.searchsorted(boundaries, lengths, side='right'), minlength=len(boundaries) + 1)
+    return int(np.sum(np.ceil(counts / batch_size)))
+
+
+def build_dataset(
+    X: np.ndarray,
+    y: np.ndarray,
+    batch_size: int,
+    pad_extra: Optional[int],
+    length_buckets: List[int],
+    shuffle: bool = True,
+    seed: int = 42
+) -> Tuple[tf.data.Dataset, int, Dict[str, Any]]:
+    """
+    tf.data pipeline cho model.fit từ mảng đã pad (post) của prepare_data.
+
+    pad_extra là số ô padding phải giữ sau token cuối (padding_margin của model): khi không
+    None, email được gom theo bucket độ dài và mỗi batch chỉ pad tới email dài nhất + pad_extra,
+    output của model giống hệt khi pad đủ max_len. None => batch pad đủ max_len như cũ.
+    Cache sau bước cắt padding, shuffle mỗi epoch, prefetch để chuẩn bị batch kế tiếp
+    song song với bước train.
+
+    Returns the dataset, its number of steps per epoch and the padding statistics.
+    """
+    max_len = X.shape[1]
+    # Token id 0 chỉ có ở phần padding (post); giữ ít nhất một ô để không có chuỗi rỗng
+    lengths = np.maximum(np.count_nonzero(X, axis=1), 1).astype(np.int32)
+    y = y.astype(np.float32)
+
+    dataset = tf.data.Dataset.from_tensor_slices((X.astype(np.int32), lengths, y))
+    if pad_extra is None:
+        dataset = dataset.map(lambda x, length, label: (x, label)).cache()
+        if shuffle:
+            dataset = dataset.shuffle(len(X), seed=seed, reshuffle_each_iteration=True)
+        dataset = dataset.batch(batch_size)
+        steps = int(np.ceil(len(X) / batch_size))
+        padded_tokens = len(X) * max_len
+    else:
+        boundaries = bucket_boundaries(length_buckets, max_len)
+        dataset = dataset.map(lambda x, length, label: (x[:length], label), num_parallel_calls=tf.data.AUTOTUNE).cache()
+        if shuffle:
+            dataset = dataset.shuffle(len(X), seed=seed, reshuffle_each_iteration=True)
+        dataset = dataset.bucket_by_sequence_length(
+            lambda x, label: tf.shape(x)[0],
+            bucket_boundaries=boundaries,
+            bucket_batch_sizes=[batch_size] * (len(boundaries) + 1)
+        )
+        if pad_extra:
+            dataset = dataset.map(
+                lambda x, label: (tf.pad(x, [[0, 0], [0, pad_extra]])[:, :max_len], label),
+                num_parallel_calls=tf.data.AUTOTUNE
+            )
+        steps = count_steps(lengths, boundaries, batch_size)
+        # Cận trên: batch pad tới email dài nhất, không quá biên của bucket
+        bucket_width = np.array([b - 1 for b in boundaries] + [max_len])
+        idx = np.searchsorted(boundaries, lengths, side='right')
+        padded_tokens = int(np.minimum(bucket_width[idx] + pad_extra, max_len).sum())
+        # Cardinality không suy ra được sau group_by_window, Keras cần nó cho params['steps']
+        dataset = dataset.apply(tf.data.experimental.assert_cardinality(steps))
+
+    dataset = dataset.prefetch(tf.data.AUTOTUNE)
+    stats = {
+        'bucketed': pad_extra is not None,
+        'steps': steps,
+        'realTokensPerEpoch': int(lengths.sum()),
+        'paddedTokensPerEpoch': int(padded_tokens),
+    }
+    return dataset, steps, stats
+
+
+class StepTimeCallback(Callback):
+    """
+    Thời gian từng bước train (ms), tính giữa hai lần kết thúc batch liên tiếp nên gồm cả
+    thời gian đợi dữ liệu. Bước đầu mỗi epoch bị loại (trace, batch đầu tiên).
+    """
+    def __init__(self):
+        super().__init__()
+        self.step_ms: List[float] = []
+        self._last = None
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._last = None
+
+    def on_train_batch_end(self, batch, logs=None):
+        now = time.perf_counter()
+        if self._last is not None:
+            self.step_ms.append((now - self._last) * 1000.0)
+        self._last = now
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        if not self.step_ms:
+            return {'steps': 0, 'meanMs': None, 'p50Ms': None, 'p95Ms': None}
+        values = np.array(self.step_ms)
+        return {
+            'steps': len(values),
+            'meanMs': float(values.mean()),
+            'p50Ms': float(np.percentile(values, 50)),
+            'p95Ms': float(np.percentile(values, 95)),
+        }
@@ -1,5 +1,6 @@
 import numpy as np
-from typing import List, Tuple, Dict, Any
+import tensorflow as tf
+from typing import List, Tuple, Dict, Any, Optional
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import MultiLabelBinarizer
 from sklearn.metrics import classification_report, hamming_loss, accuracy_score, f1_score
@@ -14,16 +15,31 @@ from tensorflow.keras.layers import (
 from tensorflow.keras.utils import to_categorical
 from tensorflow.keras.optimizers import Adam
 from tensorflow.keras.callbacks import Callback
+import gc
 import joblib
 import os
+import threading
 import json
 import pickle
+import shutil
+import time
+from .linear_cascade import LinearCascadeModel, evaluate_cascade
+from .model_bundle import padding_margin
+from .tflite_backend import TFLiteBackend
+from .token_cache import TokenSequenceCache
+from .tokenizer_engine import FastTokenizer
+from .training_manager import TrainingCancelledError
+from .training_pipeline import StepTimeCallback, build_dataset
+from .warm_start import (
+    embedding_layer, extend_vocabulary, grow_embedding, load_base_model, prepare_warm_model, release_warm_model
+)
 
 class TrainingCallback(Callback):
-    def __init__(self, job_manager, job_id: str, total_epochs: int, update_freq: int = 10):
+    def __init__(self, job_manager, job_id: str, total_epochs: int, update_freq: int = 10, cancel_event=None):
         super().__init__()
         self.job_manager = job_manager
         self.job_id = job_id
+        self.cancel_event = cancel_event
         self.total_epochs = total_epochs
         self.update_freq = update_freq
         self.current_epoch = 0
@@ -33,6 +49,10 @@ class TrainingCallback(Callback):
         self.current_epoch = epoch
         
     def on_train_batch_end(self, batch, logs=None):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            # Dừng ở cuối batch hiện tại, train_model sẽ đánh dấu job là cancelled
+            self.model.stop_training = True
+            return
         if self.total_batches == 0:
             self.total_batches = self.params['steps']
         
@@ -103,36 +123,70 @@ class TrainingCallback(Callback):
             val_recall=float(logs.get('val_recall', 0)),
             log_message=log_message
         )
+def sample_text(sample: Dict[str, Any]) -> str:
+    return f"{sample['title']} {sample['content']}"
 class TrainingService:
     def __init__(self, job_manager):
         self.job_manager = job_manager
-    def prepare_data(
-        self,
-        samples: List[Dict[str, Any]],
-        max_words: int,
-        max_len: int,
-        test_size: float = 0.3
-    ) -> Tuple:    
+        self.token_cache = TokenSequenceCache()
+    def split_texts(self, samples: List[Dict[str, Any]], test_size: float = 0.3, texts: Optional[List] = None) -> Tuple:
         """
-        Chuẩn bị dữ liệu cho multi-label classification.
-        samples: List of dicts with 'title', 'content', 'labels' (list of label names)
+        Train/test split của text và nhãn, cố định random_state nên gọi lại cho đúng cùng một split.
+        texts thay cho "title content" của từng sample (vd. list từ đã tách từ token cache).
         """
-        texts = [f"{s['title']} {s['content']}" for s in samples]
+        if texts is None:
+            texts = [sample_text(s) for s in samples]
         labels = [s['labels'] for s in samples]
-        
-        X_train_text, X_test_text, y_train_labels, y_test_labels = train_test_split(
+        return train_test_split(
             texts,
             labels,
             test_size=test_size,
             random_state=42,
             shuffle=True
         )
+    def prepare_data(
+        self,
+        samples: List[Dict[str, Any]],
+        max_words: int,
+        max_len: int,
+        test_size: float = 0.3,
+        cache_stats: Optional[Dict[str, Any]] = None,
+        tokenizer: Optional[Tokenizer] = None,
+        label_binarizer: Optional[MultiLabelBinarizer] = None,
+        min_new_word_count: Optional[int] = None
+    ) -> Tuple:    
+        """
+        Chuẩn bị dữ liệu cho multi-label classification.
+        samples: List of dicts with 'id', 'title', 'content', 'labels' (list of label names)
+        cache_stats: nếu truyền vào, được cập nhật số sample lấy lại từ token cache
+        tokenizer, label_binarizer: vocab và bộ nhãn có sẵn của model warm start, không fit lại;
+        min_new_word_count: nếu có, thêm vào cuối vocab các từ mới xuất hiện ít nhất ngần ấy lần
+        """
+        fit_vocabulary = tokenizer is None
+        if fit_vocabulary:
+            tokenizer = Tokenizer(num_words=max_words)
+        texts = None
+        if self.token_cache.enabled and all(s.get('id') is not None for s in samples):
+            texts, stats = self.token_cache.word_sequences(
+                tokenizer, [s['id'] for s in samples], [sample_text(s) for s in samples]
+            )
+            if cache_stats is not None:
+                cache_stats.update(stats)
+        X_train_text, X_test_text, y_train_labels, y_test_labels = self.split_texts(samples, test_size, texts=texts)
         
-        tokenizer = Tokenizer(num_words=max_words)
-        tokenizer.fit_on_texts(X_train_text + X_test_text)
+        if fit_vocabulary:
+            tokenizer.fit_on_texts(X_train_text + X_test_text)
+        elif min_new_word_count is not None:
+            extend_vocabulary(tokenizer, X_train_text + X_test_text, tokenizer.num_words, min_new_word_count)
         
-        X_train_seq = tokenizer.texts_to_sequences(X_train_text)
-        X_test_seq = tokenizer.texts_to_sequences(X_test_text)
+        if texts is None:
+            X_train_seq = tokenizer.texts_to_sequences(X_train_text)
+            X_test_seq = tokenizer.texts_to_sequences(X_test_text)
+        else:
+            # List từ đã tách sẵn, chỉ còn tra vocab của job này
+            encoder = FastTokenizer.from_keras(tokenizer)
+            X_train_seq = [encoder.encode_words(words) for words in X_train_text]
+            X_test_seq = [encoder.encode_words(words) for words in X_test_text]
         
         X_train = pad_sequences(
             X_train_seq,
@@ -146,14 +200,29 @@ class TrainingService:
             padding='post'
         )
         
-        mlb = MultiLabelBinarizer()
-        y_train = mlb.fit_transform(y_train_labels)
+        if label_binarizer is None:
+            mlb = MultiLabelBinarizer()
+            y_train = mlb.fit_transform(y_train_labels)
+        else:
+            mlb = label_binarizer
+            y_train = mlb.transform(y_train_labels)
         y_test = mlb.transform(y_test_labels)
         
         num_classes = len(mlb.classes_)
         label_names = mlb.classes_
         
         return X_train, X_test, y_train, y_test, tokenizer, mlb, num_classes, label_names
+    def compute_length_buckets(self, X: np.ndarray, max_len: int) -> List[int]:
+        """
+        Ranh giới bucket độ dài cho inference, lấy từ phân phối độ dài token của tập train
+        (phân vị 50/75/90/97, làm tròn lên bội số của 16).
+        """
+        lengths = np.count_nonzero(X, axis=1)
+        if len(lengths) == 0:
+            return [max_len]
+        quantiles = np.percentile(lengths, [50, 75, 90, 97])
+        boundaries = {int(np.ceil(q / 16.0) * 16) for q in quantiles}
+        return sorted({b for b in boundaries if 0 < b < max_len} | {max_len})
     def build_rnn_model(
         self,
         max_words: int,
@@ -161,14 +230,16 @@ class TrainingService:
         num_classes: int,
         embedding_dim: int = 128,
         rnn_units: int = 128,
-        learning_rate: float = 0.0001
+        learning_rate: float = 0.0001,
+        mask_zero: bool = False
     ) -> Sequential:
         """Build RNN model for multi-label classification"""
         model = Sequential([
             Embedding(
                 input_dim=max_words,
                 output_dim=embedding_dim,
-                input_length=max_len
+                input_length=max_len,
+                mask_zero=mask_zero
             ),
             SimpleRNN(
                 rnn_units,
@@ -198,14 +269,16 @@ class TrainingService:
         num_classes: int,
         embedding_dim: int = 128,
         lstm_units: int = 128,
-        learning_rate: float = 0.0001
+        learning_rate: float = 0.0001,
+        mask_zero: bool = False
     ) -> Sequential:
         """Build LSTM model for multi-label classification"""
         model = Sequential([
             Embedding(
                 input_dim=max_words,
                 output_dim=embedding_dim,
-                input_length=max_len
+                input_length=max_len,
+                mask_zero=mask_zero
             ),
             LSTM(
                 lstm_units,
@@ -240,14 +313,16 @@ class TrainingService:
         num_classes: int,
         embedding_dim: int = 128,
         rnn_units: int = 128,
-        learning_rate: float = 0.0001
+        learning_rate: float = 0.0001,
+        mask_zero: bool = False
     ) -> Sequential:
         """Build BiLSTM model for multi-label classification"""
         model = Sequential([
             Embedding(
                 input_dim=max_words,
                 output_dim=embedding_dim,
-                input_length=max_len
+                input_length=max_len,
+                mask_zero=mask_zero
             ),
             Bidirectional(
                 LSTM(
@@ -368,16 +443,21 @@ class TrainingService:
         max_words: int,
         max_len: int,
         num_classes: int,
-        learning_rate: float = 0.0001
+        learning_rate: float = 0.0001,
+        mask_zero: bool = False
     ) -> Sequential:
+        """
+        mask_zero: Embedding bỏ qua token 0 (padding) ở các model RNN/LSTM/BiLSTM, output không
+        còn phụ thuộc vào độ dài padding nên train được theo bucket độ dài
+        """
         if model_type == 'RNN':
-            return self.build_rnn_model(max_words, max_len, num_classes, learning_rate=learning_rate)
+            return self.build_rnn_model(max_words, max_len, num_classes, learning_rate=learning_rate, mask_zero=mask_zero)
         
         elif model_type == 'LSTM':
-            return self.build_lstm_model(max_words, max_len, num_classes, learning_rate=learning_rate)
+            return self.build_lstm_model(max_words, max_len, num_classes, learning_rate=learning_rate, mask_zero=mask_zero)
         
         elif model_type == 'BiLSTM':
-            return self.build_bilstm_model(max_words, max_len, num_classes, learning_rate=learning_rate)
+            return self.build_bilstm_model(max_words, max_len, num_classes, learning_rate=learning_rate, mask_zero=mask_zero)
         
         elif model_type == 'CNN':
             return self.build_cnn_model(max_words, max_len, num_classes, learning_rate=learning_rate)
@@ -392,8 +472,15 @@ class TrainingService:
         job_id: str,
         model_type: str,
         samples: List[Dict[str, Any]],
-        hyperparameters: Dict[str, Any]
-    ) -> Dict[str, Any]:
+        hyperparameters: Dict[str, Any],
+        cancel_event: Optional[threading.Event] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Returns None when the job is cancelled through cancel_event"""
+        def check_cancelled():
+            if cancel_event is not None and cancel_event.is_set():
+                raise TrainingCancelledError(job_id)
+
+        model = None
         try:
             self.job_manager.update_status(job_id, 'running')
             
@@ -419,8 +506,55 @@ class TrainingService:
             print(f" {log_msg}")
             self.job_manager.update_progress(job_id, 0, 1, 0, log_message=log_msg)
             
-            X_train, X_test, y_train, y_test, tokenizer, mlb, num_classes, label_names = \
-                self.prepare_data(samples, max_words, max_len)
+            base = None
+            if hyperparameters.get('warm_start'):
+                base_path = hyperparameters.get('base_model_path')
+                if not base_path:
+                    raise ValueError("Warm start needs the path of the base model")
+                log_msg = f"Warm start from {base_path}"
+                print(f" {log_msg}")
+                self.job_manager.update_progress(job_id, 0, 1, 0, log_message=log_msg)
+                base = load_base_model(base_path)
+                base_type = base['metadata'].get('model_type')
+                if base_type != model_type:
+                    raise ValueError(f"Base model is {base_type}, cannot warm start a {model_type} job from it")
+                # Nhãn mới cần lớp output mới, phải train lại từ đầu
+                unknown = sorted({label for s in samples for label in s['labels']} - set(base['label_binarizer'].classes_))
+                if unknown:
+                    raise ValueError(f"Labels not known by the base model: {unknown}")
+                base_rows = embedding_layer(base['model']).input_dim
+                if base['tokenizer'].num_words != base_rows:
+                    raise ValueError(
+                        f"Base tokenizer num_words ({base['tokenizer'].num_words}) does not match "
+                        f"the embedding size ({base_rows})"
+                    )
+                max_len = base['metadata'].get('max_len', max_len)
+            
+            prep_start = time.perf_counter()
+            token_cache_stats = {}
+            X_train, X_test, y_train, y_test, tokenizer, mlb, num_classes, label_names = self.prepare_data(
+                samples, max_words, max_len, cache_stats=token_cache_stats,
+                tokenizer=base['tokenizer'] if base else None,
+                label_binarizer=base['label_binarizer'] if base else None,
+                min_new_word_count=(
+                    hyperparameters.get('new_word_min_count', 2)
+                    if base and hyperparameters.get('grow_vocabulary') else None
+                )
+            )
+            max_words = tokenizer.num_words
+            data_preparation = {
+                'seconds': time.perf_counter() - prep_start,
+                'tokenCache': token_cache_stats or None,
+            }
+            check_cancelled()
+            
+            if token_cache_stats:
+                log_msg = (
+                    f"Token cache: {token_cache_stats['hits']}/{len(samples)} samples reused "
+                    f"({token_cache_stats['hitRate']:.1%}), data prepared in {data_preparation['seconds']:.2f}s"
+                )
+                print(f"   {log_msg}")
+                self.job_manager.update_progress(job_id, 0, 1, 0, log_message=log_msg)
             
             log_msg = f"Train samples: {len(X_train)}, Test samples: {len(X_test)}"
             print(f"   {log_msg}")
@@ -430,27 +564,88 @@ class TrainingService:
             print(f"   {log_msg}")
             self.job_manager.update_progress(job_id, 0, 1, 0, log_message=log_msg)
             
-            log_msg = f"Building {model_type} model..."
+            use_pipeline = hyperparameters.get('use_data_pipeline', True)
+            warm_start, frozen_rows = None, None
+            if base is not None:
+                # Tiếp tục từ trọng số của model cũ, cùng vocab (chỉ thêm hàng cho từ mới)
+                model = grow_embedding(base['model'], max_words - base_rows)
+                freeze_embedding = hyperparameters.get('freeze_embedding', False)
+                frozen_rows = prepare_warm_model(model, base_rows, freeze_embedding, learning_rate)
+                warm_start = {
+                    'baseModel': base_path,
+                    'newWords': max_words - base_rows,
+                    'vocabularySize': max_words,
+                    'frozenEmbedding': freeze_embedding,
+                }
+                log_msg = (
+                    f"Continuing {model_type} model: {warm_start['newWords']} new words, "
+                    f"embedding {'frozen' if freeze_embedding else 'trainable'}"
+                )
+            else:
+                log_msg = f"Building {model_type} model..."
+                model = self.build_model(
+                    model_type, max_words, max_len, num_classes, learning_rate,
+                    mask_zero=hyperparameters.get('mask_padding', False) and model_type in ('RNN', 'LSTM', 'BiLSTM')
+                )
+                # Input shape cố định theo max_len, không theo batch đầu tiên của dataset
+                model.build((None, max_len))
             print(f" {log_msg}")
             self.job_manager.update_progress(job_id, 0, 1, 0, log_message=log_msg)
-            
-            model = self.build_model(model_type, max_words, max_len, num_classes, learning_rate)
             model.summary()
             
-            callback = TrainingCallback(self.job_manager, job_id, epochs)
+            callback = TrainingCallback(self.job_manager, job_id, epochs, cancel_event=cancel_event)
+            step_timer = StepTimeCallback()
+            length_buckets = self.compute_length_buckets(X_train, max_len)
             
             log_msg = f"Training model for {epochs} epochs..."
             print(f" {log_msg}")
             self.job_manager.update_progress(job_id, 0, epochs, 0, log_message=log_msg)
             
-            history = model.fit(
-                X_train, y_train,
-                validation_data=(X_test, y_test),
-                epochs=epochs,
-                batch_size=batch_size,
-                callbacks=[callback],
-                verbose=1
-            )
+            fit_start = time.perf_counter()
+            if use_pipeline:
+                pad_extra = padding_margin(model)
+                train_data, _, pipeline_stats = build_dataset(X_train, y_train, batch_size, pad_extra, length_buckets)
+                val_data, _, _ = build_dataset(X_test, y_test, batch_size, pad_extra, length_buckets, shuffle=False)
+                log_msg = (
+                    f"tf.data pipeline: {pipeline_stats['steps']} steps/epoch, "
+                    f"{'length-bucketed' if pipeline_stats['bucketed'] else 'padded to max_len'}"
+                )
+                print(f"   {log_msg}")
+                self.job_manager.update_progress(job_id, 0, epochs, 0, log_message=log_msg)
+                history = model.fit(
+                    train_data,
+                    validation_data=val_data,
+                    epochs=epochs,
+                    callbacks=[callback, step_timer],
+                    verbose=1
+                )
+            else:
+                pipeline_stats = {
+                    'bucketed': False,
+                    'steps': int(np.ceil(len(X_train) / batch_size)),
+                    'realTokensPerEpoch': int(np.count_nonzero(X_train)),
+                    'paddedTokensPerEpoch': int(X_train.size),
+                }
+                history = model.fit(
+                    X_train, y_train,
+                    validation_data=(X_test, y_test),
+                    epochs=epochs,
+                    batch_size=batch_size,
+                    callbacks=[callback, step_timer],
+                    verbose=1
+                )
+            # Chỉ có step time của chế độ vừa chạy; so sánh hai chế độ trên cùng dữ liệu
+            # dùng benchmarks/training_pipeline.py
+            training_pipeline = {
+                'enabled': use_pipeline,
+                **pipeline_stats,
+                'stepTime': step_timer.summary(),
+                'fitSeconds': time.perf_counter() - fit_start,
+            }
+            print(f"   Step time: {training_pipeline['stepTime']}")
+            if base is not None:
+                release_warm_model(model, frozen_rows)
+            check_cancelled()
             
             log_msg = "Evaluating model..."
             print(f" {log_msg}")
@@ -476,10 +671,29 @@ class TrainingService:
                 zero_division=0
             )
             
+            check_cancelled()
+            linear_model, cascade_evaluation = None, None
+            if hyperparameters.get('train_linear', True):
+                log_msg = "Training linear cascade model..."
+                print(f" {log_msg}")
+                self.job_manager.update_progress(job_id, epochs, epochs, 100, log_message=log_msg)
+                try:
+                    linear_model, cascade_evaluation = self.train_linear_model(
+                        samples, mlb, y_train, y_test, y_pred_probs,
+                        linear_model=base['linear_model'] if base else None
+                    )
+                except Exception as e:
+                    # Tầng linear là tùy chọn: lỗi ở đây không làm mất model neural đã train xong
+                    linear_model, cascade_evaluation = None, None
+                    log_msg = f"Linear cascade model skipped: {str(e)}"
+                    print(f" {log_msg}")
+                    self.job_manager.update_progress(job_id, epochs, epochs, 100, log_message=log_msg)
+            
             results = {
                 'model': model,
                 'tokenizer': tokenizer,
                 'label_binarizer': mlb,
+                'linear_model': linear_model,
                 'metadata': {
                     'model_type': model_type,
                     'max_words': max_words,
@@ -487,7 +701,10 @@ class TrainingService:
                     'num_classes': num_classes,
                     'classes': label_names.tolist(),
                     'hyperparameters': hyperparameters,
-                    'is_multilabel': True
+                    'is_multilabel': True,
+                    'length_buckets': length_buckets,
+                    'cascade': cascade_evaluation,
+                    'warm_start': warm_start
                 },
                 'metrics': {
                     'testLoss': float(test_loss),
@@ -498,13 +715,22 @@ class TrainingService:
                     'f1Micro': float(f1_micro),
                     'f1Weighted': float(f1_weighted),
                     'classificationReport': report,
-                    'confusionMatrix': None
+                    'confusionMatrix': None,
+                    'trainingPipeline': training_pipeline,
+                    'dataPreparation': data_preparation,
+                    'warmStart': warm_start
                 },
                 'history': {
                     'loss': [float(x) for x in history.history['loss']],
                     'accuracy': [float(x) for x in history.history['binary_accuracy']],
                     'val_loss': [float(x) for x in history.history['val_loss']],
                     'val_accuracy': [float(x) for x in history.history['val_binary_accuracy']]
+                },
+                # Giữ lại tập holdout để đánh giá bản TFLite khi lưu model
+                'holdout': {
+                    'X_train': X_train,
+                    'X_test': X_test,
+                    'y_test': y_test
                 }
             }
             
@@ -518,18 +744,128 @@ class TrainingService:
             
             return results
             
+        except TrainingCancelledError:
+            print(f" Training cancelled for job {job_id}")
+            self.job_manager.cancel_job(job_id)
+            # Giải phóng model và dữ liệu của job đã hủy ngay, không đợi GC
+            del model
+            gc.collect()
+            return None
         except Exception as e:
             print(f" Training failed for job {job_id}: {str(e)}")
             self.job_manager.fail_job(job_id, str(e))
             raise
+
+    def train_linear_model(
+        self,
+        samples: List[Dict[str, Any]],
+        mlb: MultiLabelBinarizer,
+        y_train: np.ndarray,
+        y_test: np.ndarray,
+        neural_test_probs: np.ndarray,
+        linear_model: Optional[LinearCascadeModel] = None
+    ) -> Tuple[LinearCascadeModel, Dict[str, Any]]:
+        """
+        Train the hashing + linear first stage on the same split as the neural model
+        and compare the cascade against the neural-only path on the holdout set.
+        linear_model: tầng linear có sẵn (warm start) được partial_fit tiếp trên dữ liệu mới
+        """
+        X_train_text, X_test_text, _, _ = self.split_texts(samples)
+        if linear_model is None:
+            linear_model = LinearCascadeModel().fit(X_train_text, y_train, mlb.classes_.tolist())
+        else:
+            linear_model.partial_fit(X_train_text, y_train)
+        evaluation = evaluate_cascade(y_test, linear_model.predict_proba(X_test_text), neural_test_probs)
+        for band in evaluation['bands']:
+            print(
+                f"   Cascade band [{band['low']}, {band['high']}]: escalation {band['escalationRate']:.1%}, "
+                f"subset accuracy delta {band['delta']['subsetAccuracy']:+.4f}"
+            )
+        return linear_model, evaluation
+
+    def export_tflite(
+        self,
+        model,
+        output_path: str,
+        quantization: str = 'none',
+        representative_data: Optional[np.ndarray] = None
+    ) -> str:
+        """
+        Export mô hình sang TFLite.
+        quantization: 'none' (float32), 'dynamic' (dynamic-range) hoặc 'int8' (cần representative_data)
+        """
+        converter = tf.lite.TFLiteConverter.from_keras_model(model)
+        # LSTM/BiLSTM có thể cần TF ops chưa có trong builtins
+        converter.target_spec.supported_ops = [
+            tf.lite.OpsSet.TFLITE_BUILTINS,
+            tf.lite.OpsSet.SELECT_TF_OPS
+        ]
+        
+        if quantization in ('dynamic', 'int8'):
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if quantization == 'int8':
+            if representative_data is None or len(representative_data) == 0:
+                raise ValueError("int8 quantization requires representative data")
+            input_dtype = model.inputs[0].dtype.as_numpy_dtype
+            
+            def representative_dataset():
+                for row in representative_data[:200]:
+                    yield [row[np.newaxis, :].astype(input_dtype)]
+            
+            converter.representative_dataset = representative_dataset
+        
+        tflite_model = converter.convert()
+        with open(output_path, 'wb') as f:
+            f.write(tflite_model)
+        return output_path
+    def _holdout_metrics(self, y_true: np.ndarray, y_pred_probs: np.ndarray) -> Dict[str, float]:
+        y_pred_binary = (y_pred_probs > 0.5).astype(int)
+        return {
+            'binaryAccuracy': float(np.mean(y_pred_binary == y_true)),
+            'subsetAccuracy': float(accuracy_score(y_true, y_pred_binary)),
+            'f1Micro': float(f1_score(y_true, y_pred_binary, average='micro', zero_division=0)),
+            'f1Macro': float(f1_score(y_true, y_pred_binary, average='macro', zero_division=0))
+        }
+    def evaluate_tflite(
+        self,
+        model,
+        tflite_path: str,
+        X_test: np.ndarray,
+        y_test: np.ndarray,
+        batch_size: int = 64
+    ) -> Dict[str, Any]:
+        """So sánh độ chính xác giữa model float và bản TFLite trên tập holdout"""
+        float_probs = model.predict(X_test, verbose=0)
+        
+        backend = TFLiteBackend(tflite_path)
+        tflite_probs = np.concatenate([
+            backend.predict(X_test[start:start + batch_size])
+            for start in range(0, len(X_test), batch_size)
+        ], axis=0)
+        
+        float_metrics = self._holdout_metrics(y_test, float_probs)
+        tflite_metrics = self._holdout_metrics(y_test, tflite_probs)
+        return {
+            'float': float_metrics,
+            'tflite': tflite_metrics,
+            'delta': {
+                name: tflite_metrics[name] - float_metrics[name]
+                for name in float_metrics
+            },
+            'maxAbsProbabilityDiff': float(np.max(np.abs(float_probs - tflite_probs))),
+            'holdoutSamples': int(len(X_test))
+        }
     def save_model(
         self,
         job_id: str,
         model_name: str,
-        output_dir: str = 'ml_models'
+        output_dir: str = 'ml_models',
+        export_tflite: bool = False,
+        quantization: str = 'none'
     ) -> str:
         """
         Lưu mô hình đã huấn luyện, tokenizer, và label_binarizer
+        export_tflite: lưu thêm bản TFLite (có thể quantize) kèm accuracy delta trên tập holdout
         """
         job = self.job_manager.get_job(job_id)
         if not job or job['status'] != 'completed':
@@ -537,30 +873,96 @@ class TrainingService:
         
         results = job.get('_full_results')
         if not results:
-            raise ValueError(f"No full results found for job {job_id}")
+            raise ValueError(f"No full results found for job {job_id} (already saved?)")
         
         os.makedirs(output_dir, exist_ok=True)
+        # Job train trong process riêng trả về file thay vì object
+        artifacts = results.get('artifacts')
         
         model_path = os.path.join(output_dir, f"{model_name}.h5")
-        results['model'].save(model_path)
+        if artifacts:
+            shutil.copyfile(artifacts['model'], model_path)
+        else:
+            results['model'].save(model_path)
         print(f" Model saved to: {model_path}")
         
         tokenizer_path = os.path.join(output_dir, 'tokenizer.pkl')
-        with open(tokenizer_path, 'wb') as f:
-            pickle.dump(results['tokenizer'], f)
+        if artifacts:
+            shutil.copyfile(artifacts['tokenizer'], tokenizer_path)
+        else:
+            with open(tokenizer_path, 'wb') as f:
+                pickle.dump(results['tokenizer'], f)
         print(f" Tokenizer saved to: {tokenizer_path}")
         
         label_binarizer_path = os.path.join(output_dir, 'label_binarizer.pkl')
-        with open(label_binarizer_path, 'wb') as f:
-            pickle.dump(results['label_binarizer'], f)
+        if artifacts:
+            shutil.copyfile(artifacts['label_binarizer'], label_binarizer_path)
+        else:
+            with open(label_binarizer_path, 'wb') as f:
+                pickle.dump(results['label_binarizer'], f)
         print(f" Label binarizer saved to: {label_binarizer_path}")
         
         metadata = results['metadata'].copy()
         metadata['test_metrics'] = results['metrics']
         
+        linear_source = artifacts.get('linear_model') if artifacts else None
+        if results.get('linear_model') is not None or linear_source:
+            # Chỉ lưu theo tên model: model linear phải đi cùng đúng bộ nhãn của model neural
+            linear_path = os.path.join(output_dir, f"{model_name}_linear.pkl")
+            if linear_source:
+                shutil.copyfile(linear_source, linear_path)
+            else:
+                joblib.dump(results['linear_model'], linear_path)
+            print(f" Linear cascade model saved to: {linear_path}")
+        
+        if export_tflite:
+            if artifacts:
+                trained_model = keras.models.load_model(artifacts['model'], compile=False)
+                holdout = dict(np.load(artifacts['holdout'])) if artifacts.get('holdout') else {}
+            else:
+                trained_model = results['model']
+                holdout = results.get('holdout') or {}
+            tflite_path = os.path.join(output_dir, f"{model_name}.tflite")
+            self.export_tflite(
+                trained_model,
+                tflite_path,
+                quantization=quantization,
+                representative_data=holdout.get('X_train')
+            )
+            print(f" TFLite model ({quantization}) saved to: {tflite_path}")
+            
+            tflite_info = {
+                'path': tflite_path,
+                'quantization': quantization,
+                'sizeBytes': os.path.getsize(tflite_path)
+            }
+            if holdout.get('X_test') is not None:
+                tflite_info['evaluation'] = self.evaluate_tflite(
+                    trained_model,
+                    tflite_path,
+                    holdout['X_test'],
+                    holdout['y_test']
+                )
+                print(f" TFLite accuracy delta: {tflite_info['evaluation']['delta']}")
+            metadata['tflite'] = tflite_info
+        
         metadata_path = os.path.join(output_dir, 'model_metadata.json')
         with open(metadata_path, 'w', encoding='utf-8') as f:
             json.dump(metadata, f, ensure_ascii=False, indent=2)
         print(f" Metadata saved to: {metadata_path}")
         
+        # Bản riêng cho từng model để registry có thể phục vụ nhiều model cùng lúc
+        for shared_path, suffix in (
+            (tokenizer_path, 'tokenizer.pkl'),
+            (label_binarizer_path, 'label_binarizer.pkl'),
+            (metadata_path, 'metadata.json'),
+        ):
+            shutil.copyfile(shared_path, os.path.join(output_dir, f"{model_name}_{suffix}"))
+        
+        if artifacts:
+            # File tạm của job train trong process riêng đã được copy sang output_dir
+            shutil.rmtree(os.path.dirname(artifacts['model']), ignore_errors=True)
+            self.job_manager.release_results(job_id)
+            print(f" Removed training artifacts of job {job_id}")
+        
         return model_path
\ No newline at end of file
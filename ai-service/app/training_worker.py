@@ -0,0 +1,242 @@
+import multiprocessing as mp
+import os
+import pickle
+import shutil
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from .training_manager import TrainingJobManager
+
+
+def parse_cpus(value: Optional[str]) -> Optional[List[int]]:
+    """TRAINING_CPUS như "2,3" hoặc "2-5"; rỗng thì không ghim CPU"""
+    if not value or not value.strip():
+        return None
+    cpus = set()
+    for part in value.split(','):
+        part = part.strip()
+        if '-' in part:
+            first, last = part.split('-', 1)
+            cpus.update(range(int(first), int(last) + 1))
+        elif part:
+            cpus.add(int(part))
+    return sorted(cpus)
+
+
+class _PipeJobManager:
+    """
+    Thay cho TrainingJobManager trong process train: mọi cập nhật được gửi qua pipe về
+    process API. Kết quả train được ghi ra file, chỉ đường dẫn và metric đi qua pipe.
+    """
+    def __init__(self, conn, artifact_dir: str):
+        self.conn = conn
+        self.artifact_dir = artifact_dir
+        self._send_lock = threading.Lock()
+
+    def _send(self, *message) -> None:
+        with self._send_lock:
+            self.conn.send(message)
+
+    def update_status(self, job_id: str, status: str) -> None:
+        self._send('update_status', (job_id, status), {})
+
+    def update_progress(self, job_id: str, *args, **kwargs) -> None:
+        self._send('update_progress', (job_id,) + args, kwargs)
+
+    def add_log(self, job_id: str, message: str) -> None:
+        self._send('add_log', (job_id, message), {})
+
+    def fail_job(self, job_id: str, error: str) -> None:
+        self._send('fail_job', (job_id, error), {})
+
+    def cancel_job(self, job_id: str) -> None:
+        self._send('cancel_job', (job_id,), {})
+
+    def complete_job(self, job_id: str, results: Dict[str, Any]) -> None:
+        import joblib
+        import numpy as np
+
+        os.makedirs(self.artifact_dir, exist_ok=True)
+        artifacts = {
+            'model': os.path.join(self.artifact_dir, 'model.h5'),
+            'tokenizer': os.path.join(self.artifact_dir, 'tokenizer.pkl'),
+            'label_binarizer': os.path.join(self.artifact_dir, 'label_binarizer.pkl'),
+            'linear_model': None,
+            'holdout': None,
+        }
+        results['model'].save(artifacts['model'])
+        with open(artifacts['tokenizer'], 'wb') as f:
+            pickle.dump(results['tokenizer'], f)
+        with open(artifacts['label_binarizer'], 'wb') as f:
+            pickle.dump(results['label_binarizer'], f)
+        if results.get('linear_model') is not None:
+            artifacts['linear_model'] = os.path.join(self.artifact_dir, 'linear.pkl')
+            joblib.dump(results['linear_model'], artifacts['linear_model'])
+        if results.get('holdout'):
+            artifacts['holdout'] = os.path.join(self.artifact_dir, 'holdout.npz')
+            np.savez(artifacts['holdout'], **results['holdout'])
+
+        self._send('complete_job', (job_id, {
+            'metadata': results['metadata'],
+            'metrics': results['metrics'],
+            'history': results['history'],
+            'artifacts': artifacts,
+        }), {})
+
+
+def _limit_resources(cpus: Optional[List[int]], threads: int, nice: int) -> None:
+    # Phải chạy trước khi import TensorFlow để thread pool của TF nhận giới hạn
+    threads_str = str(threads)
+    for name in ('TF_NUM_INTRAOP_THREADS', 'OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[name] = threads_str
+    os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+    if nice and hasattr(os, 'nice'):
+        os.nice(nice)
+
+
+def _training_main(
+    conn,
+    job_id: str,
+    model_type: str,
+    samples: List[Dict[str, Any]],
+    hyperparameters: Dict[str, Any],
+    artifact_dir: str,
+    cpus: Optional[List[int]],
+    threads: int,
+    nice: int
+) -> None:
+    """Entry point của process train: chạy TrainingService.train_model với job manager qua pipe"""
+    _limit_resources(cpus, threads, nice)
+    job_manager = _PipeJobManager(conn, artifact_dir)
+    cancel_event = threading.Event()
+
+    def listen():
+        # Lệnh hủy từ process API; pipe đóng (API chết) cũng coi như hủy
+        try:
+            while True:
+                if conn.recv() == 'cancel':
+                    cancel_event.set()
+        except (EOFError, OSError):
+            cancel_event.set()
+
+    threading.Thread(target=listen, daemon=True).start()
+
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    from .training_service import TrainingService
+
+    usable = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else None
+    job_manager.add_log(job_id, f"Training process {os.getpid()} started (cpus={usable}, threads={threads})")
+    try:
+        TrainingService(job_manager).train_model(job_id, model_type, samples, hyperparameters, cancel_event=cancel_event)
+    except Exception:
+        # train_model đã gửi fail_job
+        pass
+    try:
+        job_manager._send('done', (), {})
+    except (EOFError, OSError):
+        pass
+
+
+class TrainingProcessRunner:
+    """
+    Chạy mỗi job train trong một process riêng (spawn) để train không tranh GIL, thread pool
+    TensorFlow và heap với process phục vụ /classify. Process train bị giới hạn CPU
+    (TRAINING_CPUS, TRAINING_THREADS, TRAINING_NICE); tiến độ được chuyển về
+    TrainingJobManager qua pipe, model và tokenizer được trả về dưới dạng file
+    trong TRAINING_ARTIFACT_DIR/<jobId>.
+    """
+    def __init__(
+        self,
+        job_manager: TrainingJobManager,
+        cpus: Optional[List[int]] = None,
+        threads: Optional[int] = None,
+        nice: Optional[int] = None,
+        cancel_grace: Optional[float] = None,
+        artifact_dir: Optional[str] = None
+    ):
+        self.job_manager = job_manager
+        self.cpus = cpus if cpus is not None else parse_cpus(os.getenv('TRAINING_CPUS'))
+        self.threads = threads or int(os.getenv('TRAINING_THREADS', 2))
+        self.nice = nice if nice is not None else int(os.getenv('TRAINING_NICE', 10))
+        # Thời gian chờ process tự dừng sau khi hủy trước khi terminate
+        self.cancel_grace = cancel_grace if cancel_grace is not None else float(os.getenv('TRAINING_CANCEL_GRACE', 30))
+        self.artifact_dir = artifact_dir or os.getenv('TRAINING_ARTIFACT_DIR', 'ml_models/training_artifacts')
+        self._ctx = mp.get_context('spawn')
+
+    def _job_artifact_dir(self, job_id: str) -> str:
+        safe_id = ''.join(c if c.isalnum() or c in '-_' else '_' for c in job_id)
+        return os.path.abspath(os.path.join(self.artifact_dir, safe_id))
+
+    def run(
+        self,
+        job_id: str,
+        model_type: str,
+        samples: List[Dict[str, Any]],
+        hyperparameters: Dict[str, Any],
+        cancel_event: Optional[threading.Event] = None
+    ) -> str:
+        """Run one job to the end in a child process; returns its final status"""
+        artifact_dir = self._job_artifact_dir(job_id)
+        shutil.rmtree(artifact_dir, ignore_errors=True)
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_training_main,
+            args=(child_conn, job_id, model_type, samples, hyperparameters, artifact_dir,
+                  self.cpus, self.threads, self.nice),
+            name=f"training-{job_id}",
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+
+        status = None
+        cancel_deadline = None
+        try:
+            while True:
+                if cancel_event is not None and cancel_event.is_set() and cancel_deadline is None:
+                    try:
+                        parent_conn.send('cancel')
+                    except (EOFError, OSError):
+                        pass
+                    cancel_deadline = time.monotonic() + self.cancel_grace
+                if cancel_deadline is not None and time.monotonic() > cancel_deadline and process.is_alive():
+                    print(f" Training process for job {job_id} did not stop in {self.cancel_grace}s, terminating")
+                    process.terminate()
+                    status = 'cancelled'
+                    self.job_manager.cancel_job(job_id)
+                    break
+                try:
+                    if not parent_conn.poll(0.5):
+                        if not process.is_alive():
+                            break
+                        continue
+                    method, args, kwargs = parent_conn.recv()
+                except (EOFError, OSError):
+                    break
+                if method == 'done':
+                    break
+                getattr(self.job_manager, method)(*args, **kwargs)
+                if method == 'complete_job':
+                    status = 'completed'
+                elif method == 'fail_job':
+                    status = 'failed'
+                elif method == 'cancel_job':
+                    status = 'cancelled'
+        finally:
+            parent_conn.close()
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+                process.join(timeout=5)
+
+        if status is None:
+            status = 'failed'
+            self.job_manager.fail_job(job_id, f"Training process exited unexpectedly (exit code {process.exitcode})")
+        if status != 'completed':
+            shutil.rmtree(artifact_dir, ignore_errors=True)
+        return status
@@ -0,0 +1,159 @@
+import json
+import os
+import pickle
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Union
+import joblib
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+from tensorflow.keras.layers import Embedding
+from tensorflow.keras.optimizers import Adam
+from tensorflow.keras.preprocessing.text import text_to_word_sequence
+
+from .model_bundle import resolve_artifact_paths
+
+
+def load_base_model(model_path: str) -> Dict[str, Any]:
+    """Model đang chạy cùng tokenizer, label binarizer, metadata và tầng linear (nếu có) của nó"""
+    if not os.path.exists(model_path):
+        raise ValueError(f"Base model not found: {model_path}")
+    paths = resolve_artifact_paths(model_path)
+    with open(paths['tokenizer_path'], 'rb') as f:
+        tokenizer = pickle.load(f)
+    with open(paths['label_binarizer_path'], 'rb') as f:
+        label_binarizer = pickle.load(f)
+    with open(paths['metadata_path'], 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+    linear_path = f"{os.path.splitext(model_path)[0]}_linear.pkl"
+    linear_model = joblib.load(linear_path) if os.path.exists(linear_path) else None
+    if linear_model is not None and list(linear_model.classes) != label_binarizer.classes_.tolist():
+        linear_model = None
+    return {
+        'model': keras.models.load_model(model_path, compile=False),
+        'tokenizer': tokenizer,
+        'label_binarizer': label_binarizer,
+        'metadata': metadata,
+        'linear_model': linear_model,
+    }
+
+
+def embedding_layer(model) -> Embedding:
+    for layer in model.layers:
+        if isinstance(layer, Embedding):
+            return layer
+    raise ValueError("Warm start needs a model with an Embedding layer")
+
+
+def extend_vocabulary(
+    tokenizer,
+    texts: Sequence[Union[str, List[str]]],
+    vocab_size: int,
+    min_count: int = 2
+) -> List[str]:
+    """
+    Thêm từ mới của texts (xuất hiện ít nhất min_count lần, chưa có index < vocab_size) vào cuối
+    vocab của tokenizer, index của các từ đã dùng được giữ nguyên. Khác fit_on_texts: Keras sắp
+    lại toàn bộ word_index theo tần suất nên id cũ không còn khớp với hàng embedding đã train.
+    Từ có index >= vocab_size vốn bị bỏ qua được dời ra sau các từ mới.
+    Returns the new words, in the order of their new ids (vocab_size, vocab_size + 1, ...).
+    """
+    counts = Counter()
+    docs = Counter()
+    for text in texts:
+        words = text if isinstance(text, list) else text_to_word_sequence(
+            text, filters=tokenizer.filters, lower=tokenizer.lower, split=tokenizer.split
+        )
+        counts.update(words)
+        docs.update(set(words))
+
+    word_index = tokenizer.word_index
+    new_words = [
+        word for word, count in counts.most_common()
+        if count >= min_count and word_index.get(word, vocab_size) >= vocab_size
+    ]
+    added = set(new_words)
+    grown = {
+        word: idx if idx < vocab_size else idx + len(new_words)
+        for word, idx in word_index.items() if word not in added
+    }
+    grown.update({word: vocab_size + offset for offset, word in enumerate(new_words)})
+
+    tokenizer.word_index = dict(sorted(grown.items(), key=lambda item: item[1]))
+    tokenizer.index_word = {idx: word for word, idx in tokenizer.word_index.items()}
+    for word, count in counts.items():
+        tokenizer.word_counts[word] = tokenizer.word_counts.get(word, 0) + count
+    for word, count in docs.items():
+        tokenizer.word_docs[word] = tokenizer.word_docs.get(word, 0) + count
+    tokenizer.index_docs = {tokenizer.word_index[word]: count for word, count in tokenizer.word_docs.items()
+                            if word in tokenizer.word_index}
+    tokenizer.document_count += len(texts)
+    tokenizer.num_words = vocab_size + len(new_words)
+    return new_words
+
+
+def grow_embedding(model, extra_rows: int):
+    """
+    Bản sao của model Sequential với Embedding thêm extra_rows hàng ở cuối, các trọng số khác
+    giữ nguyên. Hàng mới khởi tạo bằng vector trung bình của các hàng đã train.
+    """
+    if extra_rows <= 0:
+        return model
+    config = model.get_config()
+    for layer_config in config['layers']:
+        if layer_config['class_name'] == 'Embedding':
+            layer_config['config']['input_dim'] += extra_rows
+            break
+    grown = keras.Sequential.from_config(config)
+    grown.build(model.input_shape)
+    for old_layer, new_layer in zip(model.layers, grown.layers):
+        weights = old_layer.get_weights()
+        if isinstance(old_layer, Embedding):
+            rows = np.repeat(weights[0].mean(axis=0, keepdims=True), extra_rows, axis=0)
+            weights = [np.concatenate([weights[0], rows]).astype(weights[0].dtype)]
+        new_layer.set_weights(weights)
+    return grown
+
+
+class FrozenRows(keras.constraints.Constraint):
+    """Constraint giữ nguyên các hàng đầu của ma trận embedding, chỉ các hàng sau được cập nhật"""
+    def __init__(self, frozen: np.ndarray):
+        self.frozen = tf.constant(frozen)
+
+    def __call__(self, w):
+        return tf.concat([self.frozen, w[self.frozen.shape[0]:]], axis=0)
+
+
+def prepare_warm_model(model, base_rows: int, freeze_embedding: bool, learning_rate: float):
+    """
+    Compile model tiếp tục train. freeze_embedding: không cập nhật embedding của vocab cũ;
+    khi vocab được mở rộng, hàng của từ mới vẫn được train.
+    Returns the constraint to remove after fit (None if not needed).
+    """
+    embedding = embedding_layer(model)
+    constraint = None
+    if freeze_embedding:
+        if embedding.input_dim > base_rows:
+            constraint = FrozenRows(embedding.get_weights()[0][:base_rows])
+            embedding.embeddings.constraint = constraint
+        else:
+            embedding.trainable = False
+    model.compile(
+        loss='binary_crossentropy',
+        optimizer=Adam(learning_rate=learning_rate),
+        metrics=[
+            'binary_accuracy',
+            keras.metrics.AUC(name='auc'),
+            keras.metrics.Precision(name='precision'),
+            keras.metrics.Recall(name='recall')
+        ]
+    )
+    return constraint
+
+
+def release_warm_model(model, constraint: Optional[FrozenRows]) -> None:
+    """Bỏ constraint/đóng băng tạm thời để model lưu ra và load lại như model train từ đầu"""
+    embedding = embedding_layer(model)
+    if constraint is not None:
+        embedding.embeddings.constraint = None
+    embedding.trainable = True
@@ -0,0 +1,68 @@
+"""
+So sánh độ trễ giữa Keras model.predict và hàm inference đã compile của MLService.
+
+Chạy từ thư mục ai-service:
+    python -m benchmarks.compare_inference_latency --repeats 50
+"""
+
+import argparse
+import json
+import os
+import time
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.ml_service import MLService
+
+
+def load_texts(data_path: str, limit: int):
+    with open(data_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return [item['Text'] for item in data[:limit]]
+
+
+def time_path(fn, padded: np.ndarray, repeats: int) -> np.ndarray:
+    fn(padded)  # warm-up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(padded)
+        timings.append(time.perf_counter() - start)
+    return np.array(timings) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare model.predict vs compiled inference latency")
+    parser.add_argument('--data', default=os.path.join('..', 'data', 'data_multilabel.json'))
+    parser.add_argument('--batch-sizes', default='1,8,32,128')
+    parser.add_argument('--repeats', type=int, default=50)
+    args = parser.parse_args()
+
+    batch_sizes = [int(size) for size in args.batch_sizes.split(',')]
+    ml_service = MLService()
+    ml_service.load_model()
+    bundle = ml_service.get_bundle()
+    texts = load_texts(args.data, max(batch_sizes))
+
+    print(f"{'batch':>6} {'predict p50 ms':>15} {'compiled p50 ms':>16} {'speedup':>8}")
+    for batch_size in batch_sizes:
+        padded = ml_service.preprocess_batch(texts[:batch_size])
+        keras_ms = time_path(bundle.forward_keras, padded, args.repeats)
+        compiled_ms = time_path(bundle.forward, padded, args.repeats)
+
+        # Hai đường phải cho cùng kết quả
+        np.testing.assert_allclose(
+            bundle.forward_keras(padded),
+            bundle.forward(padded),
+            rtol=1e-4,
+            atol=1e-5
+        )
+        keras_p50 = float(np.percentile(keras_ms, 50))
+        compiled_p50 = float(np.percentile(compiled_ms, 50))
+        print(f"{batch_size:>6} {keras_p50:>15.2f} {compiled_p50:>16.2f} {keras_p50 / compiled_p50:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
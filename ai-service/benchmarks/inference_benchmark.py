@@ -0,0 +1,241 @@
+"""
+Benchmark của pipeline inference MLService trên data/data_multilabel.json:
+tokenize -> pad -> forward -> post-process, ở từng batch size và từng loại model
+mà TrainingService dựng được (trọng số chưa train, chỉ đo tốc độ).
+
+Chạy từ thư mục ai-service:
+    python -m benchmarks.inference_benchmark --output bench.json
+    python -m benchmarks.inference_benchmark --baseline bench.json --tolerance 0.15
+Với --baseline, trả về exit code 1 nếu p50 của một stage chậm hơn baseline quá tolerance.
+"""
+
+import argparse
+import json
+import os
+import pickle
+import platform
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+# Cache dự đoán sẽ làm sai số đo khi dữ liệu được phát lại nhiều lần
+os.environ['PREDICTION_CACHE_SIZE'] = '0'
+
+import tensorflow as tf
+from sklearn.preprocessing import MultiLabelBinarizer
+from tensorflow.keras.preprocessing.sequence import pad_sequences
+from tensorflow.keras.preprocessing.text import Tokenizer
+
+from app.ml_service import MLService
+from app.training_manager import TrainingJobManager
+from app.training_service import TrainingService
+
+MODEL_TYPES = ['RNN', 'LSTM', 'BiLSTM', 'CNN', 'BiLSTM+CNN']
+STAGES = ['tokenize', 'pad', 'forward', 'postprocess', 'total']
+
+
+def load_dataset(data_path: str):
+    with open(data_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return [item['Text'] for item in data], [item['Labels'] for item in data]
+
+
+def build_bundle(ml_service: MLService, training_service: TrainingService, model_type: str,
+                 texts: List[str], labels: List[List[str]], max_words: int, max_len: int, workdir: str):
+    """Dựng model untrained cùng tokenizer/label binarizer/metadata rồi load qua MLService"""
+    tokenizer = Tokenizer(num_words=max_words)
+    tokenizer.fit_on_texts(texts)
+    mlb = MultiLabelBinarizer()
+    mlb.fit(labels)
+
+    model = training_service.build_model(model_type, max_words, max_len, len(mlb.classes_))
+    padded = pad_sequences(tokenizer.texts_to_sequences(texts), maxlen=max_len, padding='post')
+    stem = os.path.join(workdir, model_type.replace('+', '_'))
+    model.save(f"{stem}.h5")
+    with open(f"{stem}_tokenizer.pkl", 'wb') as f:
+        pickle.dump(tokenizer, f)
+    with open(f"{stem}_label_binarizer.pkl", 'wb') as f:
+        pickle.dump(mlb, f)
+    with open(f"{stem}_metadata.json", 'w', encoding='utf-8') as f:
+        json.dump({
+            'max_len': max_len,
+            'num_classes': len(mlb.classes_),
+            'classes': mlb.classes_.tolist(),
+            'model_type': model_type,
+            'length_buckets': training_service.compute_length_buckets(padded, max_len),
+        }, f)
+
+    bundle = ml_service._load_bundle(f"{stem}.h5")
+    bundle.warmup()
+    return bundle
+
+
+def tokenize(bundle, texts: List[str]) -> List[List[int]]:
+    if bundle._fast_tokenizer is not None:
+        return [bundle._fast_tokenizer.encode(text, bundle.max_len) for text in texts]
+    return bundle.tokenizer.texts_to_sequences(texts)
+
+
+def pad(bundle, sequences: List[List[int]]) -> np.ndarray:
+    if bundle._fast_tokenizer is not None:
+        padded = np.zeros((len(sequences), bundle.max_len), dtype=np.int32)
+        for row, ids in enumerate(sequences):
+            padded[row, :len(ids)] = ids
+        return padded
+    return pad_sequences(sequences, maxlen=bundle.max_len, padding='post', truncating='post')
+
+
+def run_batch(ml_service: MLService, bundle, texts: List[str], thresholds: np.ndarray) -> Dict[str, float]:
+    timings = {}
+    start = time.perf_counter()
+    sequences = tokenize(bundle, texts)
+    timings['tokenize'] = time.perf_counter() - start
+
+    mark = time.perf_counter()
+    padded = pad(bundle, sequences)
+    timings['pad'] = time.perf_counter() - mark
+
+    mark = time.perf_counter()
+    probabilities = bundle.forward(padded)
+    timings['forward'] = time.perf_counter() - mark
+
+    mark = time.perf_counter()
+    ml_service._select_labels(bundle.classes, probabilities, thresholds)
+    timings['postprocess'] = time.perf_counter() - mark
+
+    timings['total'] = time.perf_counter() - start
+    return timings
+
+
+def summarize(samples: List[Dict[str, float]], batch_size: int) -> Dict[str, Any]:
+    result: Dict[str, Any] = {}
+    for stage in STAGES:
+        values = np.array([sample[stage] for sample in samples]) * 1000.0
+        result[stage] = {
+            'mean_ms': float(values.mean()),
+            'p50_ms': float(np.percentile(values, 50)),
+            'p95_ms': float(np.percentile(values, 95)),
+            'p99_ms': float(np.percentile(values, 99)),
+        }
+    total_seconds = sum(sample['total'] for sample in samples)
+    result['throughput_rows_per_s'] = batch_size * len(samples) / total_seconds
+    return result
+
+
+def benchmark_model(ml_service: MLService, bundle, texts: List[str], batch_sizes: List[int],
+                    iterations: int) -> Dict[str, Any]:
+    """Phát lại dataset theo thứ tự, mỗi batch size `iterations` batch liên tiếp"""
+    thresholds = ml_service._threshold_matrix(bundle.classes, 0.5)
+    results = {}
+    for batch_size in batch_sizes:
+        cursor = 0
+        samples = []
+        for _ in range(iterations):
+            batch = [texts[(cursor + i) % len(texts)] for i in range(batch_size)]
+            cursor = (cursor + batch_size) % len(texts)
+            samples.append(run_batch(ml_service, bundle, batch, thresholds))
+        results[str(batch_size)] = summarize(samples, batch_size)
+        stage_p50 = ' '.join(f"{stage}={results[str(batch_size)][stage]['p50_ms']:.2f}" for stage in STAGES)
+        print(f"  batch {batch_size:>4}: {results[str(batch_size)]['throughput_rows_per_s']:>9.0f} rows/s  p50 ms: {stage_p50}")
+    return results
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, metric: str,
+            min_ms: float) -> List[str]:
+    """Stages whose metric got slower than baseline * (1 + tolerance)"""
+    regressions = []
+    for model_type, by_batch in current['results'].items():
+        for batch_size, stages in by_batch.items():
+            base_stages = baseline.get('results', {}).get(model_type, {}).get(batch_size)
+            if base_stages is None:
+                continue
+            for stage in STAGES:
+                new = stages[stage][metric]
+                old = base_stages[stage][metric]
+                # Bỏ qua stage quá nhanh, nhiễu đo lớn hơn cả giá trị
+                if max(new, old) < min_ms:
+                    continue
+                if new > old * (1 + tolerance):
+                    regressions.append(
+                        f"{model_type} batch={batch_size} {stage}: {metric} {old:.3f} -> {new:.3f} ms "
+                        f"(+{(new / old - 1) * 100:.0f}%)"
+                    )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage inference benchmark for MLService")
+    parser.add_argument('--data', default=os.path.join('..', 'data', 'data_multilabel.json'))
+    parser.add_argument('--model-types', default=','.join(MODEL_TYPES))
+    parser.add_argument('--batch-sizes', default='1,2,4,8,16,32,64,128,256,512')
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--max-words', type=int, default=50000)
+    parser.add_argument('--max-len', type=int, default=256)
+    parser.add_argument('--output', help="Write results as JSON to this path")
+    parser.add_argument('--baseline', help="Compare against a previous JSON result")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="Allowed slowdown, 0.15 = 15%%")
+    parser.add_argument('--metric', default='p50_ms', choices=['mean_ms', 'p50_ms', 'p95_ms', 'p99_ms'])
+    parser.add_argument('--min-ms', type=float, default=0.05, help="Ignore stages faster than this")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    np.random.seed(args.seed)
+    tf.random.set_seed(args.seed)
+
+    texts, labels = load_dataset(args.data)
+    batch_sizes = [int(size) for size in args.batch_sizes.split(',')]
+    ml_service = MLService()
+    training_service = TrainingService(TrainingJobManager())
+
+    report: Dict[str, Any] = {
+        'meta': {
+            'timestamp': time.time(),
+            'python': platform.python_version(),
+            'tensorflow': tf.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'dataset': os.path.abspath(args.data),
+            'num_texts': len(texts),
+            'iterations': args.iterations,
+            'max_len': args.max_len,
+            'max_words': args.max_words,
+            'backend': os.getenv('INFERENCE_BACKEND', 'keras'),
+            'fast_tokenizer': os.getenv('FAST_TOKENIZER', 'true'),
+            'length_bucketing': os.getenv('LENGTH_BUCKETING', 'true'),
+        },
+        'results': {},
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for model_type in args.model_types.split(','):
+            print(f"{model_type}:")
+            bundle = build_bundle(ml_service, training_service, model_type, texts, labels,
+                                  args.max_words, args.max_len, workdir)
+            report['results'][model_type] = benchmark_model(
+                ml_service, bundle, texts, batch_sizes, args.iterations
+            )
+            bundle.release()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance, args.metric, args.min_ms)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.tolerance * 100:.0f}%:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"No regression beyond {args.tolerance * 100:.0f}% ({args.metric})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Kiểm tra request của các client khác nhau được gom chung (micro-batch /classify) không làm
+hỏng lẫn nhau: request có threshold chứa nhãn lạ nhận 400, request hợp lệ chạy đồng thời
+trong cùng batch vẫn nhận nhãn của nó. Tương tự với từng dòng của /classify/stream, và
+threshold/topK riêng của từng item trong /classify/batch được áp dụng.
+
+Model untrained dựng từ data/data_multilabel.json, API chạy qua TestClient.
+
+Chạy từ thư mục ai-service:
+    python -m benchmarks.request_isolation
+Trả về exit code 1 nếu có request hợp lệ bị lỗi vì request khác.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+
+API_KEY_HEADER = {'X-API-Key': os.getenv('API_KEY', 'dev-secret-key-12345')}
+
+
+def check_classify(client, texts, classes, rounds: int) -> int:
+    """Good and bad /classify requests fired together so they share micro-batches"""
+    failures = []
+    barrier = threading.Barrier(4)
+
+    def call(i: int, bad: bool):
+        threshold = {'NoSuchLabel': 0.5} if bad else {classes[0]: 0.9}
+        barrier.wait()
+        response = client.post('/api/v1/classify', headers=API_KEY_HEADER, json={
+            'title': 'isolation', 'content': texts[i % len(texts)], 'threshold': threshold
+        })
+        expected = 400 if bad else 200
+        if response.status_code != expected:
+            failures.append(f"{'bad' if bad else 'good'} request {i}: {response.status_code} {response.text[:120]}")
+
+    for round_no in range(rounds):
+        threads = [threading.Thread(target=call, args=(round_no * 4 + j, j % 2 == 1)) for j in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    stats = client.get('/api/v1/classify/stats').json()
+    print(f"classify: {rounds * 4} requests, avg batch size {stats['avg_batch_size']:.2f}, {len(failures)} failures")
+    for failure in failures[:5]:
+        print(f"  {failure}")
+    return len(failures)
+
+
+def check_stream(client, texts, classes) -> int:
+    """NDJSON lines carry their own thresholds; a bad line must only fail itself"""
+    bad_lines = {3, 7}
+    lines = [
+        json.dumps({
+            'id': i, 'title': 'isolation', 'content': texts[i],
+            'threshold': {'NoSuchLabel': 0.5} if i in bad_lines else {classes[0]: 0.9}
+        })
+        for i in range(20)
+    ]
+    response = client.post('/api/v1/classify/stream?batchSize=8', headers=API_KEY_HEADER,
+                           content='\n'.join(lines).encode('utf-8'))
+    records = {record['id']: record for record in map(json.loads, response.text.splitlines())}
+    failures = [
+        f"line id {i}: {records.get(i)}" for i in range(20)
+        if i not in records or ('error' in records[i]) != (i in bad_lines)
+    ]
+    print(f"stream: {len(lines)} lines, {len(bad_lines)} with unknown labels, {len(failures)} failures")
+    for failure in failures[:5]:
+        print(f"  {failure}")
+    return len(failures)
+
+
+def check_batch_items(client, texts, classes) -> int:
+    """Per-item threshold/topK of /classify/batch override the batch-level values"""
+    failures = []
+    response = client.post('/api/v1/classify/batch', headers=API_KEY_HEADER, json={
+        'threshold': 0.0,
+        'items': [
+            {'title': 'isolation', 'content': texts[0]},
+            {'title': 'isolation', 'content': texts[0], 'threshold': 0.99},
+            {'title': 'isolation', 'content': texts[0], 'topK': 2},
+        ]
+    })
+    results = [r['labels'] for r in response.json()['results']] if response.status_code == 200 else None
+    if results is None:
+        failures.append(f"batch request: {response.status_code} {response.text[:120]}")
+    else:
+        # Model untrained: xác suất quanh 0.5, threshold 0.99 chỉ giữ nhãn cao nhất
+        if len(results[0]) != len(classes):
+            failures.append(f"batch threshold 0.0 kept {len(results[0])}/{len(classes)} labels")
+        if len(results[1]) != 1:
+            failures.append(f"item threshold 0.99 ignored: {len(results[1])} labels")
+        if len(results[2]) != 2:
+            failures.append(f"item topK 2 ignored: {len(results[2])} labels")
+    response = client.post('/api/v1/classify/batch', headers=API_KEY_HEADER, json={
+        'items': [{'title': 'isolation', 'content': texts[0], 'modelId': 1}]
+    })
+    if response.status_code != 400:
+        failures.append(f"item modelId accepted: {response.status_code}")
+    print(f"batch items: {len(failures)} failures")
+    for failure in failures:
+        print(f"  {failure}")
+    return len(failures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-request error isolation in coalesced inference")
+    parser.add_argument('--data', default=os.path.join('..', 'data', 'data_multilabel.json'))
+    parser.add_argument('--model-type', default='CNN')
+    parser.add_argument('--rounds', type=int, default=10)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    # Đợi đủ lâu để các request đồng thời rơi vào cùng một micro-batch
+    os.environ['BATCH_MAX_WAIT_MS'] = '50'
+    os.environ['PREDICTION_CACHE_SIZE'] = '0'
+    os.environ['TRAINING_QUEUE_DIR'] = os.path.join(workdir, 'training_queue')
+
+    from benchmarks.inference_benchmark import build_bundle, load_dataset
+    from app.ml_service import MLService
+    from app.training_manager import TrainingJobManager
+    from app.training_service import TrainingService
+
+    texts, labels = load_dataset(args.data)
+    texts, labels = texts[:500], labels[:500]
+    bundle = build_bundle(MLService(), TrainingService(TrainingJobManager()), args.model_type,
+                          texts, labels, 5000, 128, workdir)
+    os.environ['MODEL_PATH'] = bundle.model_path
+    os.environ['MODEL_DIR'] = workdir
+    classes = bundle.classes.tolist()
+
+    from fastapi.testclient import TestClient
+    from app.main import app, ml_service
+
+    failures = 0
+    with TestClient(app) as client:
+        ml_service._load_thread.join()
+        failures += check_classify(client, texts, classes, args.rounds)
+        failures += check_stream(client, texts, classes)
+        failures += check_batch_items(client, texts, classes)
+
+    if failures:
+        print("FAILED: per-request options or errors leaked across a batch")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
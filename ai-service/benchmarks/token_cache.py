@@ -0,0 +1,111 @@
+"""
+Thời gian chuẩn bị dữ liệu (prepare_data) khi retrain với token cache trên data/data_multilabel.json:
+không cache, cache rỗng (job đầu tiên) và retrain trên tập trùng --overlap với lần trước
+(phần còn lại là email mới hoặc email đã sửa nội dung). Kiểm tra tokenizer và mảng
+X_train/X_test giống hệt khi không dùng cache, và giới hạn số dòng/tuổi của cache.
+
+Chạy từ thư mục ai-service:
+    python -m benchmarks.token_cache --overlap 0.95
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import numpy as np
+
+from app.token_cache import TokenSequenceCache
+from app.training_manager import TrainingJobManager
+from app.training_service import TrainingService
+
+
+def run_prepare(service: TrainingService, samples, args):
+    stats = {}
+    start = time.perf_counter()
+    prepared = service.prepare_data(samples, args.max_words, args.max_len, cache_stats=stats)
+    return prepared, time.perf_counter() - start, stats
+
+
+def same_output(a, b) -> bool:
+    X_train_a, X_test_a, _, _, tokenizer_a = a[:5]
+    X_train_b, X_test_b, _, _, tokenizer_b = b[:5]
+    return (
+        np.array_equal(X_train_a, X_train_b)
+        and np.array_equal(X_test_a, X_test_b)
+        and tokenizer_a.word_index == tokenizer_b.word_index
+    )
+
+
+def check_limits(workdir: str, samples) -> int:
+    """Số lỗi: cache vượt max_rows, hoặc entry quá max_age_days không bị xóa"""
+    from tensorflow.keras.preprocessing.text import Tokenizer
+    tokenizer = Tokenizer(oov_token='<OOV>')
+    texts = [s['content'] for s in samples[:1000]]
+    cache = TokenSequenceCache(os.path.join(workdir, 'limits.sqlite'), enabled=True, max_age_days=30, max_rows=600)
+    cache.word_sequences(tokenizer, range(len(texts)), texts)
+    with sqlite3.connect(cache.path) as conn:
+        rows = conn.execute('SELECT COUNT(*) FROM token_sequences').fetchone()[0]
+        # Giả lập entry không được dùng từ 60 ngày trước
+        conn.execute('UPDATE token_sequences SET updated_at = updated_at - 60 * 86400 WHERE rowid % 2 = 0')
+    _, stats = cache.word_sequences(tokenizer, [f"new-{i}" for i in range(10)], texts[:10])
+    with sqlite3.connect(cache.path) as conn:
+        stale = conn.execute('SELECT COUNT(*) FROM token_sequences WHERE updated_at < ?',
+                             (time.time() - 30 * 86400,)).fetchone()[0]
+    print(f"limits: {rows} rows kept of {len(texts)} (max 600), {stats['evicted']} stale entries evicted, {stale} left")
+    return int(rows > 600) + int(stale > 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="prepare_data time with the tokenized-sample cache")
+    parser.add_argument('--data', default=os.path.join('..', 'data', 'data_multilabel.json'))
+    parser.add_argument('--overlap', type=float, default=0.95)
+    parser.add_argument('--max-words', type=int, default=50000)
+    parser.add_argument('--max-len', type=int, default=256)
+    args = parser.parse_args()
+
+    with open(args.data, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    samples = [{'id': i, 'title': '', 'content': item['Text'], 'labels': item['Labels']} for i, item in enumerate(data)]
+
+    # Lần retrain: bỏ một phần email cũ, thêm email mới, sửa nội dung vài email còn lại
+    changed = int(len(samples) * (1 - args.overlap))
+    rng = np.random.default_rng(0)
+    retrain = [dict(s) for s in samples[changed // 2:]]
+    for i in rng.choice(len(retrain), changed - changed // 2, replace=False):
+        retrain[i]['content'] += " (edited)"
+    retrain += [
+        {'id': len(samples) + i, 'title': 'new', 'content': s['content'], 'labels': s['labels']}
+        for i, s in enumerate(samples[:changed // 2])
+    ]
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as workdir:
+        service = TrainingService(TrainingJobManager())
+        service.token_cache = TokenSequenceCache(os.path.join(workdir, 'tokens.sqlite'), enabled=True)
+        uncached = TrainingService(TrainingJobManager())
+        uncached.token_cache = TokenSequenceCache(enabled=False)
+
+        print(f"samples: {len(samples)}, retrain samples: {len(retrain)}, overlap: {args.overlap:.0%}")
+        print(f"{'run':>16} {'prepare s':>10} {'cache s':>8} {'hit rate':>9} {'same output':>12}")
+        for name, batch in (('first job', samples), ('retrain', retrain)):
+            baseline, baseline_seconds, _ = run_prepare(uncached, batch, args)
+            prepared, seconds, stats = run_prepare(service, batch, args)
+            same = same_output(baseline, prepared)
+            failures += not same
+            print(f"{name + ' no cache':>16} {baseline_seconds:>10.3f} {'-':>8} {'-':>9} {'-':>12}")
+            print(f"{name + ' cache':>16} {seconds:>10.3f} {stats['seconds']:>8.3f} "
+                  f"{stats['hitRate']:>9.1%} {str(same):>12}")
+        size = os.path.getsize(service.token_cache.path)
+        print(f"cache file: {size / 1e6:.1f} MB")
+        failures += check_limits(workdir, samples)
+
+    if failures:
+        print("FAILED: cached word sequences change the prepared data or the cache limits are not applied")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""
+Kiểm tra FastTokenizer cho kết quả giống hệt Keras Tokenizer trên data/data_multilabel.json
+và đo tốc độ của hai đường. Cũng kiểm tra TextPreprocessor không làm đổi input model
+của email thường (kể cả email có URL dài, đường dẫn, "<a"/"<b" trong text), có bỏ base64
+MIME, và đo thời gian xử lý một email HTML ~10 MB.
+
+Chạy từ thư mục ai-service:
+    python -m benchmarks.tokenizer_parity
+Trả về exit code 1 nếu có bất kỳ khác biệt nào.
+"""
+
+import argparse
+import json
+import os
+import pickle
+import sys
+import time
+import numpy as np
+from tensorflow.keras.preprocessing.text import Tokenizer
+from tensorflow.keras.preprocessing.sequence import pad_sequences
+
+from app.text_preprocessing import TextPreprocessor
+from app.tokenizer_engine import FastTokenizer
+
+
+def keras_padded(tokenizer, texts, max_len: int) -> np.ndarray:
+    return pad_sequences(
+        tokenizer.texts_to_sequences(texts),
+        maxlen=max_len,
+        padding='post',
+        truncating='post'
+    )
+
+
+def build_tokenizers(texts, tokenizer_path: str):
+    """Tokenizer đang dùng thật (nếu có) và một số cấu hình Keras khác"""
+    tokenizers = {}
+    if os.path.exists(tokenizer_path):
+        with open(tokenizer_path, 'rb') as f:
+            tokenizers['saved'] = pickle.load(f)
+
+    configs = {
+        'num_words=10000': dict(num_words=10000),
+        'num_words=50000,oov': dict(num_words=50000, oov_token='<OOV>'),
+        'no_limit': dict(),
+        'no_lower,oov': dict(num_words=2000, lower=False, oov_token='<OOV>'),
+    }
+    for name, config in configs.items():
+        tokenizer = Tokenizer(**config)
+        tokenizer.fit_on_texts(texts)
+        tokenizers[name] = tokenizer
+    return tokenizers
+
+
+PLAIN_TEXT_EXTRAS = [
+    "Xem tai https://example.com/shop/ProductCatalogue2024/SummerCollection/WomenShoesAndAccessoriesSale/item12345",
+    "Duong dan: /var/lib/mailstore/AccountsPayable/InvoicesReceived/2024/Quarter3/VendorStatements/Final",
+    "Ma don hang ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789abcdefghijklmnopqrstuvwxyz0123456789 da duoc giao",
+    "Neu a<b and c>d thi <b la nho hon",
+    "Gui lai <a few notes> ve hop dong, xem muc <b> ben duoi",
+    "Line one\nZmFrZWJhc2U2NGxpbmVidXRvbmx5b25lbGluZWxvbmdlbm91Z2h0b21hdGNodGhlb2xkcnVsZXM=\nLine three",
+]
+
+
+def check_base64_stripped(tokenizer) -> int:
+    """MIME base64 ngắt dòng, hoặc ngay sau header Content-Transfer-Encoding, phải bị bỏ"""
+    preprocessor = TextPreprocessor.from_keras(tokenizer)
+    line = 'QUJDREVGR0hJSktMTU5PUFFSU1RVVldYWVo0NTY3ODkrL2FiY2RlZmdoaWprbG1ub3BxcnN0dXZ3'
+    cases = {
+        'line-wrapped block': f"Xin chao\n{line}\n{line}\n{line[:20]}==\n\nCam on",
+        'Content-Transfer-Encoding part': f"Xin chao\nContent-Transfer-Encoding: base64\n\nSGVsbG8gd29ybGQ=\n\nCam on",
+    }
+    failures = 0
+    for name, content in cases.items():
+        prepared = preprocessor.prepare('', content, None)
+        if 'QUJD' in prepared or 'SGVsbG8' in prepared or 'Cam on' not in prepared:
+            print(f"base64 {name} not stripped: {prepared!r}")
+            failures += 1
+    print(f"base64 stripping: {len(cases) - failures}/{len(cases)} cases OK")
+    return failures
+
+
+def check_preprocessing(name: str, tokenizer, texts, max_lens) -> int:
+    """
+    TextPreprocessor (bounded scan) phải cho cùng input model với f"{title} {content}" + Keras
+    trên email thường, kể cả email dài hơn max_len rất nhiều lần.
+    """
+    preprocessor = TextPreprocessor.from_keras(tokenizer)
+    items = [(text[:40], text) for text in texts]
+    # Email thường nhưng rất dài: ghép nhiều email lại với nhau
+    items += [(texts[i], ' '.join(texts[i:i + 50])) for i in range(0, len(texts) - 50, 500)]
+    # Email text thường có chuỗi dài giống base64 hoặc dấu '<' không phải HTML
+    items += [(texts[i][:40], f"{texts[i]} {extra}") for i, extra in enumerate(PLAIN_TEXT_EXTRAS)]
+    failures = 0
+    for max_len in max_lens:
+        expected = keras_padded(tokenizer, [f"{title} {content}" for title, content in items], max_len)
+        prepared = [preprocessor.prepare(title, content, max_len) for title, content in items]
+        actual = keras_padded(tokenizer, prepared, max_len)
+        mismatched_rows = np.where((expected != actual).any(axis=1))[0]
+        truncated = sum(len(text) < len(title) + len(content) + 1 for text, (title, content) in zip(prepared, items))
+        failures += len(mismatched_rows)
+        status = "OK" if len(mismatched_rows) == 0 else f"{len(mismatched_rows)} rows differ"
+        print(f"[{name}] preprocess max_len={max_len}: {status} ({truncated} of {len(items)} emails cut early)")
+    return failures
+
+
+def report_bounded_work(tokenizer, texts, max_len: int = 200) -> int:
+    """Thời gian chuẩn bị một email HTML ~10 MB có base64, so với tokenize toàn bộ"""
+    body = ''.join(f"<p style='color:red'>{text}</p>\n" for text in texts)
+    while len(body) < 10 * 1024 * 1024:
+        body += body
+    attachment = ('QUJDREVGR0hJSktMTU5PUFFSU1RVVldYWVo0NTY3ODkrL2FiY2RlZmdoaWprbG1ub3BxcnN0dXZ3' + '\n') * 20000
+    content = f"<html><head><style>p {{ color: red; }}</style></head><body>{body}</body></html>\n{attachment}"
+    preprocessor = TextPreprocessor.from_keras(tokenizer)
+
+    start = time.perf_counter()
+    prepared = preprocessor.prepare('Khuyến mãi', content, max_len)
+    bounded_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    tokenizer.texts_to_sequences([f"Khuyến mãi {content}"])
+    full_s = time.perf_counter() - start
+    print(
+        f"{len(content) / 1024 / 1024:.1f} MB HTML email: bounded preprocessing {bounded_s * 1000:.1f} ms "
+        f"({len(prepared)} chars kept), full tokenization {full_s * 1000:.0f} ms"
+    )
+    if '<' in prepared or 'color' in prepared:
+        print("HTML markup left after preprocessing")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Token-for-token parity between FastTokenizer and Keras Tokenizer")
+    parser.add_argument('--data', default=os.path.join('..', 'data', 'data_multilabel.json'))
+    parser.add_argument('--tokenizer', default=os.getenv('TOKENIZER_PATH', 'ml_models/tokenizer.pkl'))
+    parser.add_argument('--max-lens', default='50,200,256')
+    args = parser.parse_args()
+
+    with open(args.data, 'r', encoding='utf-8') as f:
+        texts = [item['Text'] for item in json.load(f)]
+    # Thêm vài trường hợp biên: rỗng, chỉ dấu câu, chữ hoa, xuống dòng, khoảng trắng unicode
+    texts += ['', '!!! ??? ...', 'HELLO World\nNew\tLine', 'a b  c\r\nd', 'Xin chào, Tiếng Việt!']
+
+    failures = 0
+    tokenizers = build_tokenizers(texts, args.tokenizer)
+    for name, tokenizer in tokenizers.items():
+        fast = FastTokenizer.from_keras(tokenizer)
+
+        # So sánh chuỗi token đầy đủ (chưa pad)
+        expected_sequences = tokenizer.texts_to_sequences(texts)
+        for i, (expected, actual) in enumerate(zip(expected_sequences, fast.texts_to_sequences(texts))):
+            if expected != actual:
+                failures += 1
+                print(f"[{name}] sequence mismatch at sample {i}: {expected[:10]}... vs {actual[:10]}...")
+
+        for max_len in [int(x) for x in args.max_lens.split(',')]:
+            start = time.perf_counter()
+            expected = keras_padded(tokenizer, texts, max_len)
+            keras_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            actual = fast.texts_to_padded(texts, max_len)
+            fast_s = time.perf_counter() - start
+
+            mismatched_rows = np.where((expected != actual).any(axis=1))[0]
+            failures += len(mismatched_rows)
+            status = "OK" if len(mismatched_rows) == 0 else f"{len(mismatched_rows)} rows differ"
+            print(
+                f"[{name}] max_len={max_len}: {status} "
+                f"(keras {keras_s * 1000:.1f} ms, fast {fast_s * 1000:.1f} ms, "
+                f"{keras_s / max(fast_s, 1e-9):.1f}x)"
+            )
+
+        failures += check_preprocessing(name, tokenizer, texts, [int(x) for x in args.max_lens.split(',')])
+
+    failures += check_base64_stripped(tokenizers['no_limit'])
+    failures += report_bounded_work(tokenizers['no_limit'], texts)
+
+    if failures:
+        print(f"FAILED: {failures} mismatches")
+        sys.exit(1)
+    print(f"All {len(texts)} texts match token-for-token")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Đo độ trễ classify (p50/p99) trong lúc một job train đang chạy: không train,
+train trong thread của process phục vụ (TRAINING_ISOLATION=thread) và train trong
+process riêng (TRAINING_ISOLATION=process, dùng TRAINING_CPUS/TRAINING_THREADS/TRAINING_NICE).
+
+Chạy từ thư mục ai-service:
+    python -m benchmarks.training_isolation --epochs 3 --samples 1000
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List
+import numpy as np
+
+from benchmarks.inference_benchmark import build_bundle, load_dataset, run_batch
+from app.ml_service import MLService
+from app.training_manager import TrainingJobManager
+from app.training_service import TrainingService
+from app.training_worker import TrainingProcessRunner
+
+
+def probe_latency(ml_service: MLService, bundle, texts: List[str], done: threading.Event) -> List[float]:
+    """Classify one email at a time until `done` is set; returns per-request latencies in ms"""
+    thresholds = ml_service._threshold_matrix(bundle.classes, 0.5)
+    latencies = []
+    i = 0
+    while not done.is_set():
+        latencies.append(run_batch(ml_service, bundle, [texts[i % len(texts)]], thresholds)['total'] * 1000.0)
+        i += 1
+        # Nhịp request đều như traffic thật, không chạy hết CPU
+        time.sleep(0.005)
+    return latencies
+
+
+def run_mode(mode: str, ml_service: MLService, bundle, texts: List[str], samples: List[Dict[str, Any]],
+             args) -> Dict[str, float]:
+    job_manager = TrainingJobManager()
+    job_id = f"isolation-{mode}"
+    job_manager.create_job(job_id, args.model_type)
+    hyperparameters = {
+        'epochs': args.epochs,
+        'batch_size': 32,
+        'max_words': args.max_words,
+        'max_len': args.max_len,
+        'train_linear': False,
+    }
+    done = threading.Event()
+
+    def train():
+        try:
+            if mode == 'thread':
+                TrainingService(job_manager).train_model(job_id, args.model_type, samples, hyperparameters)
+            elif mode == 'process':
+                TrainingProcessRunner(job_manager).run(job_id, args.model_type, samples, hyperparameters)
+            else:
+                time.sleep(args.idle_seconds)
+        finally:
+            done.set()
+
+    start = time.perf_counter()
+    trainer = threading.Thread(target=train)
+    trainer.start()
+    latencies = np.array(probe_latency(ml_service, bundle, texts, done))
+    trainer.join()
+    return {
+        'requests': len(latencies),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'max_ms': float(latencies.max()),
+        'wall_s': time.perf_counter() - start,
+        'status': job_manager.get_job(job_id)['status'] if mode != 'idle' else '-',
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classification latency while a training job runs")
+    parser.add_argument('--data', default=os.path.join('..', 'data', 'data_multilabel.json'))
+    parser.add_argument('--model-type', default='CNN')
+    parser.add_argument('--modes', default='idle,thread,process')
+    parser.add_argument('--samples', type=int, default=1000)
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--max-words', type=int, default=20000)
+    parser.add_argument('--max-len', type=int, default=256)
+    parser.add_argument('--idle-seconds', type=float, default=10.0)
+    args = parser.parse_args()
+
+    texts, labels = load_dataset(args.data)
+    samples = [
+        {'id': i, 'title': '', 'content': text, 'labels': label}
+        for i, (text, label) in enumerate(zip(texts[:args.samples], labels[:args.samples]))
+    ]
+
+    ml_service = MLService()
+    with tempfile.TemporaryDirectory() as workdir:
+        bundle = build_bundle(ml_service, TrainingService(TrainingJobManager()), args.model_type,
+                              texts, labels, args.max_words, args.max_len, workdir)
+        print(f"cpu cores: {os.cpu_count()}, training samples: {len(samples)}, epochs: {args.epochs}")
+        print(f"{'mode':>8} {'requests':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'wall s':>7} {'job':>10}")
+        for mode in args.modes.split(','):
+            result = run_mode(mode, ml_service, bundle, texts, samples, args)
+            print(
+                f"{mode:>8} {result['requests']:>9} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+                f"{result['max_ms']:>8.1f} {result['wall_s']:>7.1f} {result['status']:>10}"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+So sánh thời gian mỗi bước train giữa model.fit trên mảng NumPy pad đủ max_len và
+tf.data pipeline (shuffle, cache, bucket theo độ dài, prefetch) trên data/data_multilabel.json.
+Với model train bằng pipeline, kiểm tra output khi cắt padding theo bucket giống hệt output
+khi pad đủ max_len (điều kiện để train theo bucket mà phục vụ ở max_len).
+
+Chạy từ thư mục ai-service:
+    python -m benchmarks.training_pipeline --model-types CNN,LSTM --epochs 2 [--mask-padding]
+"""
+
+import argparse
+import json
+import os
+import sys
+import numpy as np
+
+from app.model_bundle import padding_margin
+from app.training_manager import TrainingJobManager
+from app.training_service import TrainingService
+
+
+def check_padding_invariance(model, X: np.ndarray, margin: int) -> float:
+    """Max |p(max_len) - p(length + margin)| over rows of X"""
+    full = model.predict(X, verbose=0)
+    lengths = np.count_nonzero(X, axis=1)
+    worst = 0.0
+    for width in np.unique(np.minimum(np.maximum(lengths, 1) + margin, X.shape[1])):
+        rows = np.nonzero(np.minimum(np.maximum(lengths, 1) + margin, X.shape[1]) == width)[0]
+        cut = model.predict(X[rows, :width], verbose=0)
+        worst = max(worst, float(np.abs(cut - full[rows]).max()))
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Training step time with and without the tf.data pipeline")
+    parser.add_argument('--data', default=os.path.join('..', 'data', 'data_multilabel.json'))
+    parser.add_argument('--model-types', default='CNN,LSTM,BiLSTM')
+    parser.add_argument('--samples', type=int, default=2000)
+    parser.add_argument('--epochs', type=int, default=2)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--max-words', type=int, default=20000)
+    parser.add_argument('--max-len', type=int, default=256)
+    parser.add_argument('--mask-padding', action='store_true',
+                        help="Mask padding in RNN/LSTM/BiLSTM models so the pipeline can bucket them")
+    args = parser.parse_args()
+
+    with open(args.data, 'r', encoding='utf-8') as f:
+        data = json.load(f)[:args.samples]
+    samples = [{'id': i, 'title': '', 'content': item['Text'], 'labels': item['Labels']} for i, item in enumerate(data)]
+
+    job_manager = TrainingJobManager()
+    service = TrainingService(job_manager)
+    rows = []
+    failures = 0
+    for model_type in args.model_types.split(','):
+        for use_pipeline in (False, True):
+            job_id = f"pipeline-{model_type}-{use_pipeline}"
+            job_manager.create_job(job_id, model_type)
+            results = service.train_model(job_id, model_type, samples, {
+                'epochs': args.epochs,
+                'batch_size': args.batch_size,
+                'max_words': args.max_words,
+                'max_len': args.max_len,
+                'train_linear': False,
+                'use_data_pipeline': use_pipeline,
+                'mask_padding': args.mask_padding,
+            })
+            pipeline = results['metrics']['trainingPipeline']
+            invariance = None
+            margin = padding_margin(results['model'])
+            if use_pipeline and pipeline['bucketed']:
+                invariance = check_padding_invariance(results['model'], results['holdout']['X_test'], margin)
+                if invariance > 1e-4:
+                    failures += 1
+            rows.append((model_type, use_pipeline, pipeline, results['metrics']['f1Micro'], invariance))
+
+    print(f"{'model':>8} {'pipeline':>8} {'bucketed':>8} {'steps':>6} {'pad ratio':>9} "
+          f"{'p50 ms':>8} {'mean ms':>8} {'fit s':>7} {'f1 micro':>8} {'max diff':>9}")
+    for model_type, use_pipeline, pipeline, f1_micro, invariance in rows:
+        step = pipeline['stepTime']
+        pad_ratio = pipeline['paddedTokensPerEpoch'] / max(pipeline['realTokensPerEpoch'], 1)
+        print(
+            f"{model_type:>8} {str(use_pipeline):>8} {str(pipeline['bucketed']):>8} {pipeline['steps']:>6} "
+            f"{pad_ratio:>9.2f} {step['p50Ms']:>8.1f} {step['meanMs']:>8.1f} {pipeline['fitSeconds']:>7.1f} "
+            f"{f1_micro:>8.3f} {'-' if invariance is None else f'{invariance:.2e}':>9}"
+        )
+    if failures:
+        print(f"FAILED: {failures} bucketed models change their output when padding is cut")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+So sánh retrain từ đầu với warm start trên data/data_multilabel.json cho chu kỳ gán nhãn lại hằng ngày:
+model gốc train trên --base-fraction dữ liệu và được lưu như một model active; phần còn lại là
+email mới/được sửa nhãn. Retrain đầy đủ train lại trên toàn bộ dữ liệu, warm start chỉ train
+vài epoch trên dữ liệu mới. Đo thời gian và F1 trên cùng một tập holdout.
+
+Kiểm tra thêm: mở rộng vocab không đổi id của từ cũ, model với embedding đã mở rộng cho output
+giống hệt model gốc trên các email không có từ mới, và embedding đóng băng không bị thay đổi.
+
+Chạy từ thư mục ai-service:
+    python -m benchmarks.warm_start --model-type CNN --base-epochs 5 --warm-epochs 2
+"""
+
+import argparse
+import copy
+import json
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+from sklearn.metrics import f1_score
+from tensorflow.keras.preprocessing.sequence import pad_sequences
+
+from app.token_cache import TokenSequenceCache
+from app.training_manager import TrainingJobManager
+from app.training_service import TrainingService
+from app.warm_start import embedding_layer, extend_vocabulary, grow_embedding, load_base_model
+
+
+def holdout_f1(model_path: str, samples, max_len: int) -> float:
+    """F1 micro of a saved model on samples, tokenized with the model's own tokenizer"""
+    base = load_base_model(model_path)
+    texts = [f"{s['title']} {s['content']}" for s in samples]
+    X = pad_sequences(base['tokenizer'].texts_to_sequences(texts), maxlen=max_len, padding='post')
+    y = base['label_binarizer'].transform([s['labels'] for s in samples])
+    predicted = (base['model'].predict(X, verbose=0) > 0.5).astype(int)
+    return float(f1_score(y, predicted, average='micro', zero_division=0))
+
+
+def check_growth(model_path: str, new_samples, max_len: int) -> int:
+    """Số lỗi: id từ cũ bị đổi, hoặc output đổi trên email không chứa từ mới"""
+    base = load_base_model(model_path)
+    tokenizer = copy.deepcopy(base['tokenizer'])
+    rows = embedding_layer(base['model']).input_dim
+    new_words = extend_vocabulary(tokenizer, [f"{s['title']} {s['content']}" for s in new_samples], rows)
+    failures = 0
+    usable = {w: i for w, i in base['tokenizer'].word_index.items() if i < rows}
+    if any(tokenizer.word_index[w] != i for w, i in usable.items()):
+        print("FAILED: existing word ids changed")
+        failures += 1
+    grown = grow_embedding(base['model'], len(new_words))
+    texts = [f"{s['title']} {s['content']}" for s in new_samples]
+    old_X = pad_sequences(base['tokenizer'].texts_to_sequences(texts), maxlen=max_len, padding='post')
+    new_X = pad_sequences(tokenizer.texts_to_sequences(texts), maxlen=max_len, padding='post')
+    same = np.all(old_X == new_X, axis=1)
+    diff = float(np.abs(base['model'].predict(old_X[same], verbose=0) - grown.predict(new_X[same], verbose=0)).max())
+    print(f"vocabulary growth: {len(new_words)} new words, {int(same.sum())} emails without new words, max diff {diff:.2e}")
+    if diff > 1e-6:
+        print("FAILED: grown model changes the output of emails without new words")
+        failures += 1
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full retrain vs warm-start retrain")
+    parser.add_argument('--data', default=os.path.join('..', 'data', 'data_multilabel.json'))
+    parser.add_argument('--model-type', default='CNN')
+    parser.add_argument('--base-fraction', type=float, default=0.8)
+    parser.add_argument('--base-epochs', type=int, default=5)
+    parser.add_argument('--warm-epochs', type=int, default=2)
+    parser.add_argument('--max-words', type=int, default=20000)
+    parser.add_argument('--max-len', type=int, default=256)
+    args = parser.parse_args()
+
+    with open(args.data, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    samples = [{'id': i, 'title': '', 'content': item['Text'], 'labels': item['Labels']} for i, item in enumerate(data)]
+    rng = np.random.default_rng(0)
+    order = rng.permutation(len(samples))
+    holdout = [samples[i] for i in order[:len(samples) // 10]]
+    pool = [samples[i] for i in order[len(samples) // 10:]]
+    cut = int(len(pool) * args.base_fraction)
+    old, new = pool[:cut], pool[cut:]
+
+    job_manager = TrainingJobManager()
+    failures = 0
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        service = TrainingService(job_manager)
+        service.token_cache = TokenSequenceCache(os.path.join(workdir, 'tokens.sqlite'))
+        common = {
+            'batch_size': 32, 'max_words': args.max_words, 'max_len': args.max_len,
+            'learning_rate': 0.001, 'train_linear': False,
+        }
+
+        def run(name, batch, hyperparameters):
+            job_manager.create_job(name, args.model_type)
+            start = time.perf_counter()
+            results = service.train_model(name, args.model_type, batch, {**common, **hyperparameters})
+            seconds = time.perf_counter() - start
+            path = service.save_model(name, name, output_dir=workdir)
+            rows.append((name, len(batch), hyperparameters.get('epochs'), seconds,
+                         holdout_f1(path, holdout, args.max_len), results['metrics'].get('warmStart')))
+            return path, results
+
+        base_path, _ = run('base', old, {'epochs': args.base_epochs})
+        failures += check_growth(base_path, new, args.max_len)
+        run('full', old + new, {'epochs': args.base_epochs})
+        run('warm', new, {'epochs': args.warm_epochs, 'warm_start': True, 'base_model_path': base_path})
+        run('warm-grow', new, {'epochs': args.warm_epochs, 'warm_start': True, 'base_model_path': base_path,
+                               'grow_vocabulary': True})
+        _, frozen = run('warm-frozen', new, {'epochs': args.warm_epochs, 'warm_start': True,
+                                             'base_model_path': base_path, 'grow_vocabulary': True,
+                                             'freeze_embedding': True})
+        base_rows = load_base_model(base_path)['model'].get_weights()[0]
+        frozen_rows = frozen['model'].get_weights()[0][:len(base_rows)]
+        if not np.array_equal(base_rows, frozen_rows):
+            print("FAILED: frozen embedding rows changed")
+            failures += 1
+
+    print(f"{'run':>12} {'samples':>8} {'epochs':>7} {'seconds':>8} {'holdout f1':>11} {'new words':>10}")
+    for name, count, epochs, seconds, f1_micro, warm_start in rows:
+        print(f"{name:>12} {count:>8} {epochs:>7} {seconds:>8.1f} {f1_micro:>11.3f} "
+              f"{warm_start['newWords'] if warm_start else '-':>10}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
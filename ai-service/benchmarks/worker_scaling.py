@@ -0,0 +1,97 @@
+"""
+Đo throughput của InferenceWorkerPool theo số worker process và bộ nhớ của từng worker.
+
+Cần file .tflite đã export (SaveModelRequest.exportTflite). Chạy từ thư mục ai-service:
+    python -m benchmarks.worker_scaling --model ml_models/email_cnn_model.tflite --workers 1,2,4
+"""
+
+import argparse
+import os
+import threading
+import time
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.inference_workers import InferenceWorkerPool
+from app.tflite_backend import TFLiteBackend
+
+
+def process_memory_mb(pid: int) -> dict:
+    """Rss/Pss/private memory of a process from /proc (Linux only)"""
+    fields = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if parts[0] in ('Rss:', 'Pss:', 'Shared_Clean:', 'Private_Dirty:'):
+                    fields[parts[0][:-1]] = int(parts[1]) / 1024.0
+    except OSError:
+        pass
+    return fields
+
+
+def run_load(pool: InferenceWorkerPool, batches: list, clients: int, seconds: float) -> int:
+    """Send batches from `clients` threads for `seconds`; return the number of rows scored"""
+    rows = [0] * clients
+    deadline = time.perf_counter() + seconds
+
+    def client(idx: int):
+        i = idx
+        while time.perf_counter() < deadline:
+            batch = batches[i % len(batches)]
+            pool.predict(batch)
+            rows[idx] += len(batch)
+            i += clients
+
+    threads = [threading.Thread(target=client, args=(idx,)) for idx in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of multi-process TFLite inference workers")
+    parser.add_argument('--model', required=True, help="Path to the exported .tflite model")
+    parser.add_argument('--workers', default='1,2,4')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    args = parser.parse_args()
+
+    reference = TFLiteBackend(args.model)
+    input_len = reference.input_len
+    rng = np.random.default_rng(0)
+    batches = [
+        rng.integers(1, 1000, size=(args.batch_size, input_len), dtype=np.int32)
+        for _ in range(16)
+    ]
+    expected = reference.predict(batches[0])
+
+    print(f"cpu cores: {os.cpu_count()}, model size: {os.path.getsize(args.model) / 1024 / 1024:.1f} MB")
+    print(f"{'workers':>7} {'rows/s':>10} {'scaling':>8} {'rss MB/worker':>14} {'pss MB/worker':>14} {'private MB/worker':>18}")
+    baseline = None
+    for workers in [int(n) for n in args.workers.split(',')]:
+        pool = InferenceWorkerPool(args.model, num_workers=workers)
+        try:
+            np.testing.assert_allclose(pool.predict(batches[0]), expected, rtol=1e-4, atol=1e-5)
+            run_load(pool, batches, workers * 2, 1.0)  # warm-up
+
+            rows = run_load(pool, batches, workers * 2, args.seconds)
+            throughput = rows / args.seconds
+            baseline = baseline or throughput
+
+            memory = [process_memory_mb(pid) for pid in pool.worker_pids]
+            avg = lambda key: np.mean([m.get(key, 0.0) for m in memory])
+            print(
+                f"{workers:>7} {throughput:>10.0f} {throughput / baseline:>7.2f}x "
+                f"{avg('Rss'):>14.1f} {avg('Pss'):>14.1f} {avg('Private_Dirty'):>18.1f}"
+            )
+        finally:
+            pool.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -365,6 +365,10 @@ async function checkTrainingStatus(jobId) {
         updateStatusMessage('Training failed!', 'danger');
         alert('Huấn luyện thất bại. Vui lòng thử lại.');
         window.location.href = '/retrain';
+      } else if (status.status === 'cancelled') {
+        clearInterval(pollingInterval);
+        pollingInterval = null;
+        updateStatusMessage('Training was cancelled.', 'warning');
       } else {
         const currentEpoch = status.progress?.currentEpoch || 0;
         const totalEpochs = status.progress?.totalEpochs || 0;
@@ -24,40 +24,7 @@ class ClassificationService {
         content: emailData.content,
       });
 
-      // Map label names to database label IDs
-      const labelsWithIds = await Promise.all(
-        prediction.labels.map(async (pred) => {
-          const label = await labelDao.findByName(pred.label);
-          return {
-            labelId: label ? label.id : null,
-            labelName: pred.label,
-            confidence: pred.confidence,
-            found: !!label
-          };
-        })
-      );
-
-      // Filter out labels not found in database
-      const validLabels = labelsWithIds.filter(l => l.found);
-      const notFoundLabels = labelsWithIds.filter(l => !l.found);
-
-      if (notFoundLabels.length > 0) {
-        console.warn(
-          `Labels not found in database: ${notFoundLabels.map(l => l.labelName).join(', ')}`
-        );
-      }
-
-      return {
-        success: true,
-        labels: validLabels.map(l => ({
-          labelId: l.labelId,
-          labelName: l.labelName,
-          confidence: l.confidence
-        })),
-        avgConfidence: validLabels.length > 0
-          ? validLabels.reduce((sum, l) => sum + l.confidence, 0) / validLabels.length
-          : 0
-      };
+      return await this.buildResult(prediction);
     } catch (error) {
       console.error("Classification error:", error);
       return {
@@ -69,6 +36,48 @@ class ClassificationService {
     }
   }
 
+  /**
+   * Map predicted label names to database label IDs
+   * @param {Object} prediction - {labels: [{label, confidence}, ...]}
+   * @returns {Promise<Object>}
+   */
+  async buildResult(prediction) {
+    // Map label names to database label IDs
+    const labelsWithIds = await Promise.all(
+      prediction.labels.map(async (pred) => {
+        const label = await labelDao.findByName(pred.label);
+        return {
+          labelId: label ? label.id : null,
+          labelName: pred.label,
+          confidence: pred.confidence,
+          found: !!label
+        };
+      })
+    );
+
+    // Filter out labels not found in database
+    const validLabels = labelsWithIds.filter(l => l.found);
+    const notFoundLabels = labelsWithIds.filter(l => !l.found);
+
+    if (notFoundLabels.length > 0) {
+      console.warn(
+        `Labels not found in database: ${notFoundLabels.map(l => l.labelName).join(', ')}`
+      );
+    }
+
+    return {
+      success: true,
+      labels: validLabels.map(l => ({
+        labelId: l.labelId,
+        labelName: l.labelName,
+        confidence: l.confidence
+      })),
+      avgConfidence: validLabels.length > 0
+        ? validLabels.reduce((sum, l) => sum + l.confidence, 0) / validLabels.length
+        : 0
+    };
+  }
+
   /**
    * Classify email and update database with predictions
    * @param {number} emailId 
@@ -93,24 +102,7 @@ class ClassificationService {
         return result;
       }
 
-      // Update email labels (replace all existing labels)
-      if (result.labels.length > 0) {
-        const labelIds = result.labels.map(l => l.labelId);
-        await emailDao.updateLabels(emailId, labelIds);
-      }
-
-      // Save prediction to tblPrediction (optional)
-      if (savePrediction && result.labels.length > 0) {
-        const activeModel = await modelDao.getActiveModel();
-        if (activeModel) {
-          const predictions = result.labels.map(l => ({
-            labelId: l.labelId,
-            confidence: l.confidence
-          }));
-          
-          await emailDao.savePrediction(emailId, activeModel.id, predictions);
-        }
-      }
+      await this.applyResult(emailId, result, savePrediction);
 
       return result;
     } catch (error) {
@@ -123,6 +115,37 @@ class ClassificationService {
     }
   }
 
+  /**
+   * Write a classification result to the email labels and tblPrediction
+   * @param {number} emailId 
+   * @param {Object} result - result of buildResult
+   * @param {boolean} savePrediction - Whether to save prediction to tblPrediction
+   * @param {Object|null} activeModel - already loaded active model (optional)
+   * @returns {Promise<void>}
+   */
+  async applyResult(emailId, result, savePrediction = true, activeModel = undefined) {
+    // Update email labels (replace all existing labels)
+    if (result.labels.length > 0) {
+      const labelIds = result.labels.map(l => l.labelId);
+      await emailDao.updateLabels(emailId, labelIds);
+    }
+
+    // Save prediction to tblPrediction (optional)
+    if (savePrediction && result.labels.length > 0) {
+      const model = activeModel === undefined
+        ? await modelDao.getActiveModel()
+        : activeModel;
+      if (model) {
+        const predictions = result.labels.map(l => ({
+          labelId: l.labelId,
+          confidence: l.confidence
+        }));
+        
+        await emailDao.savePrediction(emailId, model.id, predictions);
+      }
+    }
+  }
+
   /**
    * Classify email and ONLY save to tblPrediction (don't update email labels)
    * @param {number} emailId 
@@ -178,18 +201,53 @@ class ClassificationService {
 
   /**
    * Batch classify multiple emails
+   * Emails are sent to the ML API in chunks, one request (one forward pass) per chunk
    * @param {Array<number>} emailIds 
+   * @param {number} chunkSize - max emails per ML API request
    * @returns {Promise<Array>}
    */
-  async batchClassify(emailIds) {
+  async batchClassify(emailIds, chunkSize = 500) {
     const results = [];
-    
-    for (const emailId of emailIds) {
-      const result = await this.classifyAndUpdate(emailId);
-      results.push({
-        emailId,
-        ...result
-      });
+    const activeModel = await modelDao.getActiveModel();
+
+    for (let start = 0; start < emailIds.length; start += chunkSize) {
+      const chunkIds = emailIds.slice(start, start + chunkSize);
+      const emails = await Promise.all(chunkIds.map(id => emailDao.findById(id)));
+      const found = emails.filter(email => !!email);
+
+      let predictions = [];
+      let batchError = null;
+      if (found.length > 0) {
+        try {
+          predictions = await mlApiClient.predictBatch(found);
+        } catch (error) {
+          console.error("Batch classification error:", error);
+          batchError = error;
+        }
+      }
+
+      let predictionIdx = 0;
+      for (let i = 0; i < chunkIds.length; i++) {
+        const emailId = chunkIds[i];
+
+        if (!emails[i]) {
+          results.push({ emailId, success: false, error: "Email not found", labels: [] });
+          continue;
+        }
+        if (batchError) {
+          results.push({ emailId, success: false, error: batchError.message, labels: [] });
+          continue;
+        }
+
+        try {
+          const result = await this.buildResult(predictions[predictionIdx++]);
+          await this.applyResult(emailId, result, true, activeModel);
+          results.push({ emailId, ...result });
+        } catch (error) {
+          console.error("Classify and update error:", error);
+          results.push({ emailId, success: false, error: error.message, labels: [] });
+        }
+      }
     }
 
     return results;
@@ -46,6 +46,40 @@ class MLApiClient {
     }
   }
 
+  /**
+   * Predict labels for many emails in one request (MULTI-LABEL)
+   * @param {Array<Object>} emails - [{title, content}, ...]
+   * @returns {Promise<Array<Object>>} - one {labels: [...]} per email, in input order
+   */
+  async predictBatch(emails) {
+    const response = await fetch(`${config.pythonML.url}/api/v1/classify/batch`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'X-API-Key': config.pythonML.apiKey
+      },
+      body: JSON.stringify({
+        items: emails.map(email => ({
+          title: email.title,
+          content: email.content
+        }))
+      })
+    });
+
+    if (!response.ok) {
+      const errorData = await response.json().catch(() => ({}));
+      throw new Error(
+        `ML API batch request failed: ${response.status} - ${errorData.detail || 'Unknown error'}`
+      );
+    }
+
+    const data = await response.json();
+
+    return (data.results || []).map(result => ({
+      labels: result.labels || []
+    }));
+  }
+
   /**
    * @returns {Promise<boolean>} 
    */